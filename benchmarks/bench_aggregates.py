@@ -0,0 +1,89 @@
+"""
+Сводные показатели платформы: ответ admin-stats из поддерживаемой сводки против перебора портфелей.
+
+Меряются: перебор всех портфелей (загрузка шардов и пересчёт PlatformAggregates.build),
+ответ admin-stats по готовой сводке (чтение data/aggregates.json) и цена приращений —
+изменение баланса кошелька с подпиской сводки и без неё.
+
+Запуск: python -m benchmarks.bench_aggregates [--users N] [--updates N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import datagen
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _updates(store, count: int, seed: int) -> float:
+    rng = random.Random(seed)
+    wallets = [p.get_wallet("USD") for p in store.portfolios.values()]
+    start = time.perf_counter()
+    for _ in range(count):
+        wallet = rng.choice(wallets)
+        wallet.deposit(1.0)
+        wallet.withdraw(1.0)
+    return (time.perf_counter() - start) / (2 * count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--updates", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        datagen.generate(directory, users=args.users, currencies=10, history=10, seed=args.seed)
+        # admin-stats — операция администратора
+        with open(os.path.join(directory, "config.json"), 'w', encoding='utf-8') as f:
+            json.dump({"admin_usernames": ["user1"]}, f)
+        # get_data_path отсчитывается от текущего каталога
+        os.chdir(directory)
+        from valutatrade_hub.core import aggregates, shards, usecases, utils
+        from valutatrade_hub.infra.settings import SettingsLoader
+
+        SettingsLoader().reload()
+        usecases.login("user1", datagen.PASSWORD)
+
+        def scan():
+            store = shards.AccountStore(utils.get_data_dir())
+            store.refresh()
+            aggregates.PlatformAggregates.build(store.portfolios.values())
+
+        scan_s = _best(scan, args.repeat)
+        usecases.admin_stats(rebuild=True)
+        stats_s = _best(usecases.admin_stats, args.repeat * 10)
+        size_kb = os.path.getsize(aggregates.aggregates_path(utils.get_data_dir())) / 1024
+
+        plain = shards.AccountStore(utils.get_data_dir())
+        plain.refresh()
+        tracked = shards.AccountStore(utils.get_data_dir())
+        tracked.track_aggregates()
+        tracked.refresh()
+        plain_us = _updates(plain, args.updates, args.seed) * 1e6
+        tracked_us = _updates(tracked, args.updates, args.seed) * 1e6
+        os.chdir("/")
+
+    print(f"пользователей: {args.users}")
+    print(f"перебор портфелей (загрузка + пересчёт): {scan_s * 1000:>9.1f} мс")
+    print(f"admin-stats по сводке ({size_kb:.1f} КиБ):    {stats_s * 1000:>9.2f} мс "
+          f"(в {scan_s / stats_s:,.0f} раз быстрее)")
+    print(f"изменение баланса без сводки: {plain_us:.2f} мкс, со сводкой: {tracked_us:.2f} мкс "
+          f"(+{tracked_us - plain_us:.2f} мкс)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Пропускная способность надёжной записи (коммитов в секунду).
+
+Сравнивает одиночные коммиты (каждый save — отдельный fsync) с групповой фиксацией,
+где несколько файлов пишутся одной транзакцией.
+
+Запуск: python -m benchmarks.bench_durable [--commits N] [--users N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from valutatrade_hub.infra import durable
+
+
+def _payload(users: int) -> list:
+    return [{"user_id": i, "wallets": {"USD": {"balance": 1000.0 + i}}} for i in range(users)]
+
+
+def bench_single(directory: str, commits: int, data: list) -> float:
+    lock = os.path.join(directory, ".data.lock")
+    start = time.perf_counter()
+    for _ in range(commits):
+        with durable.file_lock(lock):
+            durable.atomic_write_json(os.path.join(directory, "users.json"), data)
+            durable.atomic_write_json(os.path.join(directory, "portfolios.json"), data)
+    return commits / (time.perf_counter() - start)
+
+
+def bench_group(directory: str, commits: int, data: list) -> float:
+    lock = os.path.join(directory, ".data.lock")
+    start = time.perf_counter()
+    for _ in range(commits):
+        with durable.transaction(lock):
+            durable.atomic_write_json(os.path.join(directory, "users.json"), data)
+            durable.atomic_write_json(os.path.join(directory, "portfolios.json"), data)
+    return commits / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commits", type=int, default=200)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    data = _payload(args.users)
+    with tempfile.TemporaryDirectory() as directory:
+        single = bench_single(directory, args.commits, data)
+        group = bench_group(directory, args.commits, data)
+    print(f"single writes : {single:10.1f} commits/sec")
+    print(f"group commit  : {group:10.1f} commits/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Сжатый архив истории курсов: место на диске и время выборки диапазона против несжатого журнала.
+
+История из datagen (одна запись в секунду, т.е. ~86 400 записей в день) читается как есть
+из exchange_rates.json и после archive_history — закрытые дни в сжатых сегментах lzma или zlib,
+в журнале только текущий день. Выборки: час в середине истории, день в середине,
+последний час (он в оперативном журнале) и вся история.
+
+Запуск: python -m benchmarks.bench_history_archive [--records N] [--codecs lzma,zlib] [--repeat N]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import datagen
+from valutatrade_hub.parser_service.archive import closed_before
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+
+def _storage(directory: str) -> RatesStorage:
+    data = os.path.join(directory, "data")
+    return RatesStorage(os.path.join(data, "exchange_rates.json"), os.path.join(data, "rates.json"))
+
+
+def _footprint(storage: RatesStorage) -> int:
+    size = os.path.getsize(storage.history_path)
+    if os.path.isdir(storage.archive.directory):
+        size += sum(os.path.getsize(os.path.join(storage.archive.directory, name))
+                    for name in os.listdir(storage.archive.directory))
+    return size
+
+
+def _query(storage: RatesStorage, start, end, repeat: int):
+    best, count = float("inf"), 0
+    for _ in range(repeat):
+        began = time.perf_counter()
+        count = sum(1 for _ in storage.iter_history(start, end))
+        best = min(best, time.perf_counter() - began)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=400_000)
+    parser.add_argument("--codecs", default="lzma,zlib")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "plain")
+        datagen.generate(source, users=1, currencies=6, history=args.records)
+        plain = _storage(source)
+        timestamps = [record["timestamp"] for record in plain.iter_history()]
+        middle = timestamps[len(timestamps) // 2]
+        queries = [
+            ("час в середине", middle[:13], middle[:13]),
+            ("день в середине", middle[:10], middle[:10]),
+            ("последний час", timestamps[-1][:13], None),
+            ("вся история", None, None),
+        ]
+        variants = [("без сжатия", plain, 0.0)]
+        for codec in args.codecs.split(","):
+            target = os.path.join(directory, codec)
+            shutil.copytree(source, target)
+            storage = _storage(target)
+            began = time.perf_counter()
+            storage.archive_history(closed_before(), codec)
+            variants.append((codec, storage, time.perf_counter() - began))
+
+        print(f"записей: {len(timestamps)}, дней: {len({ts[:10] for ts in timestamps})}")
+        print(f"{'хранение':<12} {'на диске':>10} {'архивация':>10}" + "".join(f" {name:>16}" for name, _, _ in queries))
+        for name, storage, archived in variants:
+            cells = []
+            for _, start, end in queries:
+                elapsed, count = _query(storage, start, end, args.repeat)
+                cells.append(f"{elapsed * 1000:>7.0f} мс ({count // 1000}k)" if count >= 1000 else
+                             f"{elapsed * 1000:>7.0f} мс ({count})")
+            print(f"{name:<12} {_footprint(storage) / 2 ** 20:>6.1f} МиБ {archived:>9.1f}с" +
+                  "".join(f" {cell:>16}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Чтение большого журнала exchange_rates.json: пиковый RSS и время json.load против
+потокового iter_json_array. Каждый способ запускается в отдельном свежем процессе (spawn),
+процесс сообщает свой пиковый RSS до и после чтения — в зачёт идёт прирост.
+Дополнительно меряется дозапись одного обновления курсов в конец журнала.
+
+Запуск: python -m benchmarks.bench_history_read [--records N] [--chunk-kb 64]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from valutatrade_hub.parser_service.storage import RatesStorage, iter_json_array
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КиБ, macOS — байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _write_history(path: str, records: int) -> None:
+    """Журнал в старом формате (массив с отступами), записываемый потоково."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for i in range(records):
+            code = f"C{i % 50}"
+            timestamp = f"2026-01-{1 + i // 86400 % 28:02d}T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z"
+            record = {"id": f"{code}_USD_{timestamp}", "from_currency": code, "to_currency": "USD",
+                      "rate": 100.0 + i % 997, "timestamp": timestamp, "source": "bench", "meta": {}}
+            f.write(("\n" if i == 0 else ",\n") + json.dumps(record, indent=2))
+        f.write("\n]")
+
+
+def _read(method: str, path: str, chunk: int, results) -> None:
+    before = _peak_rss_mb()
+    start = time.perf_counter()
+    if method == "json.load":
+        with open(path, 'r', encoding='utf-8') as f:
+            count = len(json.load(f))
+    else:
+        count = sum(1 for _ in iter_json_array(path, chunk))
+    results.put((method, count, time.perf_counter() - start, before, _peak_rss_mb()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--chunk-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "exchange_rates.json")
+        _write_history(path, args.records)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"журнал: {args.records} записей, {size_mb:.1f} МиБ")
+
+        for method in ("json.load", "iter_json_array"):
+            results = context.Queue()
+            proc = context.Process(target=_read, args=(method, path, args.chunk_kb * 1024, results))
+            proc.start()
+            name, count, elapsed, before, after = results.get()
+            proc.join()
+            print(f"{name:<16} {count} записей за {elapsed:6.2f} с, пиковый RSS +{after - before:8.1f} МиБ"
+                  f" (всего {after:.1f} МиБ)")
+
+        storage = RatesStorage(path, os.path.join(directory, "rates.json"))
+        start = time.perf_counter()
+        storage.save_historical_rates({f"C{i}_USD": 1.0 + i for i in range(50)}, "bench")
+        print(f"дозапись 50 курсов в журнал: {(time.perf_counter() - start) * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
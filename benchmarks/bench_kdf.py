@@ -0,0 +1,67 @@
+"""
+Пропускная способность входа (logins/sec) для разных настроек KDF.
+
+Для каждой схемы измеряется проверка пароля без кэша, с кэшем проверок
+и параллельно из нескольких потоков через пул процессов (kdf_workers).
+
+Запуск: python -m benchmarks.bench_kdf [--logins N] [--workers N]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from valutatrade_hub.core import security
+from valutatrade_hub.infra.settings import SettingsLoader
+
+KDF_SETTINGS = [
+    ("pbkdf2_sha256", {"iterations": 100_000}),
+    ("pbkdf2_sha256", {"iterations": 600_000}),
+    ("scrypt", {"n": 2 ** 14, "r": 8, "p": 1}),
+    ("scrypt", {"n": 2 ** 15, "r": 8, "p": 1}),
+]
+
+
+def _configure(scheme: str, params: dict, workers: int, cache_ttl: int) -> None:
+    config = SettingsLoader()._config
+    config.update(password_kdf=scheme, password_kdf_params=params,
+                  kdf_workers=workers, auth_cache_ttl_seconds=cache_ttl)
+    security._verify_cache = None
+
+
+def _logins_per_sec(record: str, salt: str, logins: int, threads: int = 1) -> float:
+    start = time.perf_counter()
+    if threads == 1:
+        for _ in range(logins):
+            security.verify_password("secret", salt, record)
+    else:
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(lambda _: security.verify_password("secret", salt, record), range(logins)))
+    return logins / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    print(f"{'kdf':<34}{'cold':>12}{'cached':>14}{'pool x' + str(args.workers):>14}")
+    for scheme, params in KDF_SETTINGS:
+        _configure(scheme, params, 0, 0)
+        salt = os.urandom(16).hex()
+        record = security.hash_password("secret", salt)
+        cold = _logins_per_sec(record, salt, args.logins)
+
+        _configure(scheme, params, 0, 300)
+        cached = _logins_per_sec(record, salt, args.logins * 100)
+
+        _configure(scheme, params, args.workers, 0)
+        pooled = _logins_per_sec(record, salt, args.logins * 2, threads=args.workers)
+
+        label = f"{scheme} {security.parse_record(record)[0].params}"
+        print(f"{label:<34}{cold:>12.1f}{cached:>14.1f}{pooled:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
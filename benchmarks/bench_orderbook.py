@@ -0,0 +1,110 @@
+"""
+Пропускная способность внутренней биржи в одном процессе.
+
+Поток случайных лимитных заявок вокруг средней цены (часть пересекает спред и исполняется,
+часть встаёт в книгу, часть снимается) проходит через MatchingEngine; с --settle каждая
+заявка резервирует средства и каждое исполнение рассчитывается по кошелькам Portfolio.
+Печатает заявок/с, число исполнений, глубину книги и перцентили задержки одной заявки.
+
+Запуск: python -m benchmarks.bench_orderbook [--orders N] [--users N] [--cancel-ratio 0.1] [--settle]
+"""
+import argparse
+import random
+import time
+
+from valutatrade_hub.core import orderbook
+from valutatrade_hub.core.models import Portfolio, User
+
+PAIR = "BTC_USD"
+MID = 60_000.0
+
+
+def _orders(count: int, users: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        side = orderbook.BUY if rng.random() < 0.5 else orderbook.SELL
+        # Цены на сетке шага 1 USD в пределах ±0.5% от средней: часть заявок пересекает спред
+        offset = rng.randint(-300, 300)
+        price = MID + (offset if side == orderbook.BUY else -offset)
+        yield rng.randrange(users), side, round(rng.uniform(0.001, 0.5), 6), price, rng.random()
+
+
+def _portfolios(users: int):
+    portfolios = []
+    for uid in range(users):
+        user = User.from_dict({"user_id": uid, "username": f"bench{uid}", "hashed_password": "",
+                               "salt": "", "registration_date": "2026-01-01T00:00:00"})
+        portfolio = Portfolio(user)
+        portfolio.add_currency("USD")
+        portfolio.add_currency("BTC")
+        portfolio.get_wallet("USD").deposit(1e12)
+        portfolio.get_wallet("BTC").deposit(1e8)
+        portfolios.append(portfolio)
+    return portfolios
+
+
+def run(count: int, users: int, cancel_ratio: float, settle: bool, seed: int = 0) -> dict:
+    engine = orderbook.MatchingEngine()
+    portfolios = _portfolios(users) if settle else None
+    stream = list(_orders(count, users, seed))
+    latencies = []
+    fills = cancels = 0
+    resting = []
+    start = time.perf_counter()
+    for user_id, side, amount, price, dice in stream:
+        began = time.perf_counter()
+        if dice < cancel_ratio and resting:
+            order_id = resting.pop(int(dice / cancel_ratio * len(resting)))
+            order = engine.find(order_id)
+            if order is not None:
+                engine.cancel(order_id)
+                if settle:
+                    orderbook.release(order, portfolios[order.user_id])
+                cancels += 1
+        else:
+            order = engine.new_order(user_id, PAIR, side, amount, price)
+            if settle:
+                orderbook.reserve(order, portfolios[user_id])
+            executed = engine.submit(order)
+            if settle:
+                for fill in executed:
+                    orderbook.settle(fill, portfolios[fill.buyer_id], portfolios[fill.seller_id])
+            fills += len(executed)
+            if order.remaining > 0:
+                resting.append(order.order_id)
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    book = engine.book(PAIR)
+    return {
+        "orders": count,
+        "seconds": elapsed,
+        "rate": count / elapsed,
+        "fills": fills,
+        "cancels": cancels,
+        "resting": len(book),
+        "levels": len(book.depth(orderbook.BUY, 10**9)) + len(book.depth(orderbook.SELL, 10**9)),
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99)] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--cancel-ratio", type=float, default=0.1)
+    parser.add_argument("--settle", action="store_true", help="резервирование и расчёты по кошелькам")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = run(args.orders, args.users, args.cancel_ratio, args.settle, args.seed)
+    print(f"{result['orders']} заявок за {result['seconds']:.2f} с: {result['rate']:,.0f} заявок/с"
+          f" ({'с расчётами' if args.settle else 'только сведение'})")
+    print(f"исполнений: {result['fills']}, снято: {result['cancels']}, в книге: {result['resting']} заявок"
+          f" на {result['levels']} уровнях")
+    print(f"задержка заявки: p50 {result['p50_us']:.1f} мкс, p99 {result['p99_us']:.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Пакетная ребалансировка: расчёт плана для N портфелей и полный путь через usecases
+(план + исполнение + одна транзакция с журналом сделок) на синтетических данных.
+
+Запуск из корня проекта: python -m benchmarks.bench_rebalance [--portfolios N] [--currencies M]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from valutatrade_hub.core import rebalance
+
+from . import datagen
+
+TARGETS = "USD=60,BTC=30,ETH=10"
+
+
+def bench_plan(portfolios: int, currencies: int) -> float:
+    rng = random.Random(0)
+    codes = datagen.currency_codes(currencies)
+    prices = {"USD": 1.0, **{code: rng.uniform(0.01, 50_000.0) for code in codes}}
+    holdings = [
+        {"USD": rng.uniform(0, 10_000), **{code: rng.uniform(0, 5) for code in rng.sample(codes, 3)}}
+        for _ in range(portfolios)
+    ]
+    start = time.perf_counter()
+    report = rebalance.plan(holdings, prices, rebalance.parse_targets(TARGETS))
+    elapsed = time.perf_counter() - start
+    print(f"plan: {portfolios} портфелей, {len(report.trades)} сделок за {elapsed * 1000:.1f} мс "
+          f"(numpy: {'да' if rebalance.np is not None else 'нет'})")
+    return elapsed
+
+
+def bench_usecase(portfolios: int, currencies: int) -> float:
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        datagen.generate(workdir, users=portfolios, currencies=currencies, history=10)
+        # Ребалансировка всех портфелей — операция администратора
+        with open(os.path.join(workdir, "config.json"), 'w', encoding='utf-8') as f:
+            json.dump({"admin_usernames": ["user1"]}, f)
+        os.chdir(workdir)
+        try:
+            from valutatrade_hub.core import usecases
+            from valutatrade_hub.infra.settings import SettingsLoader
+
+            SettingsLoader().reload()
+            usecases.login("user1", datagen.PASSWORD)
+            start = time.perf_counter()
+            output = usecases.rebalance(TARGETS, all_users=True)
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    print(output.splitlines()[-3:])
+    print(f"rebalance --all: {elapsed:.2f} с")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--portfolios", type=int, default=100_000)
+    parser.add_argument("--currencies", type=int, default=10)
+    parser.add_argument("--plan-only", action="store_true")
+    args = parser.parse_args()
+
+    bench_plan(args.portfolios, args.currencies)
+    if not args.plan_only:
+        bench_usecase(args.portfolios, args.currencies)
+
+
+if __name__ == "__main__":
+    main()
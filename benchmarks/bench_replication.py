@@ -0,0 +1,130 @@
+"""
+Реплики только для чтения: задержка репликации и пропускная способность чтений.
+
+Primary (этот процесс) выполняет поток сделок buy/sell с заданным темпом и ведёт журнал
+изменений; K процессов-реплик в это время непрерывно читают show-portfolio. Реплика
+догоняет журнал фоновым потоком (из файла или из сокета раздатчика) и меряет задержку
+каждой записи: от фиксации на primary до применения у себя.
+
+Запуск: python -m benchmarks.bench_replication [--writes N] [--rate N] [--replicas K]
+        [--transport file|socket|both] [--follow-ms 10]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks import datagen
+
+
+def _replica(directory: str, stop, results) -> None:
+    os.chdir(directory)
+    os.environ["VALUTATRADE_ROLE"] = "replica"
+    from valutatrade_hub.core import usecases
+
+    usecases.login("user1", datagen.PASSWORD)
+    reads = 0
+    start = time.perf_counter()
+    while not stop.is_set():
+        usecases.show_portfolio()
+        reads += 1
+    elapsed = time.perf_counter() - start
+    results.put((reads, elapsed, usecases.replica_stats()))
+
+
+def _serve(directory: str, socket_path: str) -> None:
+    os.chdir(directory)
+    from valutatrade_hub.infra import changelog
+
+    changelog.serve(os.path.join(directory, "data", "changes.log"), socket_path)
+
+
+def _primary_writes(writes: int, rate: float) -> list:
+    from valutatrade_hub.core import usecases
+
+    usecases.login("user1", datagen.PASSWORD)
+    timings = []
+    began = time.perf_counter()
+    for i in range(writes):
+        # Равномерный темп: следующая сделка не раньше своего слота
+        delay = began + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        start = time.perf_counter()
+        if i % 2 == 0:
+            usecases.buy("BTC", 0.001)
+        else:
+            usecases.sell("BTC", 0.001)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings
+
+
+def run(directory: str, transport: str, writes: int, rate: float, replicas: int, follow_ms: int) -> None:
+    context = multiprocessing.get_context("spawn")
+    socket_path = os.path.join(directory, "data", "replication.sock")
+    source = f"unix:{socket_path}" if transport == "socket" else "file"
+    with open(os.path.join(directory, "config.json"), 'w', encoding='utf-8') as f:
+        json.dump({"replication_source": source, "replication_follow_interval_ms": follow_ms,
+                   "rates_allow_stale": True}, f)
+
+    server = None
+    if transport == "socket":
+        server = context.Process(target=_serve, args=(directory, socket_path), daemon=True)
+        server.start()
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+    stop, results = context.Event(), context.Queue()
+    workers = [context.Process(target=_replica, args=(directory, stop, results)) for _ in range(replicas)]
+    for worker in workers:
+        worker.start()
+    time.sleep(1.0)  # реплики снимают начальный снимок и входят
+
+    start = time.perf_counter()
+    timings = _primary_writes(writes, rate)
+    elapsed = time.perf_counter() - start
+    time.sleep(0.5)  # реплики применяют хвост журнала
+    stop.set()
+    stats = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    if server is not None:
+        server.terminate()
+        server.join()
+
+    print(f"[{transport}] primary: {writes} сделок за {elapsed:.2f} с ({writes / elapsed:.0f}/с), "
+          f"p50 {timings[len(timings) // 2] * 1000:.1f} мс")
+    total_reads = sum(reads / seconds for reads, seconds, _ in stats)
+    print(f"[{transport}] реплик: {replicas}, чтений show-portfolio: {total_reads:,.0f}/с суммарно")
+    for index, (_, _, status) in enumerate(stats):
+        print(f"[{transport}]   реплика {index}: применено {status['entries']} записей до seq {status['applied']},"
+              f" задержка p50 {status['lag_p50'] * 1000:.1f} мс, p99 {status['lag_p99'] * 1000:.1f} мс,"
+              f" макс {status['lag_max'] * 1000:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--writes", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=50.0, help="сделок в секунду на primary")
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--transport", choices=("file", "socket", "both"), default="both")
+    parser.add_argument("--follow-ms", type=int, default=10, help="интервал опроса журнала репликой")
+    args = parser.parse_args()
+
+    transports = ("file", "socket") if args.transport == "both" else (args.transport,)
+    with tempfile.TemporaryDirectory() as directory:
+        datagen.generate(directory, users=args.users, currencies=6, history=100)
+        # Пути data отсчитываются от текущего каталога; один каталог на все прогоны —
+        # состояние usecases primary привязывается к нему при первом обращении
+        os.chdir(directory)
+        os.environ["VALUTATRADE_ROLE"] = "primary"
+        for transport in transports:
+            run(directory, transport, args.writes, args.rate, args.replicas, args.follow_ms)
+        os.chdir("/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Шардированное хранилище пользователей и портфелей: время загрузки и записи от числа шардов.
+
+Для каждого числа шардов данные перекладываются командой reshard, затем меряются:
+холодная загрузка всех шардов в новом AccountStore — последовательно и пулом процессов —
+и транзакция, меняющая один портфель (перечитывание изменившихся шардов, запись своего шарда, fsync).
+
+Запуск: python -m benchmarks.bench_shards [--users N] [--shards 1,2,4,8,16] [--writes N] [--workers N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import datagen
+from valutatrade_hub.core import shards, utils
+
+
+def _load(data_dir: str, workers: int) -> float:
+    start = time.perf_counter()
+    store = shards.AccountStore(data_dir, workers)
+    store.refresh()
+    return time.perf_counter() - start
+
+
+def _writes(data_dir: str, count: int, seed: int) -> list:
+    store = shards.AccountStore(data_dir, 1)
+    store.refresh()
+    user_ids = list(store.portfolios)
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(count):
+        user_id = rng.choice(user_ids)
+        start = time.perf_counter()
+        with utils.data_lock():
+            with utils.transaction():
+                store.refresh()
+                store.portfolios[user_id].get_wallet("USD").deposit(1.0)
+                saved = store.save()
+            store.remember(saved)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--shards", default="1,2,4,8,16")
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=0, help="процессов пула (0 — по числу шардов)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts = [int(count) for count in args.shards.split(",")]
+    with tempfile.TemporaryDirectory() as directory:
+        datagen.generate(directory, users=args.users, currencies=10, history=10, seed=args.seed)
+        # get_data_path отсчитывается от текущего каталога
+        os.chdir(directory)
+        data_dir = utils.get_data_dir()
+        print(f"пользователей: {args.users}, ядер: {os.cpu_count()}")
+        print(f"{'шардов':>6} {'пересборка':>11} {'загрузка':>9} {'пулом':>9} {'запись p50':>11} {'p99':>9}"
+              f" {'шард, КиБ':>10}")
+        for count in counts:
+            start = time.perf_counter()
+            with utils.data_lock():
+                shards.reshard(data_dir, count)
+            reshard_s = time.perf_counter() - start
+            layout = shards.ShardLayout.read(data_dir)
+            sequential = _load(data_dir, 1)
+            parallel = _load(data_dir, args.workers or count) if count > 1 else sequential
+            timings = _writes(data_dir, args.writes, args.seed)
+            shard_kb = sum(layout.size(shard) for shard in range(count)) / count / 1024
+            print(f"{count:>6} {reshard_s:>10.2f}с {sequential:>8.2f}с {parallel:>8.2f}с"
+                  f" {timings[len(timings) // 2] * 1000:>9.1f}мс {timings[int(len(timings) * 0.99)] * 1000:>7.1f}мс"
+                  f" {shard_kb:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
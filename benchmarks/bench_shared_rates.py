@@ -0,0 +1,87 @@
+"""
+Многопроцессный бенчмарк общей таблицы курсов.
+
+Один процесс-писатель публикует новые версии таблицы, N процессов-читателей берут снимки.
+Для каждого снимка проверяется согласованность (все курсы одной версии),
+для сравнения измеряется чтение того же набора через json.load(rates.json).
+
+Запуск: python -m benchmarks.bench_shared_rates [--readers N] [--pairs N] [--seconds S]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from valutatrade_hub.parser_service.shared_rates import SharedRatesTable
+
+
+def _pairs(n: int, generation: int) -> dict:
+    return {f"C{i}_USD": {"rate": float(generation), "updated_at": "2026-01-01T00:00:00Z", "source": "bench"}
+            for i in range(n)}
+
+
+def _writer(path: str, pairs: int, stop_at: float) -> None:
+    table = SharedRatesTable(path)
+    generation = 1
+    while time.time() < stop_at:
+        generation += 1
+        table.publish(_pairs(pairs, generation), None)
+
+
+def _reader(path: str, stop_at: float, results) -> None:
+    table = SharedRatesTable(path)
+    reads = torn = 0
+    while time.time() < stop_at:
+        snapshot = table.snapshot()
+        if snapshot is None:
+            continue
+        if len({p["rate"] for p in snapshot["pairs"].values()}) != 1:
+            torn += 1
+        reads += 1
+    results.put((reads, torn))
+
+
+def bench_json(path: str, seconds: float) -> float:
+    reads = 0
+    stop_at = time.time() + seconds
+    while time.time() < stop_at:
+        with open(path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        reads += 1
+    return reads / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--pairs", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rates.shm")
+        SharedRatesTable(path).publish(_pairs(args.pairs, 1), None)
+        json_path = os.path.join(directory, "rates.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({"pairs": _pairs(args.pairs, 1)}, f, indent=2)
+
+        stop_at = time.time() + args.seconds
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_writer, args=(path, args.pairs, stop_at))]
+        procs += [multiprocessing.Process(target=_reader, args=(path, stop_at, results)) for _ in range(args.readers)]
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in range(args.readers)]
+        for p in procs:
+            p.join()
+
+        reads = sum(r for r, _ in totals)
+        torn = sum(t for _, t in totals)
+        print(f"shared memory : {reads / args.seconds:12.1f} snapshots/sec ({args.readers} readers, torn: {torn})")
+        print(f"json.load     : {bench_json(json_path, args.seconds):12.1f} reads/sec (1 reader)")
+
+
+if __name__ == "__main__":
+    main()
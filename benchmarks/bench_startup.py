@@ -0,0 +1,66 @@
+"""
+Время холодного старта.
+
+1. Разбирает вывод `python -X importtime` для импорта точки входа и печатает самые дорогие модули.
+2. Измеряет холодную задержку get-rate (новый процесс на каждый запуск) и сравнивает с целью.
+
+Запуск из корня проекта: python -m benchmarks.bench_startup [--runs N] [--target-ms MS]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Одноразовый режим CLI (project get-rate ...) без загрузки .env
+GET_RATE_SNIPPET = (
+    "from valutatrade_hub.cli.interface import run; "
+    "run(['get-rate', '--from', 'BTC', '--to', 'USD'])"
+)
+
+
+def import_times(statement: str, top: int) -> list:
+    """Возвращает [(кумулятивное время, мкс; модуль)] самых дорогих импортов."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, module = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cumulative.isdigit():
+            rows.append((int(cumulative), module))
+    return sorted(rows, reverse=True)[:top]
+
+
+def cold_latency(statement: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], capture_output=True, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=150.0, help="цель для медианы холодного get-rate")
+    args = parser.parse_args()
+
+    baseline = statistics.median(cold_latency("pass", args.runs))
+    print("Самые дорогие импорты (import main + interface):")
+    for cumulative, module in import_times("import main, valutatrade_hub.cli.interface", args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    timings = cold_latency(GET_RATE_SNIPPET, args.runs)
+    median = statistics.median(timings)
+    status = "OK" if median <= args.target_ms else "FAIL"
+    print(f"Пустой интерпретатор: {baseline:.1f} ms")
+    print(f"Холодный get-rate: медиана {median:.1f} ms, min {min(timings):.1f} ms "
+          f"(цель {args.target_ms:.0f} ms) — {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Генератор синтетических данных: N пользователей, M валют и K записей истории курсов.
+
+Пишет каталог data/ в формате приложения (users, portfolios, rates, exchange_rates, currencies),
+так что сценарии работают с настоящими usecases и хранилищами.
+
+Запуск: python -m benchmarks.datagen <каталог> [--users N] [--currencies M] [--history K]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+from typing import Dict, List
+
+from valutatrade_hub.core import security
+
+PASSWORD = "secret"
+BASE_CODES = ["BTC", "ETH", "SOL", "EUR", "GBP", "RUB"]
+
+
+def currency_codes(count: int) -> List[str]:
+    """Коды валют: сначала реальные, затем синтетические C0001, C0002, ..."""
+    codes = BASE_CODES[:count]
+    codes += [f"C{i:04d}" for i in range(1, count - len(codes) + 1)]
+    return codes
+
+
+def _write(directory: str, filename: str, data) -> None:
+    with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def generate(directory: str, users: int = 100, currencies: int = 10, history: int = 1000,
+             seed: int = 0) -> Dict[str, int]:
+    """Создаёт directory/data с синтетическими данными. Возвращает фактические размеры."""
+    rng = random.Random(seed)
+    data_dir = os.path.join(directory, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    codes = currency_codes(currencies)
+    prices = {code: rng.uniform(0.01, 50_000.0) for code in codes}
+
+    # Хэш один на всех: KDF на каждого синтетического пользователя занял бы минуты
+    salt = os.urandom(16).hex()
+    record = security.hash_password(PASSWORD, salt)
+    registered = datetime.datetime(2026, 1, 1).isoformat()
+    _write(data_dir, "users.json", [
+        {"user_id": i, "username": f"user{i}", "hashed_password": record, "salt": salt,
+         "registration_date": registered}
+        for i in range(1, users + 1)
+    ])
+    held = min(3, len(codes))
+    _write(data_dir, "portfolios.json", [
+        {"user_id": i, "wallets": {"USD": {"balance": 1_000_000.0},
+                                   **{code: {"balance": rng.uniform(0, 10)} for code in rng.sample(codes, held)}}}
+        for i in range(1, users + 1)
+    ])
+
+    # История: K записей по кругу по валютам, случайное блуждание цен, время по возрастанию
+    start = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=history)
+    records = []
+    for i in range(history):
+        code = codes[i % len(codes)]
+        prices[code] *= 1 + rng.gauss(0, 0.01)
+        ts = (start + datetime.timedelta(seconds=i)).strftime('%Y-%m-%dT%H:%M:%S.%f') + 'Z'
+        records.append({"id": f"{code}_USD_{ts}", "from_currency": code, "to_currency": "USD",
+                        "rate": prices[code], "timestamp": ts, "source": "Stub", "meta": {}})
+    _write(data_dir, "exchange_rates.json", records)
+
+    now = datetime.datetime.utcnow().isoformat() + 'Z'
+    _write(data_dir, "rates.json", {
+        "pairs": {f"{code}_USD": {"rate": prices[code], "updated_at": now, "source": "Stub"} for code in codes},
+        "last_refresh": now,
+    })
+    _write(data_dir, "currencies.json", [
+        {"code": code, "type": "crypto", "name": f"Synthetic {code}", "algorithm": "none", "market_cap": 0}
+        for code in codes if code not in BASE_CODES
+    ] + [
+        {"code": "USD", "type": "fiat", "name": "US Dollar", "issuing_country": "United States", "symbol": "$"},
+    ])
+    return {"users": users, "currencies": len(codes), "history": history}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--currencies", type=int, default=10)
+    parser.add_argument("--history", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate(args.directory, args.users, args.currencies, args.history, args.seed))
+
+
+if __name__ == "__main__":
+    main()
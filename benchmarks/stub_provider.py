@@ -0,0 +1,37 @@
+"""Локальный провайдер курсов для бенчмарков: случайное блуждание цен без сети."""
+import random
+from typing import Dict, Iterable, List
+
+from valutatrade_hub.parser_service.api_clients import BaseApiClient
+from valutatrade_hub.parser_service.breaker import CircuitBreaker
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+class StubClient(BaseApiClient):
+    """Отдаёт курсы заданных валют к базовой; каждая выборка немного сдвигает цены."""
+
+    source = "Stub"
+
+    def __init__(self, config, codes: Iterable[str], seed: int = 0):
+        super().__init__(config)
+        self._rng = random.Random(seed)
+        self._prices = {code: self._rng.uniform(0.01, 50_000.0) for code in codes}
+
+    def supports(self, code: str) -> bool:
+        return code in self._prices
+
+    def pairs(self) -> List[str]:
+        return [f"{code}_{self.config.BASE_CURRENCY}" for code in self._prices]
+
+    def fetch_rates(self) -> Dict[str, float]:
+        for code in self._prices:
+            self._prices[code] *= 1 + self._rng.gauss(0, 0.01)
+        return {f"{code}_{self.config.BASE_CURRENCY}": price for code, price in self._prices.items()}
+
+
+def install(updater: RatesUpdater, codes: Iterable[str]) -> StubClient:
+    """Заменяет провайдеров обновлятора одним локальным StubClient."""
+    client = StubClient(updater.config, codes)
+    updater.clients = [client]
+    updater.breakers = {client.source: CircuitBreaker(client.source)}
+    return client
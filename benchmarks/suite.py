@@ -0,0 +1,242 @@
+"""
+Набор бенчмарков торговых, файловых, курсовых и CLI-путей.
+
+Каждый сценарий работает на синтетических данных (benchmarks.datagen) во временном каталоге
+и с локальным провайдером курсов (benchmarks.stub_provider). Замеры в духе pyperf:
+прогрев, затем несколько повторов по loops вызовов; в отчёт идут min/median/mean/stdev на операцию.
+
+Результаты пишутся в JSON (--output), а с --baseline сравниваются с сохранённым прогоном:
+медиана хуже базовой больше чем на --threshold считается регрессией (код выхода 1).
+
+Запуск из корня проекта:
+    python -m benchmarks.suite [--users N] [--currencies M] [--history K] [--only buy,sell]
+                               [--output results.json] [--baseline baseline.json] [--save-baseline]
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from . import datagen
+
+# Сценарий получает контекст и возвращает функцию одной операции (и число вызовов на повтор)
+Scenario = Callable[[dict], Callable[[], None]]
+SCENARIOS: Dict[str, Scenario] = {}
+LOOPS: Dict[str, int] = {}
+
+
+def scenario(name: str, loops: int = 20):
+    def register(fn: Scenario) -> Scenario:
+        SCENARIOS[name] = fn
+        LOOPS[name] = loops
+        return fn
+    return register
+
+
+def _login(ctx: dict) -> None:
+    from valutatrade_hub.core import usecases
+    usecases.login("user1", datagen.PASSWORD)
+
+
+@scenario("register", loops=3)
+def bench_register(ctx: dict) -> Callable[[], None]:
+    from valutatrade_hub.core import usecases
+    counter = itertools.count()
+    return lambda: usecases.register(f"bench{next(counter)}", datagen.PASSWORD)
+
+
+@scenario("login", loops=3)
+def bench_login(ctx: dict) -> Callable[[], None]:
+    return lambda: _login(ctx)
+
+
+@scenario("buy")
+def bench_buy(ctx: dict) -> Callable[[], None]:
+    from valutatrade_hub.core import usecases
+    _login(ctx)
+    return lambda: usecases.buy(ctx["codes"][0], 0.001)
+
+
+@scenario("sell")
+def bench_sell(ctx: dict) -> Callable[[], None]:
+    from valutatrade_hub.core import usecases
+    _login(ctx)
+    code = ctx["codes"][0]
+    usecases.buy(code, 0.001 * 1000)
+    return lambda: usecases.sell(code, 0.001)
+
+
+@scenario("show_portfolio", loops=50)
+def bench_show_portfolio(ctx: dict) -> Callable[[], None]:
+    from valutatrade_hub.core import usecases
+    _login(ctx)
+    return lambda: usecases.show_portfolio()
+
+
+@scenario("get_rate", loops=200)
+def bench_get_rate(ctx: dict) -> Callable[[], None]:
+    from valutatrade_hub.core import usecases
+    code = ctx["codes"][0]
+    return lambda: usecases.get_rate(code, "USD")
+
+
+@scenario("show-rates", loops=50)
+def bench_show_rates(ctx: dict) -> Callable[[], None]:
+    from valutatrade_hub.cli.interface import execute
+    return lambda: execute("show-rates --sort rate --desc")
+
+
+def _storage(ctx: dict):
+    from valutatrade_hub.parser_service.storage import RatesStorage
+    return RatesStorage(os.path.join(ctx["data"], "exchange_rates.json"), os.path.join(ctx["data"], "rates.json"))
+
+
+def _stub_rates(ctx: dict) -> Callable[[], Dict[str, float]]:
+    """Генератор свежих курсов всех валют (каждый вызов — новое случайное блуждание)."""
+    prices = {f"{code}_USD": 1.0 + i for i, code in enumerate(ctx["codes"])}
+    step = itertools.count(1)
+
+    def rates() -> Dict[str, float]:
+        factor = 1 + 0.001 * next(step)
+        return {pair: price * factor for pair, price in prices.items()}
+    return rates
+
+
+@scenario("save_historical_rates", loops=10)
+def bench_save_historical_rates(ctx: dict) -> Callable[[], None]:
+    storage, rates = _storage(ctx), _stub_rates(ctx)
+    return lambda: storage.save_historical_rates(rates(), "Stub")
+
+
+@scenario("update_cache", loops=20)
+def bench_update_cache(ctx: dict) -> Callable[[], None]:
+    storage, rates = _storage(ctx), _stub_rates(ctx)
+    source_map = {f"{code}_USD": "Stub" for code in ctx["codes"]}
+    return lambda: storage.update_cache(rates(), source_map)
+
+
+@scenario("update_rates", loops=5)
+def bench_update_rates(ctx: dict) -> Callable[[], None]:
+    from valutatrade_hub.parser_service.updater import get_updater
+
+    from .stub_provider import install
+    updater = get_updater()
+    install(updater, ctx["codes"])
+    return updater.run_update
+
+
+def measure(op: Callable[[], None], loops: int, repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Время одной операции (секунды) по repeat повторам из loops вызовов."""
+    for _ in range(warmup):
+        op()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            op()
+        samples.append((time.perf_counter() - start) / loops)
+    median = statistics.median(samples)
+    return {
+        "loops": loops,
+        "repeat": repeat,
+        "min": min(samples),
+        "median": median,
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "ops_per_sec": 1.0 / median if median else 0.0,
+    }
+
+
+def run_suite(names: List[str], users: int, currencies: int, history: int, repeat: int) -> dict:
+    """
+    Прогоняет сценарии в отдельном временном каталоге (приложение работает с ./data).
+    Каталог готовится один раз: модули приложения держат его пути с момента импорта.
+    """
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        datagen.generate(workdir, users, currencies, history)
+        os.chdir(workdir)
+        try:
+            ctx = {"data": os.path.join(workdir, "data"), "codes": datagen.currency_codes(currencies)}
+            for name in names:
+                op = SCENARIOS[name](ctx)
+                results[name] = measure(op, LOOPS[name], repeat)
+                print(f"{name:<24}{results[name]['median'] * 1000:>12.3f} ms{results[name]['ops_per_sec']:>12.1f} ops/s",
+                      file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {"users": users, "currencies": currencies, "history": history, "repeat": repeat},
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Строки сравнения с базовым прогоном; регрессии помечены REGRESSION."""
+    lines = []
+    for name, current in results["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            lines.append(f"{name:<24} new")
+            continue
+        change = current["median"] / base["median"] - 1.0 if base["median"] else 0.0
+        status = "REGRESSION" if change > threshold else "faster" if change < -threshold else "same"
+        lines.append(f"{name:<24}{base['median'] * 1000:>10.3f} ms -> {current['median'] * 1000:>10.3f} ms"
+                     f"  {change * 100:+7.1f}%  {status}")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--currencies", type=int, default=10)
+    parser.add_argument("--history", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help=f"сценарии через запятую: {','.join(SCENARIOS)}")
+    parser.add_argument("--output", help="файл для JSON-результатов (по умолчанию stdout)")
+    parser.add_argument("--baseline", default="benchmarks/baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="сохранить результаты как базовые")
+    parser.add_argument("--threshold", type=float, default=0.10, help="допустимое замедление медианы")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+
+    results = run_suite(names, args.users, args.currencies, args.history, args.repeat)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"Базовые результаты сохранены в {args.baseline}", file=sys.stderr)
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            lines = compare(results, json.load(f), args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        return 1 if any(line.endswith("REGRESSION") for line in lines) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,20 @@
-from dotenv import load_dotenv
-
 #!/usr/bin/env python3
-from valutatrade_hub.cli.interface import main_loop
-from valutatrade_hub.logging_config import setup_logging
+import sys
 
-load_dotenv()  # загружаем данные из .env
 
 def main():
+    # .env загружаем до импорта parser_service: ParserConfig читает ключ API из окружения
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from valutatrade_hub.cli.interface import run
+    from valutatrade_hub.core.currencies import load_registry
+    from valutatrade_hub.logging_config import setup_logging
+
     setup_logging()
-    main_loop()
+    # Реестр валют и индекс поиска строятся один раз до первой команды
+    load_registry()
+    sys.exit(run(sys.argv[1:]))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,30 @@
+"""Журнал изменений после падения писателя посреди записи: следующая запись отрезает недописанную."""
+from valutatrade_hub.infra.changelog import ChangeLog, LogTailer
+
+
+def _tear(path: str) -> None:
+    with open(path, "ab") as f:
+        f.write(b'{"seq":2,"ts":1.0,"kind":"rat')  # писатель упал посреди строки
+
+
+def test_append_after_torn_record(tmp_path):
+    log = ChangeLog(str(tmp_path / "changes.log"))
+    assert log.append("rates", {"version": 1}) == 1
+    _tear(log.path)
+    assert log.head() == 1
+    assert log.append("rates", {"version": 2}) == 2
+    assert log.head() == 2
+    assert log.last("rates")["version"] == 2
+    assert [entry["seq"] for entry in LogTailer(log.path).poll()] == [1, 2]
+
+
+def test_tailer_rereads_line_replaced_after_tear(tmp_path):
+    log = ChangeLog(str(tmp_path / "changes.log"))
+    log.append("rates", {"version": 1})
+    tailer = LogTailer(log.path)
+    _tear(log.path)
+    assert [entry["seq"] for entry in tailer.poll()] == [1]  # недописанная строка ждёт продолжения
+    log.append("rates", {"version": 2})
+    entries = tailer.poll()
+    assert [(entry["seq"], entry["version"]) for entry in entries] == [(2, 2)]
+    tailer.close()
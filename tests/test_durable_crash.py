@@ -0,0 +1,214 @@
+"""
+Падение писателя посреди записи: после него каждый файл data — либо прежнее, либо новое состояние целиком.
+
+Писатель запускается отдельным процессом и завершается через os._exit перед N-й операцией
+фиксации (fsync временного файла, rename, fsync каталога) — для каждого N по очереди.
+Потерю несброшенного кэша ОС при отключении питания так не воспроизвести: проверяется
+порядок операций, а не сами fsync.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks import datagen
+from valutatrade_hub.infra import durable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CRASH_EXIT = 86
+
+# Писатель: argv — сценарий и номер операции, перед которой процесс падает (0 — не падать).
+# Перед фиксацией он записывает в intent.json, какими станут файлы, а без падения печатает число операций.
+WRITER = r"""
+import json, os, sys
+from valutatrade_hub.core import utils
+from valutatrade_hub.infra import durable
+
+scenario, crash_at = sys.argv[1], int(sys.argv[2])
+events = []
+
+
+def inject(fn):
+    def wrapper(*args, **kwargs):
+        events.append(fn.__name__)
+        if len(events) == crash_at:
+            os._exit(%(exit)d)
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def record_intent(pending):
+    with open("intent.json", "w", encoding="utf-8") as f:
+        json.dump(pending, f)
+
+
+commit = durable._commit
+
+
+def commit_with_intent(pending):
+    record_intent(pending)
+    commit(pending)
+
+
+durable._commit = commit_with_intent
+os.fsync = inject(os.fsync)
+os.replace = inject(os.replace)
+
+trade = {"user_id": 1, "side": "buy", "currency": "EUR", "amount": 1.0, "rate": 1.1,
+         "timestamp": "2026-01-01T00:00:00Z"}
+if scenario == "append":
+    history_path = os.path.abspath(utils.get_data_path("exchange_rates.json"))
+    record = {"id": "EUR_USD_2099-01-01T00:00:00Z", "from_currency": "EUR", "to_currency": "USD", "rate": 1.1,
+              "timestamp": "2099-01-01T00:00:00Z", "source": "Stub", "meta": {}}
+    record_intent({history_path: utils.load_json("exchange_rates.json", []) + [record]})
+    durable.atomic_append_json_array(history_path, [record])
+elif scenario == "group":
+    with utils.transaction():
+        users = utils.load_json("users.json", [])
+        users[0]["username"] = "renamed"
+        utils.save_json("users.json", users)
+        portfolios = utils.load_json("portfolios.json", [])
+        portfolios[0]["wallets"]["USD"]["balance"] += 1
+        utils.save_json("portfolios.json", portfolios)
+        utils.append_trades([trade])
+else:
+    from valutatrade_hub.core import usecases
+
+    if scenario == "register":
+        usecases.register("crashuser", "secret123")
+    elif scenario == "buy":
+        usecases.login("user1", "secret")
+        usecases.buy("EUR", 0.5)
+    elif scenario == "order":
+        usecases.login("user1", "secret")
+        usecases.place_order("buy", "BTC_USD", 0.001, 1000.0)
+print(len(events))
+""" % {"exit": CRASH_EXIT}
+
+
+@pytest.fixture(scope="module")
+def template(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("template"))
+    datagen.generate(directory, users=3, currencies=4, history=10)
+    return directory
+
+
+def _run(workdir: str, scenario: str, crash_at: int) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": ROOT, "VALUTATRADE_ROLE": ""}
+    return subprocess.run([sys.executable, "-c", WRITER, scenario, str(crash_at)],
+                          cwd=workdir, env=env, capture_output=True, text=True, timeout=60)
+
+
+def _state(workdir: str) -> dict:
+    """Содержимое JSON-файлов и журналов JSON Lines в data: {абсолютный путь: разобранные данные}."""
+    data_dir = os.path.join(workdir, "data")
+    state = {}
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        if name.endswith(".json"):
+            with open(path, "r", encoding="utf-8") as f:
+                state[path] = json.load(f)  # недописанный файл здесь упал бы с JSONDecodeError
+        elif name.endswith(".log"):
+            state[path] = durable.read_json_lines(path)
+    return state
+
+
+def _intent(workdir: str, old: dict) -> dict:
+    """Состояние файлов после фиксации: для журналов к прежним строкам добавляются дописанные."""
+    with open(os.path.join(workdir, "intent.json"), "r", encoding="utf-8") as f:
+        intent = json.load(f)
+    return {path: old.get(path, []) + data if path.endswith(".log") else data for path, data in intent.items()}
+
+
+def _fresh(template: str, tmp_path, name: str) -> str:
+    workdir = str(tmp_path / name)
+    shutil.copytree(template, workdir)
+    return workdir
+
+
+@pytest.mark.parametrize("scenario", ["append", "group", "register", "buy", "order"])
+def test_crash_leaves_old_or_new_state(template, tmp_path, scenario):
+    workdir = _fresh(template, tmp_path, "clean")
+    clean = _run(workdir, scenario, 0)
+    assert clean.returncode == 0, clean.stderr
+    operations = int(clean.stdout.split()[-1])
+    assert operations >= 3  # хотя бы fsync, rename и fsync каталога
+
+    for crash_at in range(1, operations + 1):
+        workdir = _fresh(template, tmp_path, f"crash{crash_at}")
+        old = _state(workdir)
+        result = _run(workdir, scenario, crash_at)
+        assert result.returncode == CRASH_EXIT, result.stderr
+        new = _intent(workdir, old)
+        after = _state(workdir)
+        for path, data in after.items():
+            states = [state[path] for state in (old, new) if path in state]
+            assert data in states, f"{scenario}: после падения перед операцией {crash_at} {path} — смесь состояний"
+        for path in old:
+            assert path in after, f"{scenario}: после падения перед операцией {crash_at} пропал {path}"
+
+
+def test_completed_group_commit_writes_every_file(template, tmp_path):
+    workdir = _fresh(template, tmp_path, "group")
+    assert _run(workdir, "group", 0).returncode == 0
+    with open(os.path.join(workdir, "intent.json"), "r", encoding="utf-8") as f:
+        intent = json.load(f)
+    after = _state(workdir)
+    assert {path: after[path] for path in intent} == intent
+
+
+def test_append_after_torn_line_cuts_it(tmp_path):
+    path = str(tmp_path / "orders.log")
+    durable.append_json_lines(path, [{"order_id": 1}, {"order_id": 2}])
+    with open(path, "ab") as f:
+        f.write(b'{"order_id": 3, "rem')  # писатель упал посреди строки
+    assert durable.read_json_lines(path) == [{"order_id": 1}, {"order_id": 2}]
+    durable.append_json_lines(path, [{"order_id": 4}])
+    assert durable.read_json_lines(path) == [{"order_id": 1}, {"order_id": 2}, {"order_id": 4}]
+
+
+@pytest.mark.skipif(durable.fcntl is None or not os.path.isdir("/proc/self/fd"), reason="нужны fcntl и /proc")
+def test_file_lock_closes_descriptor_when_flock_fails(tmp_path, monkeypatch):
+    lock_path = str(tmp_path / "data.lock")
+
+    def failing_flock(fd, operation):
+        raise OSError("ENOLCK")
+
+    before = len(os.listdir("/proc/self/fd"))
+    monkeypatch.setattr(durable.fcntl, "flock", failing_flock)
+    for _ in range(3):
+        with pytest.raises(OSError):
+            with durable.file_lock(lock_path):
+                pass
+    monkeypatch.undo()
+    assert len(os.listdir("/proc/self/fd")) == before
+    with durable.file_lock(lock_path):
+        with durable.file_lock(lock_path):
+            pass
+
+
+COUNTER = r"""
+import json, os, sys
+from valutatrade_hub.infra import durable
+
+path = os.path.abspath("counter.json")
+for _ in range(int(sys.argv[1])):
+    with durable.transaction(path + ".lock"):
+        with open(path, "r", encoding="utf-8") as f:
+            value = json.load(f)
+        durable.atomic_write_json(path, value + 1)
+"""
+
+
+@pytest.mark.skipif(durable.fcntl is None, reason="нужен fcntl")
+def test_concurrent_writers_do_not_lose_updates(tmp_path):
+    with open(tmp_path / "counter.json", "w", encoding="utf-8") as f:
+        json.dump(0, f)
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    writers = [subprocess.Popen([sys.executable, "-c", COUNTER, "25"], cwd=str(tmp_path), env=env) for _ in range(4)]
+    assert [writer.wait(timeout=60) for writer in writers] == [0] * 4
+    with open(tmp_path / "counter.json", "r", encoding="utf-8") as f:
+        assert json.load(f) == 100
@@ -0,0 +1,41 @@
+"""Журнал сделок в JSON Lines: перенос прежнего trades.json и дозапись без переписывания файла."""
+import json
+
+from valutatrade_hub.core import utils
+
+
+def _trade(n: int) -> dict:
+    return {"user_id": 1, "side": "buy", "currency": "EUR", "amount": float(n), "rate": 1.1,
+            "timestamp": f"2026-01-01T00:00:{n:02d}Z"}
+
+
+def test_legacy_array_is_migrated_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    legacy = tmp_path / "data" / "trades.json"
+    legacy.parent.mkdir()
+    legacy.write_text(json.dumps([_trade(1), _trade(2)]), encoding="utf-8")
+
+    utils.append_trades([_trade(3)])
+    assert not legacy.exists()
+    assert utils.load_trades() == [_trade(1), _trade(2), _trade(3)]
+
+
+def test_migration_interrupted_after_log_written_does_not_duplicate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "trades.json").write_text(json.dumps([_trade(1)]), encoding="utf-8")
+    (data / "trades.log").write_text(json.dumps(_trade(1)) + "\n", encoding="utf-8")  # упали до удаления trades.json
+
+    assert utils.load_trades() == [_trade(1)]
+    assert not (data / "trades.json").exists()
+
+
+def test_append_keeps_existing_bytes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    utils.append_trades([_trade(1)])
+    log = tmp_path / "data" / "trades.log"
+    before = log.read_bytes()
+    utils.append_trades([_trade(2)])
+    assert log.read_bytes().startswith(before)
+    assert list(utils.iter_trades()) == [_trade(1), _trade(2)]
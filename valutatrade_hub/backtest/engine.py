@@ -0,0 +1,162 @@
+import datetime
+import heapq
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+from valutatrade_hub.core.models import Portfolio, User
+
+from .strategies import Order, get_strategy
+
+# Ряд цен одной пары: (метки времени, цены в USD)
+Series = Tuple[List[str], List[float]]
+
+
+def stream_history(
+    records: Iterable[dict], start: Optional[str] = None, end: Optional[str] = None
+) -> Iterator[dict]:
+    """
+    Фильтрует поток записей истории (уже упорядоченный по времени) по интервалу.
+    Границы — префиксы ISO-времени включительно: end='2026-02-16' включает весь этот день.
+    Учитываются только пары к USD — в них выражены цены портфеля.
+    """
+    for record in records:
+        ts = record["timestamp"]
+        if start and ts < start:
+            continue
+        if end and ts[:len(end)] > end:
+            break
+        if record["to_currency"] == "USD":
+            yield record
+
+
+def collect_series(records: Iterable[dict]) -> Dict[str, Series]:
+    """Раскладывает поток истории в компактные ряды по валютам за один проход."""
+    series: Dict[str, Series] = {}
+    for record in records:
+        timestamps, prices = series.setdefault(record["from_currency"], ([], []))
+        timestamps.append(record["timestamp"])
+        prices.append(float(record["rate"]))
+    return series
+
+
+def _merge_ticks(series: Dict[str, Series], signals: Dict[str, List[int]]) -> Iterator[Tuple[str, str, float, int]]:
+    """Сливает ряды всех валют в один поток (время, валюта, цена, сигнал) в порядке времени."""
+    streams = [
+        zip(timestamps, itertools.repeat(code), prices, signals[code])
+        for code, (timestamps, prices) in series.items()
+    ]
+    return heapq.merge(*streams, key=lambda tick: tick[0])
+
+
+@dataclass
+class BacktestResult:
+    strategy: str
+    params: dict
+    initial_capital: float
+    final_value: float
+    trades: int
+    max_drawdown: float
+    holdings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total_return(self) -> float:
+        return self.final_value / self.initial_capital - 1.0 if self.initial_capital else 0.0
+
+    def report(self) -> str:
+        params = ", ".join(f"{k}={v}" for k, v in self.params.items()) or "по умолчанию"
+        holdings = ", ".join(f"{code}: {balance:.4f}" for code, balance in self.holdings.items() if balance > 0)
+        return (f"Стратегия {self.strategy} ({params}):\n"
+                f"  Начальный капитал: {self.initial_capital:.2f} USD\n"
+                f"  Итоговая стоимость: {self.final_value:.2f} USD ({self.total_return * 100:+.2f}%)\n"
+                f"  Сделок: {self.trades}, макс. просадка: {self.max_drawdown * 100:.2f}%\n"
+                f"  Остатки: {holdings or 'нет'}")
+
+
+def _simulated_portfolio(capital: float) -> Portfolio:
+    user = User.from_dict({
+        "user_id": 0, "username": "backtest", "hashed_password": "", "salt": "",
+        "registration_date": datetime.datetime.now().isoformat(),
+    })
+    portfolio = Portfolio(user)
+    portfolio.add_currency("USD")
+    portfolio.get_wallet("USD").balance = capital
+    return portfolio
+
+
+def _execute(portfolio: Portfolio, order: Order, price: float) -> bool:
+    """Исполняет заявку по цене тика через кошельки портфеля. False — заявка отклонена."""
+    if order.amount <= 0:
+        return False
+    usd = portfolio.get_wallet("USD")
+    if order.currency not in portfolio.wallets:
+        portfolio.add_currency(order.currency)
+    wallet = portfolio.get_wallet(order.currency)
+    try:
+        if order.side == "buy":
+            usd.withdraw(order.amount * price)
+            wallet.deposit(order.amount)
+        else:
+            wallet.withdraw(order.amount)
+            usd.deposit(order.amount * price)
+    except (InsufficientFundsError, ValueError):
+        return False
+    return True
+
+
+def run_backtest(series: Dict[str, Series], strategy_name: str, params: dict, capital: float = 1000.0) -> BacktestResult:
+    """
+    Прогоняет стратегию по рядам цен: сигналы считаются векторно по каждой паре,
+    затем тики всех пар сливаются по времени и заявки исполняются на симулированном Portfolio.
+    """
+    strategy = get_strategy(strategy_name, **params)
+    signals = {code: strategy.signals(prices) for code, (_, prices) in series.items()}
+    portfolio = _simulated_portfolio(capital)
+    prices: Dict[str, float] = {"USD": 1.0}
+    trades = 0
+    peak = capital
+    max_drawdown = 0.0
+
+    for _, code, price, signal in _merge_ticks(series, signals):
+        prices[code] = price
+        holding = portfolio.wallets[code].balance if code in portfolio.wallets else 0.0
+        order = strategy.orders(signal, code, price, portfolio.get_wallet("USD").balance, holding)
+        if order is not None and _execute(portfolio, order, price):
+            trades += 1
+        value = sum(w.balance * prices.get(c, 0.0) for c, w in portfolio.wallets.items())
+        peak = max(peak, value)
+        if peak:
+            max_drawdown = max(max_drawdown, 1.0 - value / peak)
+
+    final_value = sum(w.balance * prices.get(c, 0.0) for c, w in portfolio.wallets.items())
+    return BacktestResult(
+        strategy=strategy_name, params=params, initial_capital=capital, final_value=final_value,
+        trades=trades, max_drawdown=max_drawdown,
+        holdings={c: w.balance for c, w in portfolio.wallets.items()},
+    )
+
+
+def _run_one(args) -> BacktestResult:
+    return run_backtest(*args)
+
+
+def parameter_grid(grid: Dict[str, list]) -> List[dict]:
+    """Декартово произведение значений параметров: {'fast': [3, 5], 'slow': [8]} -> [{...}, {...}]."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def sweep(
+    series: Dict[str, Series], strategy_name: str, grid: Dict[str, list],
+    capital: float = 1000.0, workers: Optional[int] = None,
+) -> List[BacktestResult]:
+    """Перебор параметров стратегии в пуле процессов; результаты отсортированы по доходности."""
+    jobs = [(series, strategy_name, params, capital) for params in parameter_grid(grid)]
+    if len(jobs) <= 1 or workers == 1:
+        results = [_run_one(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_one, jobs))
+    return sorted(results, key=lambda r: r.total_return, reverse=True)
@@ -0,0 +1,117 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Type
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен: без него сигналы считаются на чистом Python
+    np = None
+
+BUY = 1
+SELL = -1
+HOLD = 0
+
+
+@dataclass
+class Order:
+    """Заявка стратегии: side — 'buy' или 'sell', amount — количество валюты."""
+    side: str
+    currency: str
+    amount: float
+
+
+class Strategy(ABC):
+    """
+    Торговая стратегия для бэктеста.
+
+    signals() вычисляет сигналы сразу для всего ряда цен одной пары (векторно),
+    orders() превращает сигнал в конкретную заявку с учётом состояния портфеля.
+    """
+
+    name: str = ""
+
+    def __init__(self, **params):
+        self.params = params
+
+    @abstractmethod
+    def signals(self, prices: Sequence[float]) -> List[int]:
+        """Возвращает сигнал BUY / SELL / HOLD для каждой точки ряда."""
+        pass
+
+    def orders(self, signal: int, currency: str, price: float, cash: float, holding: float) -> Optional[Order]:
+        """По умолчанию: на BUY тратим долю кэша stake, на SELL закрываем позицию целиком."""
+        if signal == BUY and cash > 0 and price > 0:
+            return Order("buy", currency, cash * float(self.params.get("stake", 0.25)) / price)
+        if signal == SELL and holding > 0:
+            return Order("sell", currency, holding)
+        return None
+
+
+def _sma(prices, window: int):
+    """Скользящее среднее; первые window-1 значений не определены (nan / None)."""
+    if np is not None:
+        arr = np.asarray(prices, dtype=float)
+        out = np.full(arr.shape, np.nan)
+        if len(arr) >= window:
+            csum = np.cumsum(np.insert(arr, 0, 0.0))
+            out[window - 1:] = (csum[window:] - csum[:-window]) / window
+        return out
+    out = [None] * len(prices)
+    acc = 0.0
+    for i, price in enumerate(prices):
+        acc += price
+        if i >= window:
+            acc -= prices[i - window]
+        if i >= window - 1:
+            out[i] = acc / window
+    return out
+
+
+class SmaCrossStrategy(Strategy):
+    """Пересечение быстрой и медленной скользящих средних (параметры fast, slow)."""
+
+    name = "sma"
+
+    def signals(self, prices: Sequence[float]) -> List[int]:
+        fast = _sma(prices, int(self.params.get("fast", 3)))
+        slow = _sma(prices, int(self.params.get("slow", 8)))
+        if np is not None:
+            above = np.nan_to_num(np.sign(fast - slow), nan=0.0)
+            cross = np.diff(above, prepend=0.0)
+            return np.where(cross > 0, BUY, np.where(cross < 0, SELL, HOLD)).tolist()
+        result, prev = [], 0
+        for f, s in zip(fast, slow):
+            state = 0 if f is None or s is None else (f > s) - (f < s)
+            result.append(BUY if state > prev else SELL if state < prev else HOLD)
+            prev = state
+        return result
+
+
+class MeanReversionStrategy(Strategy):
+    """Покупка при отклонении цены ниже SMA на threshold, продажа — выше SMA на threshold."""
+
+    name = "meanrev"
+
+    def signals(self, prices: Sequence[float]) -> List[int]:
+        window = int(self.params.get("window", 10))
+        threshold = float(self.params.get("threshold", 0.01))
+        sma = _sma(prices, window)
+        if np is not None:
+            arr = np.asarray(prices, dtype=float)
+            with np.errstate(invalid="ignore"):
+                dev = np.nan_to_num(arr / sma - 1.0, nan=0.0)
+            return np.where(dev < -threshold, BUY, np.where(dev > threshold, SELL, HOLD)).tolist()
+        result = []
+        for price, avg in zip(prices, sma):
+            dev = 0.0 if not avg else price / avg - 1.0
+            result.append(BUY if dev < -threshold else SELL if dev > threshold else HOLD)
+        return result
+
+
+STRATEGIES: Dict[str, Type[Strategy]] = {cls.name: cls for cls in (SmaCrossStrategy, MeanReversionStrategy)}
+
+
+def get_strategy(name: str, **params) -> Strategy:
+    if name not in STRATEGIES:
+        raise ValueError(f"Неизвестная стратегия '{name}'. Доступны: {', '.join(STRATEGIES)}")
+    return STRATEGIES[name](**params)
@@ -1,15 +1,70 @@
 import json
-import os
+import logging
 import shlex
+import sys
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
 
-from prettytable import PrettyTable
-
-from valutatrade_hub.core import usecases
-from valutatrade_hub.core.exceptions import ApiRequestError, CurrencyNotFoundError, InsufficientFundsError
+from valutatrade_hub.core.exceptions import (
+    AccessDeniedError,
+    ApiRequestError,
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+    ReadOnlyReplicaError,
+    ReplicaLagError,
+    StaleRateError,
+)
 from valutatrade_hub.infra.settings import SettingsLoader
-from valutatrade_hub.parser_service.config import ParserConfig
-from valutatrade_hub.parser_service.storage import RatesStorage
-from valutatrade_hub.parser_service.updater import RatesUpdater
+
+# Тяжёлые модули (requests, prettytable, parser_service, usecases с данными пользователей)
+# импортируются внутри обработчиков команд, которым они нужны: холодный старт не платит за всё сразу.
+
+logger = logging.getLogger(__name__)
+
+CURRENCY_HINT = "Проверьте поддерживаемые коды валют (например, USD, EUR, BTC, ETH)."
+
+HELP_TEXT = """
+Доступные команды:
+  register --username <имя> --password <пароль>        - регистрация нового пользователя
+  login    --username <имя> --password <пароль>        - вход в систему
+  show-portfolio [--base <валюта>]                      - показать портфель (база по умолчанию USD)
+  cache-stats                                           - попадания и промахи кэша show-portfolio
+  show-pnl [--base <валюта>]                            - себестоимость, P&L и доходность портфеля
+  show-risk [--base <валюта>] [--window N] [--confidence 0.95] - волатильность, корреляции и VaR портфеля
+  buy      --currency <код> --amount <количество>      - купить валюту (за USD)
+  sell     --currency <код> --amount <количество>      - продать валюту (за USD)
+  rebalance --targets USD=60,BTC=30,ETH=10 [--users <имя,...> | --all] [--dry-run]
+                                                        - привести портфели к целевым долям (--users/--all — администратор)
+  place-order --side buy|sell --pair <BASE_QUOTE> --amount <количество> --price <цена>
+                                                        - лимитная заявка во внутреннюю книгу пары
+  cancel-order --id <номер>                             - снять свою заявку (резерв возвращается)
+  show-orderbook [--pair <BASE_QUOTE>] [--depth N]      - стакан пары и свои открытые заявки
+  get-rate --from <валюта> --to <валюта>                - получить курс
+  update-rates                                          - принудительно обновить курсы из внешних API
+  show-rates [--currency <код>] [--base <валюта>] [--top N]
+             [--sort pair|rate|updated] [--desc] [--page N] [--limit N] - показать кэшированные курсы
+  backtest --strategy <sma|meanrev> [--from <дата>] [--to <дата>] [--capital N]
+           [--params k=v,...] [--sweep k=v1|v2,...]    - прогнать стратегию по истории курсов
+  export --dataset users|portfolios|trades|rates [--format csv|jsonl] [--output <файл>] [--gzip]
+         [--user <имя>] [--pair BASE_QUOTE] [--from <дата>] [--to <дата>] - потоковая выгрузка (чужих данных — администратор)
+  archive-history [--before <дата>] [--codec lzma|zlib]  - перенести закрытые дни истории в сжатый архив (администратор)
+  admin-stats [--top N] [--rebuild]                     - сводка по платформе: суммы и держатели по валютам (администратор)
+  replica-status                                        - роль процесса, отставание реплики и задержки журнала
+  replication-serve [--socket <путь>]                   - раздавать журнал изменений репликам по Unix-сокету
+  reshard --shards N                                    - разложить данные по N шардам, 1 — общие файлы (администратор)
+  profile on|off [--mode cprofile|sample] [--interval <мс>] - профилирование команд (pstats / collapsed stacks)
+  exit                                                   - выход
+  help                                                   - эта справка
+
+Неинтерактивный режим (вывод — JSON Lines с временем выполнения каждой команды):
+  project <команда> [аргументы]                         - выполнить одну команду
+  project --script <файл|->                             - выполнить команды из файла или stdin
+"""
+
+
+class CommandError(Exception):
+    """Ошибка команды, текст которой показывается пользователю как есть."""
+    pass
 
 
 def parse_args(args_line: str) -> dict:
@@ -26,24 +81,482 @@ def parse_args(args_line: str) -> dict:
                 kwargs[key] = True
                 i += 1
         else:
+            # Позиционные аргументы (profile on) собираются отдельно
+            kwargs.setdefault("_args", []).append(parts[i])
             i += 1
     return kwargs
 
 
+def _parse_number(value: str):
+    number = float(value)
+    return int(number) if number.is_integer() and "." not in value else number
+
+
+def parse_params(spec: str, multi: bool = False) -> dict:
+    """
+    Разбирает параметры стратегии: "fast=3,slow=8".
+    При multi=True значения — варианты для перебора через '|': "fast=3|5,slow=8|13".
+    """
+    params = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.partition("=")
+        if multi:
+            params[key] = [_parse_number(v) for v in value.split("|")]
+        else:
+            params[key] = _parse_number(value)
+    return params
+
+
 def show_help():
-    print("""
-Доступные команды:
-  register --username <имя> --password <пароль>        - регистрация нового пользователя
-  login    --username <имя> --password <пароль>        - вход в систему
-  show-portfolio [--base <валюта>]                      - показать портфель (база по умолчанию USD)
-  buy      --currency <код> --amount <количество>      - купить валюту (за USD)
-  sell     --currency <код> --amount <количество>      - продать валюту (за USD)
-  get-rate --from <валюта> --to <валюта>                - получить курс
-  update-rates                                          - принудительно обновить курсы из внешних API
-  show-rates [--currency <код>] [--top N] [--base <валюта>] - показать кэшированные курсы
-  exit                                                   - выход
-  help                                                   - эта справка
-""")
+    print(HELP_TEXT)
+
+
+def _str_arg(kwargs: dict, key: str, default: Optional[str] = None) -> Optional[str]:
+    """Строковое значение флага; флаг без значения (--base в конце строки) — ошибка команды."""
+    value = kwargs.get(key)
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise CommandError(f"Ошибка: --{key} требует значение")
+    return value
+
+
+def _require(kwargs: dict, *keys: str, usage: str) -> List[str]:
+    values = [kwargs.get(key) for key in keys]
+    if not all(isinstance(value, str) and value for value in values):
+        raise CommandError(f"Использование: {usage}")
+    return values
+
+
+# --- Обработчики команд: принимают разобранные аргументы, возвращают текст ответа ---
+
+def cmd_register(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    username, password = _require(kwargs, "username", "password",
+                                  usage="register --username <имя> --password <пароль>")
+    return usecases.register(username, password)
+
+
+def cmd_login(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    username, password = _require(kwargs, "username", "password",
+                                  usage="login --username <имя> --password <пароль>")
+    return usecases.login(username, password)
+
+
+def cmd_logout(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    usecases.logout()
+    return "Вы вышли из системы."
+
+
+def cmd_show_portfolio(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    return usecases.show_portfolio(_str_arg(kwargs, "base", "USD"))
+
+
+def cmd_cache_stats(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    return usecases.cache_stats()
+
+
+def cmd_show_pnl(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    return usecases.show_pnl(_str_arg(kwargs, "base"))
+
+
+def cmd_show_risk(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    window = _int_arg(kwargs, "window")
+    confidence = kwargs.get("confidence")
+    try:
+        confidence = float(confidence) if isinstance(confidence, str) else None
+    except ValueError:
+        raise CommandError("Ошибка: --confidence должен быть числом, например 0.95")
+    return usecases.show_risk(_str_arg(kwargs, "base"), window, confidence)
+
+
+def cmd_buy(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    currency, amount_str = _require(kwargs, "currency", "amount",
+                                    usage="buy --currency <код> --amount <количество>")
+    try:
+        return usecases.buy(currency, float(amount_str))
+    except ValueError as e:
+        raise CommandError(f"Ошибка ввода: {e}")
+
+
+def cmd_sell(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    currency, amount_str = _require(kwargs, "currency", "amount",
+                                    usage="sell --currency <код> --amount <количество>")
+    return usecases.sell(currency, float(amount_str))
+
+
+def cmd_rebalance(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    (targets,) = _require(kwargs, "targets",
+                          usage="rebalance --targets USD=60,BTC=30,ETH=10 [--users <имя,...> | --all] [--dry-run]")
+    users = kwargs.get("users")
+    usernames = [name.strip() for name in users.split(",") if name.strip()] if isinstance(users, str) else None
+    return usecases.rebalance(targets, usernames, all_users=kwargs.get("all") is True,
+                              dry_run=kwargs.get("dry-run") is True)
+
+
+def cmd_place_order(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    side, pair, amount, price = _require(
+        kwargs, "side", "pair", "amount", "price",
+        usage="place-order --side buy|sell --pair <BASE_QUOTE> --amount <количество> --price <цена>")
+    try:
+        amount, price = float(amount), float(price)
+    except ValueError:
+        raise CommandError("Ошибка ввода: --amount и --price должны быть числами")
+    return usecases.place_order(side, pair, amount, price)
+
+
+def cmd_cancel_order(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    (order_id,) = _require(kwargs, "id", usage="cancel-order --id <номер>")
+    if not order_id.lstrip("#").isdigit():
+        raise CommandError("Ошибка ввода: --id должен быть номером заявки")
+    return usecases.cancel_order(int(order_id.lstrip("#")))
+
+
+def cmd_show_orderbook(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    pair = kwargs.get("pair")
+    depth = _int_arg(kwargs, "depth")
+    return usecases.show_orderbook(pair if isinstance(pair, str) else None, depth or 10)
+
+
+def cmd_get_rate(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    from_curr, to_curr = _require(kwargs, "from", "to", usage="get-rate --from <валюта> --to <валюта>")
+    return usecases.get_rate(from_curr, to_curr)
+
+
+def cmd_update_rates(kwargs: dict) -> str:
+    # Можно добавить опциональный параметр --source, но пока не усложняем
+    # RatesUpdater один на процесс: его кэш валидаторов переиспользуется между update-rates
+    from valutatrade_hub.core import replication
+    from valutatrade_hub.parser_service.updater import get_updater
+
+    replication.require_primary()
+    try:
+        result = get_updater().run_update()
+    except Exception as e:
+        raise CommandError(f"Update failed: {str(e)}")
+
+    if result["errors"]:
+        raise CommandError("Update completed with errors:\n" + "\n".join(f"  - {err}" for err in result["errors"]))
+    if result["total"] == 0:
+        return f"Rates unchanged since last refresh ({result['unchanged']} checked)."
+    return (f"Update successful. Total rates updated: {result['total']} "
+            f"(unchanged: {result['unchanged']}). "
+            f"Last refresh: {result['last_refresh']}")
+
+
+def _int_arg(kwargs: dict, key: str, minimum: Optional[int] = None) -> Optional[int]:
+    """Целое значение флага; minimum — наименьшее допустимое (меньшее — ошибка команды)."""
+    value = kwargs.get(key)
+    if value is None:
+        return None
+    if value is True:
+        raise CommandError(f"Ошибка: --{key} требует значение")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise CommandError(f"Ошибка: --{key} должен быть целым числом")
+    if minimum is not None and number < minimum:
+        raise CommandError(f"Ошибка: --{key} должен быть не меньше {minimum}")
+    return number
+
+
+def cmd_show_rates(kwargs: dict) -> Iterator[str]:
+    from valutatrade_hub.core import usecases
+    return usecases.show_rates(
+        currency=_str_arg(kwargs, "currency"),
+        base=_str_arg(kwargs, "base"),
+        sort=_str_arg(kwargs, "sort", "pair"),
+        descending=bool(kwargs.get("desc")),
+        page=_int_arg(kwargs, "page", minimum=1) or 1,
+        limit=_int_arg(kwargs, "limit", minimum=1),
+        top=_int_arg(kwargs, "top", minimum=1),
+    )
+
+
+def cmd_backtest(kwargs: dict) -> str:
+    from valutatrade_hub.backtest import engine as backtest_engine
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    (strategy,) = _require(kwargs, "strategy",
+                           usage="backtest --strategy <sma|meanrev> [--from <дата>] [--to <дата>]")
+    settings = SettingsLoader()
+    data_path = settings.get('data_path', 'data/')
+    storage = RatesStorage(data_path + "exchange_rates.json", data_path + "rates.json")
+    start, end = _str_arg(kwargs, "from"), _str_arg(kwargs, "to")
+    records = backtest_engine.stream_history(storage.iter_history(start, end), start, end)
+    series = backtest_engine.collect_series(records)
+    if not series:
+        return "В истории нет курсов за указанный период."
+    capital = float(_str_arg(kwargs, "capital", "1000"))
+    sweep = _str_arg(kwargs, "sweep")
+    if sweep:
+        results = backtest_engine.sweep(series, strategy, parse_params(sweep, multi=True), capital)
+        return "\n".join(result.report() for result in results)
+    params = parse_params(_str_arg(kwargs, "params", ""))
+    return backtest_engine.run_backtest(series, strategy, params, capital).report()
+
+
+def cmd_export(kwargs: dict) -> Union[str, Iterator[str]]:
+    from valutatrade_hub.core import export, usecases
+
+    (dataset,) = _require(kwargs, "dataset",
+                          usage="export --dataset users|portfolios|trades|rates [--format csv|jsonl] "
+                                "[--output <файл>] [--gzip] [--user <имя>] [--pair BASE_QUOTE] "
+                                "[--from <дата>] [--to <дата>]")
+    fmt = _str_arg(kwargs, "format", "csv")
+    if fmt not in export.FORMATS or dataset not in export.DATASETS:
+        raise CommandError(f"Наборы: {', '.join(export.DATASETS)}; форматы: {', '.join(export.FORMATS)}")
+    pair = _str_arg(kwargs, "pair")
+    flt = export.ExportFilter(
+        user_id=usecases.export_user_id(_str_arg(kwargs, "user")),
+        pair=pair.upper() if pair else None,
+        start=_str_arg(kwargs, "from"),
+        end=_str_arg(kwargs, "to"),
+    )
+    output = kwargs.get("output")
+    if isinstance(output, str) and output != "-":
+        count, path = export.write(dataset, fmt, output, flt, compress=kwargs.get("gzip") is True)
+        return f"Выгружено записей: {count} → {path}"
+    if kwargs.get("gzip") is True:
+        raise CommandError("--gzip требует --output <файл>")
+    # Без файла выгрузка печатается построчно по мере чтения
+    return (line.rstrip("\n") for line in export.render(dataset, export.rows(dataset, flt), fmt))
+
+
+def cmd_reshard(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    count = _int_arg(kwargs, "shards")
+    if count is None or count < 1:
+        raise CommandError("Использование: reshard --shards N (N >= 1)")
+    return usecases.reshard(count)
+
+
+def cmd_archive_history(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    return usecases.archive_history(before=_str_arg(kwargs, "before"), codec=_str_arg(kwargs, "codec"))
+
+
+def cmd_admin_stats(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    return usecases.admin_stats(top=_int_arg(kwargs, "top", minimum=1), rebuild=kwargs.get("rebuild") is True)
+
+
+def cmd_replica_status(kwargs: dict) -> str:
+    from valutatrade_hub.core import usecases
+    return usecases.replica_status()
+
+
+def cmd_replication_serve(kwargs: dict) -> str:
+    from valutatrade_hub.core import replication, utils
+    from valutatrade_hub.infra import changelog
+
+    socket_path = kwargs.get("socket")
+    if not isinstance(socket_path, str):
+        source = SettingsLoader().get('replication_source', 'file')
+        socket_path = source[len("unix:"):] if source.startswith("unix:") else utils.get_data_path('replication.sock')
+    log_path = utils.get_data_path(replication.LOG_FILENAME)
+    # Команда блокирует процесс до Ctrl+C; о запуске сообщаем в лог, вывод — по завершении
+    logger.info(f"Serving change log {log_path} on {socket_path}")
+    try:
+        changelog.serve(log_path, socket_path)
+    except KeyboardInterrupt:
+        pass
+    return "Раздача журнала остановлена."
+
+
+def cmd_profile(kwargs: dict) -> str:
+    from valutatrade_hub.infra import profiling
+
+    action = (kwargs.get("_args") or ["status"])[0]
+    if action == "on":
+        interval = _str_arg(kwargs, "interval")
+        output_dir = profiling.enable(_str_arg(kwargs, "mode", "cprofile"),
+                                      interval_ms=float(interval) if interval else None)
+        return f"Профилирование включено. Результаты будут записаны в {output_dir} при 'profile off'."
+    if action == "off":
+        if not profiling.is_enabled():
+            return "Профилирование не было включено."
+        summary, paths = profiling.disable()
+        return "\n".join([summary, "Файлы профиля:"] + [f"  {path}" for path in paths])
+    if action == "status":
+        return "Профилирование " + ("включено." if profiling.is_enabled() else "выключено.")
+    raise CommandError("Использование: profile on|off [--mode cprofile|sample] [--interval <мс>]")
+
+
+def cmd_help(kwargs: dict) -> str:
+    return HELP_TEXT
+
+
+# Обработчик возвращает текст или итератор строк (такой вывод печатается потоково)
+COMMANDS: Dict[str, Callable[[dict], Union[str, Iterable[str]]]] = {
+    "register": cmd_register,
+    "login": cmd_login,
+    "logout": cmd_logout,
+    "show-portfolio": cmd_show_portfolio,
+    "cache-stats": cmd_cache_stats,
+    "show-pnl": cmd_show_pnl,
+    "show-risk": cmd_show_risk,
+    "buy": cmd_buy,
+    "sell": cmd_sell,
+    "rebalance": cmd_rebalance,
+    "place-order": cmd_place_order,
+    "cancel-order": cmd_cancel_order,
+    "show-orderbook": cmd_show_orderbook,
+    "get-rate": cmd_get_rate,
+    "update-rates": cmd_update_rates,
+    "show-rates": cmd_show_rates,
+    "backtest": cmd_backtest,
+    "export": cmd_export,
+    "reshard": cmd_reshard,
+    "archive-history": cmd_archive_history,
+    "admin-stats": cmd_admin_stats,
+    "replica-status": cmd_replica_status,
+    "replication-serve": cmd_replication_serve,
+    "profile": cmd_profile,
+    "help": cmd_help,
+}
+
+
+def _error_text(error: Exception) -> str:
+    if isinstance(error, (CommandError, InsufficientFundsError)):
+        return str(error)  # выводим сообщение как есть
+    if isinstance(error, CurrencyNotFoundError):
+        return f"Ошибка: {error}\n{CURRENCY_HINT}"
+    if isinstance(error, StaleRateError):
+        return f"Сделка не выполнена: {error}"
+    if isinstance(error, ApiRequestError):
+        return f"Ошибка API: {error}. Повторите попытку позже."
+    return f"Ошибка: {error}"
+
+
+def execute(line: str, stream: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Выполняет одну командную строку.
+    Возвращает {'command', 'ok', 'output', 'elapsed_ms'}; ошибки команд превращаются в текст ответа.
+    Если передан stream, построчный вывод команды отдаётся в него по мере генерации (output = None).
+    """
+    parts = line.split(maxsplit=1)
+    cmd = parts[0]
+    args_line = parts[1] if len(parts) > 1 else ""
+    start = time.perf_counter()
+    handler = COMMANDS.get(cmd)
+    if handler is None:
+        ok, output = False, "Неизвестная команда. Введите 'help' для справки."
+    else:
+        try:
+            ok, output = True, handler(parse_args(args_line))
+            if not isinstance(output, str):
+                if stream is not None:
+                    for text_line in output:
+                        stream(text_line)
+                    output = None
+                else:
+                    output = "\n".join(output)
+        except (CommandError, ValueError, InsufficientFundsError, CurrencyNotFoundError, ApiRequestError,
+                StaleRateError, AccessDeniedError, ReadOnlyReplicaError, ReplicaLagError) as e:
+            ok, output = False, _error_text(e)
+        except Exception as e:
+            # Непредвиденная ошибка одной команды не должна прерывать интерактивный цикл и пакет --script
+            logger.exception(f"Command '{cmd}' failed")
+            ok, output = False, f"Внутренняя ошибка: {e}"
+    return {
+        "command": cmd,
+        "ok": ok,
+        "output": output,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def _emit(result: dict) -> None:
+    print(json.dumps(result, ensure_ascii=False), flush=True)
+
+
+class _StreamedResult:
+    """
+    Ответ пакетного и разового режима с построчным выводом (stream для execute): строки сразу
+    пишутся в stdout внутри поля output того же JSON-объекта, что печатает _emit, — без накопления
+    всего вывода в памяти. Если строк не было, finish печатает ответ через _emit.
+    """
+
+    def __init__(self):
+        self.started = False
+
+    def __call__(self, text_line: str) -> None:
+        sys.stdout.write('\\n' if self.started else '{"output": "')
+        sys.stdout.write(json.dumps(text_line, ensure_ascii=False)[1:-1])
+        self.started = True
+
+    def finish(self, result: dict) -> None:
+        if not self.started:
+            _emit(result if result["output"] is not None else {**result, "output": ""})
+            return
+        # Ошибка посреди вывода (output — её текст) дописывается последней строкой, как в интерактивном режиме
+        if result["output"] is not None:
+            self(result["output"])
+        rest = json.dumps({key: value for key, value in result.items() if key != "output"}, ensure_ascii=False)
+        sys.stdout.write('", ' + rest[1:] + "\n")
+        sys.stdout.flush()
+
+
+def _execute_streamed(line: str) -> dict:
+    stream = _StreamedResult()
+    result = execute(line, stream=stream)
+    stream.finish(result)
+    return result
+
+
+def run_script(path: str) -> int:
+    """
+    Пакетный режим: команды построчно из файла (или stdin при path='-'),
+    пустые строки и строки с '#' пропускаются. Состояние (вход, настройки, RatesUpdater)
+    общее для всех команд. Возвращает 1, если хотя бы одна команда завершилась ошибкой.
+    """
+    source = sys.stdin if path == "-" else open(path, 'r', encoding='utf-8')
+    failed = False
+    try:
+        for raw_line in source:
+            line = raw_line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line == "exit":
+                break
+            result = _execute_streamed(line)
+            failed = failed or not result["ok"]
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    return 1 if failed else 0
+
+
+def run(argv: List[str]) -> int:
+    """
+    Точка входа CLI: без аргументов — интерактивный режим,
+    '--script <файл|->' — пакетный, иначе аргументы — одна команда.
+    VALUTATRADE_PROFILE=cprofile|sample профилирует все команды процесса.
+    """
+    from valutatrade_hub.infra import profiling
+    profiling.enable_from_env()
+
+    if not argv:
+        main_loop()
+        return 0
+    if argv[0] == "--script":
+        return run_script(argv[1] if len(argv) > 1 else "-")
+    result = _execute_streamed(shlex.join(argv))
+    return 0 if result["ok"] else 1
 
 
 def main_loop():
@@ -57,187 +570,9 @@ def main_loop():
             if line == "exit":
                 print("До свидания!")
                 break
-            if line == "help":
-                show_help()
-                continue
-
-            parts = line.split(maxsplit=1)
-            cmd = parts[0]
-            args_line = parts[1] if len(parts) > 1 else ""
-            kwargs = parse_args(args_line)
-
-            match cmd:
-                case "register":
-                    username = kwargs.get("username")
-                    password = kwargs.get("password")
-                    if not username or not password:
-                        print("Использование: register --username <имя> --password <пароль>")
-                        continue
-                    try:
-                        result = usecases.register(username, password)
-                        print(result)
-                    except ValueError as e:
-                        print(f"Ошибка: {e}")
-
-                case "update-rates":
-                    # Можно добавить опциональный параметр --source, но пока не усложняем
-                    try:
-                        settings = SettingsLoader()
-                        config = ParserConfig()  # используем переменные окружения
-                        # Переопределим пути из настроек, если нужно
-                        config.RATES_FILE_PATH = settings.get('data_path', 'data/') + "rates.json"
-                        config.HISTORY_FILE_PATH = settings.get('data_path', 'data/') + "exchange_rates.json"
-
-                        storage = RatesStorage(config.HISTORY_FILE_PATH, config.RATES_FILE_PATH)
-                        updater = RatesUpdater(config, storage)
-                        result = updater.run_update()
-
-                        if result["errors"]:
-                            print("Update completed with errors:")
-                            for err in result["errors"]:
-                                print(f"  - {err}")
-                        else:
-                            print(
-                                f"Update successful. Total rates updated: {result['total']}."
-                                f"Last refresh: {result['last_refresh']}"
-                                )
-                    except Exception as e:
-                        print(f"Update failed: {str(e)}")
-
-                case "show-rates":
-                    currency = kwargs.get("currency")
-                    top = kwargs.get("top")
-                    base = kwargs.get("base", "USD")
-                    try:
-                        settings = SettingsLoader()
-                        rates_path = settings.get('data_path', 'data/') + "rates.json"
-                        if not os.path.exists(rates_path):
-                            print("Локальный кеш курсов пуст. Выполните 'update-rates', чтобы загрузить данные.")
-                            continue
-
-                        with open(rates_path, 'r', encoding='utf-8') as f:
-                            cache = json.load(f)
-
-                        pairs = cache.get("pairs", {})
-                        last_refresh = cache.get("last_refresh", "unknown")
-
-                        if not pairs:
-                            print("В кеше нет данных.")
-                            continue
-
-                        # Фильтрация по валюте (если указана)
-                        if currency:
-                            filtered = {k: v for k, v in pairs.items() if k.startswith(currency.upper() + '_')}
-                            if not filtered:
-                                print(f"Курс для '{currency}' не найден в кеше.")
-                                continue
-                            pairs = filtered
-
-                        # Преобразуем в список для сортировки
-                        items = list(pairs.items())
-                        if top:
-                            try:
-                                top_n = int(top)
-                                items.sort(key=lambda x: x[1]['rate'], reverse=True)
-                                items = items[:top_n]
-                            except ValueError:
-                                pass
-
-                        # Создаём таблицу PrettyTable
-                        table = PrettyTable()
-                        table.field_names = ["Pair", "Rate"]
-                        for pair, data in items:
-                            # Округление до 5 знаков для красоты
-                            table.add_row([pair, f"{data['rate']:.5f}"])
-
-                        print(f"Rates from cache (updated at {last_refresh}):")
-                        print(table)
-
-                    except Exception as e:
-                        print(f"Ошибка при показе курсов: {e}")
-
-                case "login":
-                    username = kwargs.get("username")
-                    password = kwargs.get("password")
-                    if not username or not password:
-                        print("Использование: login --username <имя> --password <пароль>")
-                        continue
-                    try:
-                        result = usecases.login(username, password)
-                        print(result)
-                    except ValueError as e:
-                        print(f"Ошибка: {e}")
-
-                case "show-portfolio":
-                    base = kwargs.get("base", "USD")
-                    try:
-                        result = usecases.show_portfolio(base)
-                        print(result)
-                    except ValueError as e:
-                        print(f"Ошибка: {e}")
-                    except CurrencyNotFoundError as e:
-                        print(f"Ошибка: {e}\nПроверьте поддерживаемые коды валют (например, USD, EUR, BTC, ETH).")
-
-                case "buy":
-                    currency = kwargs.get("currency")
-                    amount_str = kwargs.get("amount")
-                    if not currency or not amount_str:
-                        print("Использование: buy --currency <код> --amount <количество>")
-                        continue
-                    try:
-                        amount = float(amount_str)
-                        result = usecases.buy(currency, amount)
-                        print(result)
-                    except ValueError as e:
-                        print(f"Ошибка ввода: {e}")
-                    except InsufficientFundsError as e:
-                        print(e)  # выводим сообщение как есть
-                    except CurrencyNotFoundError as e:
-                        print(f"Ошибка: {e}\nПроверьте поддерживаемые коды валют (например, USD, EUR, BTC, ETH).")
-                    except ApiRequestError as e:
-                        print(f"Ошибка API: {e}. Повторите попытку позже.")
-
-                case "sell":
-                    currency = kwargs.get("currency")
-                    amount_str = kwargs.get("amount")
-                    if not currency or not amount_str:
-                        print("Использование: sell --currency <код> --amount <количество>")
-                        continue
-                    try:
-                        amount = float(amount_str)
-                        result = usecases.sell(currency, amount)
-                        print(result)
-                    except ValueError as e:
-                        print(f"Ошибка: {e}")
-                    except InsufficientFundsError as e:
-                        print(e)
-                    except CurrencyNotFoundError as e:
-                        print(f"Ошибка: {e}\nПроверьте поддерживаемые коды валют (например, USD, EUR, BTC, ETH).")
-                    except ApiRequestError as e:
-                        print(f"Ошибка API: {e}. Повторите попытку позже.")
-
-                case "get-rate":
-                    from_curr = kwargs.get("from")
-                    to_curr = kwargs.get("to")
-                    if not from_curr or not to_curr:
-                        print("Использование: get-rate --from <валюта> --to <валюта>")
-                        continue
-                    try:
-                        result = usecases.get_rate(from_curr, to_curr)
-                        print(result)
-                    except ValueError as e:
-                        print(f"Ошибка: {e}")
-                    except CurrencyNotFoundError as e:
-                        print(f"Ошибка: {e}\nПроверьте поддерживаемые коды валют (например, USD, EUR, BTC, ETH).")
-                    except ApiRequestError as e:
-                        print(f"Ошибка API: {e}. Повторите попытку позже.")
-
-                case "logout":
-                    usecases.logout()
-                    print("Вы вышли из системы.")
-
-                case _:
-                    print("Неизвестная команда. Введите 'help' для справки.")
+            result = execute(line, stream=print)
+            if result["output"] is not None:
+                print(result["output"])
         except KeyboardInterrupt:
             print("\nВыход.")
             break
@@ -0,0 +1,189 @@
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from valutatrade_hub.core.models import Portfolio
+from valutatrade_hub.infra import durable
+
+AGGREGATES_FILENAME = 'aggregates.json'
+# Во сколько раз больше записей, чем показывается, отслеживает TopHolders:
+# запас на держателей, чьи балансы уменьшатся, до пересчёта
+TOP_CAPACITY_FACTOR = 4
+
+
+def aggregates_path(data_dir: str) -> str:
+    return os.path.join(data_dir, AGGREGATES_FILENAME)
+
+
+class TopHolders:
+    """
+    Крупнейшие держатели одной валюты без перебора всех портфелей.
+
+    Отслеживается не больше capacity записей {user_id: баланс}; bound — верхняя граница
+    баланса любого неотслеживаемого держателя. Вытесненная или уменьшившаяся ниже bound запись
+    поднимает bound до своего баланса, неотслеживаемый держатель с балансом выше bound
+    становится отслеживаемым. Записи не ниже bound — точно крупнейшие среди всех держателей.
+    """
+
+    def __init__(self, capacity: int, entries: Optional[Dict[int, float]] = None, bound: float = 0.0):
+        self.capacity = capacity
+        self.entries: Dict[int, float] = entries or {}
+        self.bound = bound
+
+    def update(self, user_id: int, balance: float) -> None:
+        entries = self.entries
+        if user_id in entries:
+            if balance > 0 and balance >= self.bound:
+                entries[user_id] = balance
+                return
+            del entries[user_id]
+            if balance > self.bound:
+                self.bound = balance
+            return
+        if balance <= 0 or balance <= self.bound:
+            return
+        entries[user_id] = balance
+        if len(entries) > self.capacity:
+            smallest = min(entries, key=entries.get)
+            self.bound = max(self.bound, entries.pop(smallest))
+
+    def top(self, k: int) -> Tuple[List[Tuple[int, float]], bool]:
+        """k крупнейших (user_id, баланс) и признак точности: False — нужен rebuild()."""
+        ranked = sorted(self.entries.items(), key=lambda item: (-item[1], item[0]))[:k]
+        exact = self.bound == 0 or (len(ranked) == k and ranked[-1][1] >= self.bound)
+        return ranked, exact
+
+    @classmethod
+    def build(cls, capacity: int, balances: Iterable[Tuple[int, float]]) -> "TopHolders":
+        ranked = sorted(((uid, b) for uid, b in balances if b > 0), key=lambda item: (-item[1], item[0]))
+        bound = ranked[capacity][1] if len(ranked) > capacity else 0.0
+        return cls(capacity, dict(ranked[:capacity]), bound)
+
+
+class CurrencyTotals:
+    """Сводка по валюте: сумма балансов, кошельков всего, держателей (кошельков с ненулевым балансом)."""
+
+    def __init__(self, capacity: int):
+        self.total = 0.0
+        self.wallets = 0
+        self.holders = 0
+        self.top = TopHolders(capacity)
+
+    def to_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "wallets": self.wallets,
+            "holders": self.holders,
+            "top": [[uid, balance] for uid, balance in self.top.entries.items()],
+            "bound": self.top.bound,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, capacity: int) -> "CurrencyTotals":
+        totals = cls(capacity)
+        totals.total = data["total"]
+        totals.wallets = data["wallets"]
+        totals.holders = data["holders"]
+        totals.top = TopHolders(capacity, {int(uid): balance for uid, balance in data["top"]}, data["bound"])
+        return totals
+
+
+class PlatformAggregates:
+    """
+    Сводные показатели платформы (data/aggregates.json): число пользователей и по каждой валюте
+    сумма балансов, кошельки, держатели и крупнейшие держатели.
+
+    Поддерживаются приращениями: портфели сообщают о каждом новом кошельке и изменении баланса
+    (Portfolio.set_observer), поэтому ответ не требует перебора портфелей. build() пересчитывает
+    всё с нуля; dirty — есть изменения, ещё не записанные save().
+    """
+
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.users = 0
+        self.currencies: Dict[str, CurrencyTotals] = {}
+        self.dirty = False
+
+    @property
+    def capacity(self) -> int:
+        return self.top_k * TOP_CAPACITY_FACTOR
+
+    def _totals(self, code: str) -> CurrencyTotals:
+        totals = self.currencies.get(code)
+        if totals is None:
+            totals = self.currencies[code] = CurrencyTotals(self.capacity)
+        return totals
+
+    def add_portfolio(self, portfolio: Portfolio) -> None:
+        """Новый пользователь с уже заведёнными кошельками."""
+        self.users += 1
+        self.dirty = True
+        for code, wallet in portfolio.wallets.items():
+            self.wallet_added(portfolio.user.user_id, code, wallet.balance)
+
+    def wallet_added(self, user_id: int, code: str, balance: float) -> None:
+        self._totals(code).wallets += 1
+        self.balance_changed(user_id, code, 0.0, balance)
+        self.dirty = True
+
+    def balance_changed(self, user_id: int, code: str, old: float, new: float) -> None:
+        totals = self._totals(code)
+        totals.total += new - old
+        if old <= 0 < new:
+            totals.holders += 1
+        elif new <= 0 < old:
+            totals.holders -= 1
+        totals.top.update(user_id, new)
+        self.dirty = True
+
+    @classmethod
+    def build(cls, portfolios: Iterable[Portfolio], top_k: int = 10) -> "PlatformAggregates":
+        """Пересчёт с нуля перебором всех портфелей."""
+        aggregates = cls(top_k)
+        balances: Dict[str, List[Tuple[int, float]]] = {}
+        sums: Dict[str, List[float]] = {}
+        for portfolio in portfolios:
+            aggregates.users += 1
+            user_id = portfolio.user.user_id
+            for code, wallet in portfolio.wallets.items():
+                totals = aggregates._totals(code)
+                totals.wallets += 1
+                if wallet.balance > 0:
+                    totals.holders += 1
+                    balances.setdefault(code, []).append((user_id, wallet.balance))
+                    sums.setdefault(code, []).append(wallet.balance)
+        for code, totals in aggregates.currencies.items():
+            # fsum: без накопленной ошибки округления, которую дают приращения
+            totals.total = math.fsum(sums.get(code, ()))
+            totals.top = TopHolders.build(aggregates.capacity, balances.get(code, ()))
+        return aggregates
+
+    def to_dict(self) -> dict:
+        return {
+            "top_k": self.top_k,
+            "users": self.users,
+            "currencies": {code: totals.to_dict() for code, totals in sorted(self.currencies.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PlatformAggregates":
+        aggregates = cls(data.get("top_k", 10))
+        aggregates.users = data["users"]
+        aggregates.currencies = {code: CurrencyTotals.from_dict(totals, aggregates.capacity)
+                                 for code, totals in data["currencies"].items()}
+        return aggregates
+
+    @classmethod
+    def load(cls, path: str) -> Optional["PlatformAggregates"]:
+        """Сводка из файла или None, если её ещё нет."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def save(self, path: str) -> None:
+        """Записывает сводку (внутри transaction — при общей фиксации вместе с шардами)."""
+        durable.atomic_write_json(path, self.to_dict())
+        self.dirty = False
@@ -0,0 +1,141 @@
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class Lot:
+    """Партия валюты, купленная одной сделкой (цена — в USD за единицу)."""
+    amount: float
+    price: float
+
+
+class Position:
+    """
+    Позиция по одной валюте: FIFO-лоты, средняя цена покупки и реализованный P&L (в USD).
+    Продажи сверх учтённых лотов (остатки, появившиеся до ведения журнала) не имеют
+    себестоимости и считаются отдельно как untracked.
+    """
+
+    def __init__(self, currency: str):
+        self.currency = currency
+        self.lots: deque = deque()
+        self.quantity = 0.0
+        self.avg_cost = 0.0
+        self.realized = 0.0
+        self.untracked_sold = 0.0
+
+    def buy(self, amount: float, price: float) -> None:
+        self.avg_cost = (self.quantity * self.avg_cost + amount * price) / (self.quantity + amount)
+        self.quantity += amount
+        self.lots.append(Lot(amount, price))
+
+    def sell(self, amount: float, price: float) -> None:
+        remaining = amount
+        while remaining > 0 and self.lots:
+            lot = self.lots[0]
+            used = min(lot.amount, remaining)
+            self.realized += used * (price - lot.price)
+            lot.amount -= used
+            remaining -= used
+            if lot.amount <= 1e-12:
+                self.lots.popleft()
+        self.untracked_sold += remaining
+        self.quantity = max(0.0, self.quantity - (amount - remaining))
+        if self.quantity <= 1e-12:
+            self.quantity = 0.0
+            self.avg_cost = 0.0
+
+    @property
+    def cost_basis(self) -> float:
+        """FIFO-себестоимость оставшихся лотов в USD."""
+        return sum(lot.amount * lot.price for lot in self.lots)
+
+    def unrealized(self, price: float) -> float:
+        return self.quantity * price - self.cost_basis
+
+
+def apply_trade(positions: Dict[str, Position], trade: dict) -> None:
+    """Учитывает одну сделку журнала в позициях пользователя."""
+    code = trade["currency"]
+    position = positions.get(code)
+    if position is None:
+        position = positions[code] = Position(code)
+    if trade["side"] == "buy":
+        position.buy(trade["amount"], trade["rate"])
+    else:
+        position.sell(trade["amount"], trade["rate"])
+
+
+def build_positions(trades: Iterable[dict]) -> Dict[str, Position]:
+    positions: Dict[str, Position] = {}
+    for trade in trades:
+        apply_trade(positions, trade)
+    return positions
+
+
+def _apply_to_holdings(holdings: Dict[str, float], trade: dict, sign: float) -> None:
+    """Изменение балансов сделкой (sign=-1 — откат сделки)."""
+    delta = sign * trade["amount"]
+    cash = sign * trade["amount"] * trade["rate"]
+    if trade["side"] == "sell":
+        delta, cash = -delta, -cash
+    holdings[trade["currency"]] = holdings.get(trade["currency"], 0.0) + delta
+    holdings["USD"] = holdings.get("USD", 0.0) - cash
+
+
+def _value(holdings: Dict[str, float], prices: Dict[str, float], base: str) -> Optional[float]:
+    base_price = prices.get(base)
+    if not base_price:
+        return None
+    return sum(balance * prices[code] for code, balance in holdings.items() if code in prices) / base_price
+
+
+def time_weighted_return(
+    trades: List[dict],
+    history: Iterable[dict],
+    holdings: Dict[str, float],
+    current_prices: Dict[str, float],
+    base: str = "USD",
+) -> Optional[Tuple[float, str]]:
+    """
+    Доходность, взвешенная по времени, с момента первой сделки пользователя.
+
+    trades — сделки пользователя в порядке времени, history — поток записей истории
+    курсов в порядке времени, holdings — текущие балансы, current_prices — цены в USD сейчас.
+    Сделки и история сливаются в один поток (heapq.merge) за один проход:
+    история лишь обновляет цены, а каждая сделка закрывает подпериод (стоимость до сделки
+    относительно начала подпериода) и открывает новый после неё.
+    Возвращает (доходность, время начала) или None, если сделок нет.
+    """
+    if not trades:
+        return None
+
+    # Восстанавливаем балансы на момент перед первой сделкой
+    state = dict(holdings)
+    for trade in reversed(trades):
+        _apply_to_holdings(state, trade, -1.0)
+
+    prices = {"USD": 1.0}
+    history_events = ((r["timestamp"], 0, r) for r in history if r["to_currency"] == "USD")
+    trade_events = ((t["timestamp"], 1, t) for t in trades)
+
+    growth = 1.0
+    period_start = None
+    for _, kind, item in heapq.merge(history_events, trade_events, key=lambda e: (e[0], e[1])):
+        if kind == 0:
+            prices[item["from_currency"]] = item["rate"]
+            continue
+        prices.setdefault(item["currency"], item["rate"])
+        value = _value(state, prices, base)
+        if period_start and value is not None:
+            growth *= value / period_start
+        _apply_to_holdings(state, item, 1.0)
+        period_start = _value(state, prices, base)
+
+    prices.update(current_prices)
+    final = _value(state, prices, base)
+    if period_start and final is not None:
+        growth *= final / period_start
+    return growth - 1.0, trades[0]["timestamp"]
@@ -1,7 +1,9 @@
 # valutatrade_hub/core/currencies.py
 
+import json
+import os
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from .exceptions import CurrencyNotFoundError
 
@@ -60,26 +62,112 @@ class CryptoCurrency(Currency):
 
 
 # --- Реестр валют (фабрика) ---
-_currency_registry: Dict[str, Currency] = {
-    "USD": FiatCurrency("USD", "US Dollar", "United States"),
-    "EUR": FiatCurrency("EUR", "Euro", "Eurozone"),
-    "RUB": FiatCurrency("RUB", "Russian Ruble", "Russia"),
-    "BTC": CryptoCurrency("BTC", "Bitcoin", "SHA-256", 1_200_000_000_000),
-    "ETH": CryptoCurrency("ETH", "Ethereum", "Ethash", 500_000_000_000),
-}
+# Валюты загружаются из data/currencies.json (путь — настройка currencies_file) и дополняются
+# метаданными провайдеров курсов (ParserConfig). Поиск идёт по заранее построенному индексу,
+# где уже лежат код, алиасы и символы во всех нормализованных вариантах.
 
+_BUILTIN_CURRENCIES = [
+    {"code": "USD", "type": "fiat", "name": "US Dollar", "issuing_country": "United States", "symbol": "$"},
+    {"code": "EUR", "type": "fiat", "name": "Euro", "issuing_country": "Eurozone", "symbol": "€"},
+    {"code": "RUB", "type": "fiat", "name": "Russian Ruble", "issuing_country": "Russia", "symbol": "₽"},
+    {"code": "BTC", "type": "crypto", "name": "Bitcoin", "algorithm": "SHA-256", "market_cap": 1_200_000_000_000},
+    {"code": "ETH", "type": "crypto", "name": "Ethereum", "algorithm": "Ethash", "market_cap": 500_000_000_000},
+]
 
-def get_currency(code: str) -> Currency:
+_currency_registry: Dict[str, Currency] = {}
+_lookup_index: Dict[str, Currency] = {}
+_aliases: Dict[str, Tuple[str, ...]] = {}
+_registry_loaded = False
+
+
+def _normalize(key: str) -> str:
+    return key.strip().upper()
+
+
+def _index_keys(currency: Currency, keys: Iterable[str]) -> None:
+    for key in (currency.code, *keys):
+        for variant in (key, key.upper(), key.lower(), _normalize(key)):
+            _lookup_index[variant] = currency
+
+
+def register_currency(currency: Currency, aliases: Iterable[str] = (), symbol: Optional[str] = None) -> None:
+    """Позволяет добавить новую валюту в реестр (для расширяемости), вместе с алиасами и символом."""
+    keys = tuple(a for a in aliases if a) + ((symbol,) if symbol else ())
+    _currency_registry[currency.code] = currency
+    _aliases[currency.code] = _aliases.get(currency.code, ()) + keys
+    _index_keys(currency, keys)
+
+
+def _from_record(record: dict) -> Currency:
+    if record.get("type") == "crypto":
+        return CryptoCurrency(record["code"], record["name"], record.get("algorithm", "unknown"),
+                              float(record.get("market_cap", 0.0)))
+    return FiatCurrency(record["code"], record["name"], record.get("issuing_country", "unknown"))
+
+
+def _register_provider_currencies() -> None:
+    """Добавляет валюты, которые получают провайдеры курсов, но которых нет в файле реестра."""
+    from valutatrade_hub.parser_service.config import ParserConfig
+
+    config = ParserConfig()
+    for code in config.FIAT_CURRENCIES + (config.BASE_CURRENCY,):
+        if code not in _currency_registry:
+            register_currency(FiatCurrency(code, code, "unknown"))
+    for code in config.CRYPTO_CURRENCIES:
+        coin_id = config.CRYPTO_ID_MAP.get(code)
+        if code not in _currency_registry:
+            register_currency(CryptoCurrency(code, (coin_id or code).capitalize(), "unknown", 0.0))
+        if coin_id:
+            register_currency(_currency_registry[code], aliases=(coin_id,))
+
+
+def load_registry(path: Optional[str] = None) -> None:
     """
-    Возвращает объект валюты по её коду.
-    Если код отсутствует в реестре, выбрасывает CurrencyNotFoundError.
+    (Пере)загружает реестр: файл со списком валют (или встроенный набор, если файла нет),
+    затем валюты провайдеров. Вызывается при старте и лениво при первом поиске.
     """
-    code = code.upper().strip()
-    if code not in _currency_registry:
-        raise CurrencyNotFoundError(f"Валюта с кодом '{code}' не найдена.")
-    return _currency_registry[code]
+    global _registry_loaded
+    from valutatrade_hub.core import utils
+    from valutatrade_hub.infra.settings import SettingsLoader
+
+    if path is None:
+        path = utils.get_data_path(SettingsLoader().get("currencies_file", "currencies.json"))
+    records = _BUILTIN_CURRENCIES
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+
+    _currency_registry.clear()
+    _lookup_index.clear()
+    _aliases.clear()
+    for record in records:
+        register_currency(_from_record(record), record.get("aliases", ()), record.get("symbol"))
+    _register_provider_currencies()
+    _registry_loaded = True
 
 
-def register_currency(currency: Currency) -> None:
-    """Позволяет добавить новую валюту в реестр (для расширяемости)."""
-    _currency_registry[currency.code] = currency
+def get_currency(code: str) -> Currency:
+    """
+    Возвращает объект валюты по её коду, алиасу (XBT) или символу ($).
+    Если код отсутствует в реестре, выбрасывает CurrencyNotFoundError.
+    """
+    if not _registry_loaded:
+        load_registry()
+    # Быстрый путь: индекс уже содержит типичные варианты написания, нормализуем только при промахе
+    currency = _lookup_index.get(code)
+    if currency is None and isinstance(code, str):
+        currency = _lookup_index.get(_normalize(code))
+    if currency is None:
+        raise CurrencyNotFoundError(f"Валюта с кодом '{str(code).upper().strip()}' не найдена.")
+    return currency
+
+
+def get_aliases(code: str) -> Tuple[str, ...]:
+    """Алиасы и символ валюты (для справки)."""
+    return _aliases.get(get_currency(code).code, ())
+
+
+def list_currencies() -> List[Currency]:
+    if not _registry_loaded:
+        load_registry()
+    return list(_currency_registry.values())
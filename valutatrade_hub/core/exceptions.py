@@ -20,3 +20,43 @@ class ApiRequestError(Exception):
     def __init__(self, reason: str):
         self.reason = reason
         super().__init__(f"Ошибка при обращении к внешнему API: {reason}")
+
+
+class RateLimitedError(ApiRequestError):
+    """Исключение, когда запрос не отправлен: исчерпана собственная квота запросов к провайдеру."""
+
+
+class StaleRateError(Exception):
+    """Исключение, когда курс старше допустимого и обновить его не удалось."""
+
+    def __init__(self, pair: str, age: float, max_age: float):
+        self.pair = pair
+        self.age = age
+        self.max_age = max_age
+        super().__init__(f"Курс {pair} устарел: обновлён {age:.0f} с назад при допустимых {max_age:.0f} с. "
+                         f"Выполните update-rates и повторите операцию.")
+
+
+class AccessDeniedError(Exception):
+    """Исключение, когда операция доступна только администратору."""
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        super().__init__(f"Операция '{operation}' доступна только администратору (настройка admin_usernames).")
+
+
+class ReadOnlyReplicaError(Exception):
+    """Исключение при попытке изменить данные в процессе-реплике."""
+
+    def __init__(self):
+        super().__init__("Процесс работает как реплика только для чтения: выполните команду на primary.")
+
+
+class ReplicaLagError(Exception):
+    """Исключение, когда реплика отстала от primary больше допустимого."""
+
+    def __init__(self, lag: float, max_lag: float):
+        self.lag = lag
+        self.max_lag = max_lag
+        super().__init__(f"Реплика отстала от primary на {lag:.1f} с при допустимых {max_lag:.1f} с. "
+                         f"Повторите запрос позже или выполните его на primary.")
@@ -0,0 +1,177 @@
+import csv
+import gzip
+import io
+import json
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from valutatrade_hub.core import utils
+
+# Набор данных -> колонки выгрузки (хеши паролей и соли не выгружаются никогда)
+DATASETS: Dict[str, Tuple[str, ...]] = {
+    "users": ("user_id", "username", "registration_date"),
+    "portfolios": ("user_id", "currency", "balance"),
+    "trades": ("user_id", "side", "currency", "amount", "rate", "timestamp"),
+    "rates": ("id", "pair", "rate", "timestamp", "source"),
+}
+FORMATS = ("csv", "jsonl")
+
+
+@dataclass
+class ExportFilter:
+    """
+    Фильтры выгрузки. pair ('BTC_USD') отбирает курсы этой пары, а для сделок и кошельков —
+    записи по валютам пары. Границы времени — префиксы ISO-времени включительно (как в backtest):
+    end='2026-02-16' включает весь день; у пользователей сравнивается дата регистрации,
+    кошельки по времени не фильтруются.
+    """
+    user_id: Optional[int] = None
+    pair: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+    @property
+    def currencies(self) -> Optional[Tuple[str, str]]:
+        if not self.pair:
+            return None
+        base, _, quote = self.pair.partition("_")
+        return base, quote
+
+    def in_range(self, timestamp: str) -> bool:
+        return not ((self.start and timestamp < self.start) or (self.end and timestamp[:len(self.end)] > self.end))
+
+    def after_range(self, timestamp: str) -> bool:
+        return bool(self.end) and timestamp[:len(self.end)] > self.end
+
+
+def resolve_user(username: str) -> int:
+    """user_id по имени за один потоковый проход по users.json."""
+    for user in utils.iter_users():
+        if user["username"] == username:
+            return user["user_id"]
+    raise ValueError(f"Пользователь '{username}' не найден")
+
+
+def _users(flt: ExportFilter) -> Iterator[dict]:
+    for user in utils.iter_users():
+        if flt.user_id is not None and user["user_id"] != flt.user_id:
+            continue
+        if flt.in_range(user["registration_date"]):
+            yield {field: user[field] for field in DATASETS["users"]}
+
+
+def _portfolios(flt: ExportFilter) -> Iterator[dict]:
+    currencies = flt.currencies
+    for portfolio in utils.iter_portfolios():
+        if flt.user_id is not None and portfolio["user_id"] != flt.user_id:
+            continue
+        for code, wallet in portfolio["wallets"].items():
+            if currencies is None or code in currencies:
+                yield {"user_id": portfolio["user_id"], "currency": code, "balance": wallet["balance"]}
+
+
+def _trades(flt: ExportFilter) -> Iterator[dict]:
+    currencies = flt.currencies
+    for trade in utils.iter_trades():
+        if flt.user_id is not None and trade["user_id"] != flt.user_id:
+            continue
+        if currencies is not None and trade["currency"] not in currencies:
+            continue
+        if flt.in_range(trade["timestamp"]):
+            yield {field: trade[field] for field in DATASETS["trades"]}
+
+
+def _rates(flt: ExportFilter) -> Iterator[dict]:
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    storage = RatesStorage(utils.get_data_path('exchange_rates.json'), utils.get_data_path('rates.json'))
+    # Архивные сегменты вне диапазона не распаковываются
+    for record in storage.iter_history(flt.start, flt.end):
+        pair = f"{record['from_currency']}_{record['to_currency']}"
+        timestamp = record["timestamp"]
+        if flt.after_range(timestamp):
+            break  # история упорядочена по времени
+        if (flt.pair and pair != flt.pair) or not flt.in_range(timestamp):
+            continue
+        yield {"id": record["id"], "pair": pair, "rate": record["rate"],
+               "timestamp": timestamp, "source": record.get("source", "")}
+
+
+_SOURCES: Dict[str, Callable[[ExportFilter], Iterator[dict]]] = {
+    "users": _users,
+    "portfolios": _portfolios,
+    "trades": _trades,
+    "rates": _rates,
+}
+
+
+def rows(dataset: str, flt: ExportFilter) -> Iterator[dict]:
+    """Поток строк набора данных после фильтров; файлы читаются потоково, по записи за раз."""
+    if dataset not in _SOURCES:
+        raise ValueError(f"Неизвестный набор данных '{dataset}'. Доступны: {', '.join(DATASETS)}")
+    return _SOURCES[dataset](flt)
+
+
+def render(dataset: str, records: Iterator[dict], fmt: str) -> Iterator[str]:
+    """Строки выгрузки (с переводом строки): CSV с заголовком или JSON Lines."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат '{fmt}'. Доступны: {', '.join(FORMATS)}")
+    if fmt == "jsonl":
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+    fields = DATASETS[dataset]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(fields)
+    for record in records:
+        writer.writerow([record[field] for field in fields])
+        # Буфер опустошается после каждой строки: память не растёт с объёмом выгрузки
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write(dataset: str, fmt: str, path: str, flt: ExportFilter, compress: bool = False) -> Tuple[int, str]:
+    """
+    Потоково пишет выгрузку в файл (gzip при compress или расширении .gz).
+    Пишется во временный файл рядом и переименовывается по завершении — оборванная выгрузка
+    не оставляет полузаписанного отчёта. Возвращает (число записей, итоговый путь).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат '{fmt}'. Доступны: {', '.join(FORMATS)}")
+    count = 0
+
+    def counted() -> Iterator[dict]:
+        nonlocal count
+        for record in rows(dataset, flt):
+            count += 1
+            yield record
+
+    compress = compress or path.endswith(".gz")
+    if compress and not path.endswith(".gz"):
+        path += ".gz"
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".part"
+    opener = gzip.open if compress else open
+    try:
+        with opener(temp_path, 'wt', encoding='utf-8', newline='') as f:
+            # В файл пишем напрямую, без построчных буферов render: пакетирует буфер самого файла
+            if fmt == "csv":
+                fields = DATASETS[dataset]
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(fields)
+                writer.writerows([record[field] for field in fields] for record in counted())
+            else:
+                f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in counted())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return count, path
@@ -1,28 +1,44 @@
 import datetime
-import hashlib
+import itertools
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
+from . import security
 from .exceptions import InsufficientFundsError
 
+# Версии портфелей выдаются из общего счётчика процесса: портфель, заново загруженный с диска,
+# никогда не получит версию, под которой в кэшах лежит его прежнее состояние
+_portfolio_versions = itertools.count(1)
+
 
 class User:
     """Класс пользователя системы."""
 
-    def __init__(self, user_id: int, username: str, password: str):
+    def __init__(self, user_id: int, username: str, password: str,
+                 password_record: Optional[Tuple[str, str]] = None):
+        """password_record — (соль, запись хеша), заранее вычисленные new_password_record(password)."""
         self._user_id = user_id
         self._username = self._validate_username(username)
-        self._salt = self._generate_salt()
-        self._hashed_password = self._hash_password(password, self._salt)
+        self._salt, self._hashed_password = password_record or self.new_password_record(password)
         self._registration_date = datetime.datetime.now()
 
+    @classmethod
+    def new_password_record(cls, password: str) -> Tuple[str, str]:
+        """
+        Новая соль и запись хеша пароля: (соль, запись). KDF дорогая — вызывающий может
+        выполнить её заранее, не удерживая блокировку данных.
+        """
+        salt = cls._generate_salt()
+        return salt, cls._hash_password(password, salt)
+
     @staticmethod
     def _generate_salt() -> str:
         return os.urandom(16).hex()
 
     @staticmethod
     def _hash_password(password: str, salt: str) -> str:
-        return hashlib.sha256((password + salt).encode()).hexdigest()
+        """Версионированная запись хеша по настроенной KDF (см. core.security)."""
+        return security.hash_password(password, salt)
 
     @staticmethod
     def _validate_username(username: str) -> str:
@@ -48,6 +64,11 @@ class User:
     def username(self, value: str):
         self._username = self._validate_username(value)
 
+    @property
+    def password_record(self) -> Tuple[str, str]:
+        """(соль, запись хеша) пароля."""
+        return self._salt, self._hashed_password
+
     @property
     def registration_date(self) -> datetime.datetime:
         return self._registration_date
@@ -65,7 +86,21 @@ class User:
         self._hashed_password = self._hash_password(new_password, self._salt)
 
     def verify_password(self, password: str) -> bool:
-        return self._hashed_password == self._hash_password(password, self._salt)
+        return security.verify_password(password, self._salt, self._hashed_password)
+
+    def needs_rehash(self) -> bool:
+        """True, если хеш пароля сделан устаревшей KDF или с другими параметрами."""
+        return security.needs_rehash(self._hashed_password)
+
+    def rehash_password(self, password: str, password_record: Optional[Tuple[str, str]] = None) -> None:
+        """
+        Перехеширует уже проверенный пароль текущей KDF (без проверки длины).
+        password_record — заранее вычисленный new_password_record(password).
+        """
+        self._salt, self._hashed_password = password_record or self.new_password_record(password)
+        cache = security.get_verify_cache()
+        if cache is not None:
+            cache.add(self._hashed_password, password)
 
     @classmethod
     def from_dict(cls, data: dict):
@@ -94,6 +129,8 @@ class Wallet:
     def __init__(self, currency_code: str, balance: float = 0.0):
         self.currency_code = currency_code.upper()
         self._balance = 0.0
+        # Портфель-владелец: любое изменение баланса повышает его версию
+        self._owner: Optional["Portfolio"] = None
         self.balance = balance
 
     @property
@@ -106,19 +143,29 @@ class Wallet:
             raise TypeError("Баланс должен быть числом.")
         if value < 0:
             raise ValueError("Баланс не может быть отрицательным.")
+        old = self._balance
         self._balance = float(value)
+        self._changed(old)
+
+    def _changed(self, old: float) -> None:
+        if self._owner is not None:
+            self._owner._wallet_changed(self, old)
 
     def deposit(self, amount: float) -> None:
         if not isinstance(amount, (int, float)) or amount <= 0:
             raise ValueError("Сумма пополнения должна быть положительным числом.")
+        old = self._balance
         self._balance += amount
+        self._changed(old)
 
     def withdraw(self, amount: float) -> None:
         if not isinstance(amount, (int, float)) or amount <= 0:
             raise ValueError("Сумма снятия должна быть положительным числом.")
         if amount > self._balance:
             raise InsufficientFundsError(self._balance, amount, self.currency_code)
+        old = self._balance
         self._balance -= amount
+        self._changed(old)
 
     def get_balance_info(self) -> str:
         return f"{self.currency_code}: {self._balance:.2f}"
@@ -138,11 +185,41 @@ class Portfolio:
     def __init__(self, user: User):
         self._user = user
         self._wallets: Dict[str, Wallet] = {}
+        self._version = next(_portfolio_versions)
+        # Наблюдатель изменений кошельков (например, сводные показатели платформы)
+        self._observer = None
 
     @property
     def user(self) -> User:
         return self._user
 
+    @property
+    def version(self) -> int:
+        """Версия содержимого: меняется при добавлении кошелька и любом изменении баланса."""
+        return self._version
+
+    def _touch(self) -> None:
+        self._version = next(_portfolio_versions)
+
+    def set_observer(self, observer) -> None:
+        """
+        Подписывает наблюдателя на изменения кошельков: observer.wallet_added(user_id, code, balance)
+        и observer.balance_changed(user_id, code, old, new). None — отписать.
+        """
+        self._observer = observer
+
+    def _wallet_changed(self, wallet: Wallet, old: float) -> None:
+        self._touch()
+        if self._observer is not None:
+            self._observer.balance_changed(self._user.user_id, wallet.currency_code, old, wallet._balance)
+
+    def _attach(self, wallet: Wallet) -> None:
+        wallet._owner = self
+        self._wallets[wallet.currency_code] = wallet
+        self._touch()
+        if self._observer is not None:
+            self._observer.wallet_added(self._user.user_id, wallet.currency_code, wallet._balance)
+
     @property
     def wallets(self) -> Dict[str, Wallet]:
         return self._wallets.copy()
@@ -151,7 +228,7 @@ class Portfolio:
         code = currency_code.upper()
         if code in self._wallets:
             raise ValueError(f"Кошелёк для валюты {code} уже существует.")
-        self._wallets[code] = Wallet(code)
+        self._attach(Wallet(code))
 
     def get_wallet(self, currency_code: str) -> Wallet:
         code = currency_code.upper()
@@ -182,5 +259,6 @@ class Portfolio:
         portfolio = cls(user)
         for code, wdata in data['wallets'].items():
             wallet = Wallet(code, wdata['balance'])
+            wallet._owner = portfolio
             portfolio._wallets[code] = wallet
         return portfolio
@@ -0,0 +1,290 @@
+import heapq
+import itertools
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from valutatrade_hub.core.models import Portfolio, Wallet
+
+BUY, SELL = "buy", "sell"
+# Остаток меньше этого считается исполненным (погрешность умножения float)
+EPSILON = 1e-12
+
+
+class Order:
+    """
+    Лимитная заявка пары BASE_QUOTE: купить/продать amount BASE по цене не хуже price (QUOTE за единицу).
+    seq — порядковый номер поступления: при равной цене раньше исполняется заявка с меньшим seq.
+    """
+
+    __slots__ = ("order_id", "user_id", "pair", "side", "price", "amount", "remaining", "seq", "created_at")
+
+    def __init__(self, order_id: int, user_id: int, pair: str, side: str, price: float, amount: float,
+                 remaining: Optional[float] = None, seq: int = 0, created_at: Optional[str] = None):
+        self.order_id = order_id
+        self.user_id = user_id
+        self.pair = pair
+        self.side = side
+        self.price = price
+        self.amount = amount
+        self.remaining = amount if remaining is None else remaining
+        self.seq = seq
+        self.created_at = created_at or datetime.utcnow().isoformat() + 'Z'
+
+    @property
+    def base(self) -> str:
+        return self.pair.partition("_")[0]
+
+    @property
+    def quote(self) -> str:
+        return self.pair.partition("_")[2]
+
+    @property
+    def filled(self) -> float:
+        return self.amount - self.remaining
+
+    def to_dict(self) -> dict:
+        return {
+            "order_id": self.order_id,
+            "user_id": self.user_id,
+            "pair": self.pair,
+            "side": self.side,
+            "price": self.price,
+            "amount": self.amount,
+            "remaining": self.remaining,
+            "seq": self.seq,
+            "created_at": self.created_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Order":
+        return cls(data["order_id"], data["user_id"], data["pair"], data["side"], data["price"],
+                   data["amount"], data["remaining"], data["seq"], data["created_at"])
+
+
+class Fill(NamedTuple):
+    """Исполнение: amount BASE по цене стоящей в книге заявки (maker)."""
+    pair: str
+    price: float
+    amount: float
+    buy_order_id: int
+    sell_order_id: int
+    buyer_id: int
+    seller_id: int
+    buy_limit: float  # цена заявки покупателя: разница с price возвращается ему из резерва
+    taker_side: str
+
+
+class OrderBook:
+    """
+    Книга заявок одной пары с приоритетом цена-время.
+
+    Уровни цен — словарь цена -> очередь FIFO заявок, лучшая цена стороны берётся из кучи
+    (для покупок цены хранятся со знаком минус). Опустевший уровень удаляется из словаря,
+    а его цена выбрасывается из кучи лениво — при следующем обращении к вершине.
+    """
+
+    def __init__(self, pair: str):
+        self.pair = pair
+        self._levels: Dict[str, Dict[float, Deque[Order]]] = {BUY: {}, SELL: {}}
+        self._heaps: Dict[str, List[float]] = {BUY: [], SELL: []}
+        self._orders: Dict[int, Order] = {}
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def get(self, order_id: int) -> Optional[Order]:
+        return self._orders.get(order_id)
+
+    def best(self, side: str) -> Optional[float]:
+        """Лучшая цена стороны: максимальная для покупок, минимальная для продаж."""
+        heap, levels = self._heaps[side], self._levels[side]
+        while heap:
+            price = -heap[0] if side == BUY else heap[0]
+            if price in levels:
+                return price
+            heapq.heappop(heap)
+        return None
+
+    def _rest(self, order: Order) -> None:
+        levels = self._levels[order.side]
+        queue = levels.get(order.price)
+        if queue is None:
+            queue = levels[order.price] = deque()
+            heap = self._heaps[order.side]
+            heapq.heappush(heap, -order.price if order.side == BUY else order.price)
+            if len(heap) > 2 * len(levels) + 64:
+                # Снятые уровни вдали от вершины копятся в куче — пересобираем её по живым ценам
+                heap[:] = [-price for price in levels] if order.side == BUY else list(levels)
+                heapq.heapify(heap)
+        queue.append(order)
+        self._orders[order.order_id] = order
+
+    def restore(self, order: Order) -> None:
+        """Возвращает в книгу стоящую заявку без сведения (загрузка сохранённого состояния в порядке seq)."""
+        self._rest(order)
+
+    def submit(self, order: Order) -> List[Fill]:
+        """
+        Сводит заявку со встречной стороной, пока цены пересекаются: лучшая цена первой,
+        внутри уровня — по времени поступления. Исполнение идёт по цене стоящей заявки,
+        частично исполненная встречная заявка остаётся в начале очереди.
+        Неисполненный остаток новой заявки встаёт в книгу.
+        """
+        fills: List[Fill] = []
+        contra = SELL if order.side == BUY else BUY
+        levels = self._levels[contra]
+        while order.remaining > EPSILON:
+            price = self.best(contra)
+            if price is None or (price > order.price if order.side == BUY else price < order.price):
+                break
+            queue = levels[price]
+            while queue and order.remaining > EPSILON:
+                maker = queue[0]
+                amount = min(order.remaining, maker.remaining)
+                order.remaining -= amount
+                maker.remaining -= amount
+                buy, sell = (order, maker) if order.side == BUY else (maker, order)
+                fills.append(Fill(self.pair, price, amount, buy.order_id, sell.order_id,
+                                  buy.user_id, sell.user_id, buy.price, order.side))
+                if maker.remaining <= EPSILON:
+                    maker.remaining = 0.0
+                    queue.popleft()
+                    del self._orders[maker.order_id]
+            if not queue:
+                del levels[price]
+        if order.remaining > EPSILON:
+            self._rest(order)
+        else:
+            order.remaining = 0.0
+        return fills
+
+    def cancel(self, order_id: int) -> Order:
+        """Снимает заявку из книги; KeyError, если её нет (исполнена или снята)."""
+        order = self._orders.pop(order_id)
+        levels = self._levels[order.side]
+        queue = levels[order.price]
+        queue.remove(order)
+        if not queue:
+            del levels[order.price]
+        return order
+
+    def depth(self, side: str, limit: int = 10) -> List[Tuple[float, float, int]]:
+        """Лучшие limit уровней стороны: (цена, суммарный остаток, число заявок)."""
+        levels = self._levels[side]
+        prices = heapq.nlargest(limit, levels) if side == BUY else heapq.nsmallest(limit, levels)
+        return [(price, sum(o.remaining for o in levels[price]), len(levels[price])) for price in prices]
+
+    def orders(self) -> Iterator[Order]:
+        return iter(self._orders.values())
+
+
+class MatchingEngine:
+    """Книги всех пар, сквозная нумерация заявок и порядок поступления."""
+
+    def __init__(self, next_id: int = 1):
+        self.books: Dict[str, OrderBook] = {}
+        self.next_id = next_id
+        self._seq = itertools.count(1)
+
+    def book(self, pair: str) -> OrderBook:
+        book = self.books.get(pair)
+        if book is None:
+            book = self.books[pair] = OrderBook(pair)
+        return book
+
+    def new_order(self, user_id: int, pair: str, side: str, amount: float, price: float) -> Order:
+        """Новая заявка с очередным номером; в книгу попадает через submit (после резервирования средств)."""
+        if side not in (BUY, SELL):
+            raise ValueError(f"Сторона заявки должна быть {BUY} или {SELL}, получено '{side}'")
+        if amount <= 0 or price <= 0:
+            raise ValueError("Количество и цена заявки должны быть положительными")
+        order = Order(self.next_id, user_id, pair, side, price, amount, seq=next(self._seq))
+        self.next_id += 1
+        return order
+
+    def submit(self, order: Order) -> List[Fill]:
+        return self.book(order.pair).submit(order)
+
+    def place(self, user_id: int, pair: str, side: str, amount: float, price: float) -> Tuple[Order, List[Fill]]:
+        order = self.new_order(user_id, pair, side, amount, price)
+        return order, self.submit(order)
+
+    def cancel(self, order_id: int) -> Order:
+        for book in self.books.values():
+            if order_id in book:
+                return book.cancel(order_id)
+        raise KeyError(order_id)
+
+    def find(self, order_id: int) -> Optional[Order]:
+        for book in self.books.values():
+            order = book.get(order_id)
+            if order is not None:
+                return order
+        return None
+
+    def open_orders(self) -> List[Order]:
+        """Все стоящие заявки в порядке поступления."""
+        return sorted((order for book in self.books.values() for order in book.orders()), key=lambda o: o.seq)
+
+    def to_dict(self) -> dict:
+        # seq перенумеровывается при загрузке, сохраняется только относительный порядок
+        return {"next_id": self.next_id, "orders": [order.to_dict() for order in self.open_orders()]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MatchingEngine":
+        engine = cls(data.get("next_id", 1))
+        # Номера заявок выдаются в порядке поступления, а seq записей журнала из разных процессов
+        # отсчитаны каждый от своей загрузки — порядок восстанавливается по номеру
+        for record in sorted(data.get("orders", []), key=lambda r: r["order_id"]):
+            order = Order.from_dict(record)
+            order.seq = next(engine._seq)
+            engine.book(order.pair).restore(order)
+        return engine
+
+
+# --- Расчёты по кошелькам: средства заявки резервируются при выставлении ---
+
+def _wallet(portfolio: Portfolio, code: str) -> Wallet:
+    try:
+        return portfolio.get_wallet(code)
+    except KeyError:
+        portfolio.add_currency(code)
+        return portfolio.get_wallet(code)
+
+
+def reserve(order: Order, portfolio: Portfolio) -> None:
+    """
+    Списывает в резерв то, чем заявка платит: QUOTE на amount·price для покупки, BASE для продажи.
+    InsufficientFundsError, если средств не хватает.
+    """
+    if order.side == BUY:
+        _wallet(portfolio, order.quote).withdraw(order.amount * order.price)
+    else:
+        _wallet(portfolio, order.base).withdraw(order.amount)
+
+
+def release(order: Order, portfolio: Portfolio) -> None:
+    """Возвращает резерв неисполненного остатка снятой заявки."""
+    if order.remaining <= 0:
+        return
+    if order.side == BUY:
+        _wallet(portfolio, order.quote).deposit(order.remaining * order.price)
+    else:
+        _wallet(portfolio, order.base).deposit(order.remaining)
+
+
+def settle(fill: Fill, buyer: Portfolio, seller: Portfolio) -> None:
+    """
+    Расчёт по исполнению: покупатель получает BASE и возврат резерва сверх цены сделки,
+    продавец — QUOTE по цене сделки (BASE у него уже списан в резерв).
+    """
+    base, _, quote = fill.pair.partition("_")
+    _wallet(buyer, base).deposit(fill.amount)
+    refund = (fill.buy_limit - fill.price) * fill.amount
+    if refund > 0:
+        _wallet(buyer, quote).deposit(refund)
+    _wallet(seller, quote).deposit(fill.price * fill.amount)
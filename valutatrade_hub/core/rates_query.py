@@ -0,0 +1,134 @@
+import heapq
+import itertools
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class RateRow(NamedTuple):
+    pair: str
+    base: str
+    quote: str
+    rate: float
+    updated_at: str
+
+
+SORT_KEYS = {
+    "pair": lambda row: row.pair,
+    "rate": lambda row: row.rate,
+    "updated": lambda row: row.updated_at,
+}
+
+
+class RatesIndex:
+    """
+    Индекс над снимком кэша курсов для show-rates.
+
+    Строится один раз на версию снимка: префиксные индексы по базовой (BTC в BTC_USD)
+    и котируемой валюте, порядки сортировки вычисляются при первом запросе и переиспользуются.
+    Запрос отбирает позиции по индексам и отдаёт только нужную страницу, не копируя весь набор.
+    """
+
+    def __init__(self, pairs: Dict[str, dict]):
+        self.rows: List[RateRow] = []
+        self.by_base: Dict[str, List[int]] = {}
+        self.by_quote: Dict[str, List[int]] = {}
+        for pair, data in pairs.items():
+            base, _, quote = pair.partition("_")
+            self.by_base.setdefault(base, []).append(len(self.rows))
+            self.by_quote.setdefault(quote, []).append(len(self.rows))
+            self.rows.append(RateRow(pair, base, quote, float(data["rate"]), data.get("updated_at", "")))
+        self._orders: Dict[str, List[int]] = {}
+        # Место каждой строки в порядке сортировки: отобранные строки упорядочиваются без обхода всего порядка
+        self._ranks: Dict[str, List[int]] = {}
+        # Ширина колонок для потоковой отрисовки без построения всей таблицы
+        self.pair_width = max((len(row.pair) for row in self.rows), default=4)
+        self.rate_width = max((len(f"{row.rate:.5f}") for row in self.rows), default=4)
+
+    def _order(self, sort: str) -> List[int]:
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Неизвестный ключ сортировки '{sort}'. Доступны: {', '.join(SORT_KEYS)}")
+        order = self._orders.get(sort)
+        if order is None:
+            key = SORT_KEYS[sort]
+            order = self._orders[sort] = sorted(range(len(self.rows)), key=lambda i: key(self.rows[i]))
+        return order
+
+    def _rank(self, sort: str) -> List[int]:
+        rank = self._ranks.get(sort)
+        if rank is None:
+            rank = self._ranks[sort] = [0] * len(self.rows)
+            for position, i in enumerate(self._order(sort)):
+                rank[i] = position
+        return rank
+
+    def select(self, base: Optional[str] = None, quote: Optional[str] = None) -> Optional[set]:
+        """Позиции строк по фильтрам; None — фильтров нет (все строки)."""
+        selected = None
+        if base:
+            selected = set(self.by_base.get(base.upper(), ()))
+        if quote:
+            by_quote = set(self.by_quote.get(quote.upper(), ()))
+            selected = by_quote if selected is None else selected & by_quote
+        return selected
+
+    def query(
+        self,
+        base: Optional[str] = None,
+        quote: Optional[str] = None,
+        sort: str = "pair",
+        descending: bool = False,
+        page: int = 1,
+        limit: Optional[int] = None,
+        top: Optional[int] = None,
+    ) -> Tuple[Iterator[RateRow], int]:
+        """
+        Возвращает (итератор строк страницы, число строк после фильтрации).
+        top=N выбирает N наибольших курсов частичным отбором (heapq.nlargest) без полной сортировки.
+        """
+        selected = self.select(base, quote)
+        total = len(self.rows) if selected is None else len(selected)
+        if top is not None:
+            candidates = range(len(self.rows)) if selected is None else selected
+            best = heapq.nlargest(top, candidates, key=lambda i: self.rows[i].rate)
+            return (self.rows[i] for i in best), min(total, top)
+
+        start = (max(page, 1) - 1) * limit if limit is not None else 0
+        if selected is None:
+            order = self._order(sort)
+            positions = reversed(order) if descending else iter(order)
+        else:
+            # Только отобранные строки: по их местам в порядке сортировки, частичным отбором до конца страницы
+            rank = self._rank(sort)
+            if limit is None:
+                positions = iter(sorted(selected, key=rank.__getitem__, reverse=descending))
+            else:
+                pick = heapq.nlargest if descending else heapq.nsmallest
+                positions = iter(pick(start + limit, selected, key=rank.__getitem__))
+        if limit is not None:
+            positions = itertools.islice(positions, start, start + limit)
+        return (self.rows[i] for i in positions), total
+
+
+_cached_snapshot = None
+_cached_index: Optional[RatesIndex] = None
+
+
+def get_index(snapshot: dict) -> RatesIndex:
+    """Индекс для снимка курсов; пересобирается только когда снимок сменился."""
+    global _cached_snapshot, _cached_index
+    if snapshot is not _cached_snapshot or _cached_index is None:
+        _cached_index = RatesIndex(snapshot.get("pairs", {}))
+        _cached_snapshot = snapshot
+    return _cached_index
+
+
+def render_rows(index: RatesIndex, rows: Iterator[RateRow]) -> Iterator[str]:
+    """Потоково отрисовывает таблицу в стиле PrettyTable: строка за строкой."""
+    pair_w, rate_w = index.pair_width, index.rate_width
+    border = f"+{'-' * (pair_w + 2)}+{'-' * (rate_w + 2)}+"
+    yield border
+    yield f"| {'Pair'.center(pair_w)} | {'Rate'.center(rate_w)} |"
+    yield border
+    for row in rows:
+        # Округление до 5 знаков для красоты
+        yield f"| {row.pair.center(pair_w)} | {f'{row.rate:.5f}'.center(rate_w)} |"
+    yield border
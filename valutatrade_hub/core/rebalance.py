@@ -0,0 +1,147 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен: без него план считается на чистом Python
+    np = None
+
+# Валюта расчётов: все сделки идут против неё, её остаток — балансирующая часть
+SETTLEMENT = "USD"
+
+
+class PlannedTrade(NamedTuple):
+    """Сделка плана: amount > 0 — покупка, amount < 0 — продажа currency за USD по rate (USD за единицу)."""
+    index: int
+    currency: str
+    amount: float
+    rate: float
+
+    @property
+    def value(self) -> float:
+        return abs(self.amount) * self.rate
+
+
+@dataclass
+class RebalanceReport:
+    portfolios: int
+    total_value: float
+    trades: List[PlannedTrade] = field(default_factory=list)
+    plan_ms: float = 0.0
+    commit_ms: float = 0.0
+    # Сделки плана, не исполненные из-за фактических остатков (заполняется после исполнения)
+    skipped: int = 0
+
+    @property
+    def turnover(self) -> float:
+        """Оборот в USD: сумма модулей стоимостей сделок."""
+        return sum(trade.value for trade in self.trades)
+
+    def summary(self) -> str:
+        turnover = self.turnover
+        ratio = turnover / self.total_value if self.total_value else 0.0
+        affected = len({trade.index for trade in self.trades})
+        skipped = f" (пропущено: {self.skipped})" if self.skipped else ""
+        return (f"Портфелей: {self.portfolios}, затронуто: {affected}, сделок: {len(self.trades)}{skipped}\n"
+                f"Оборот: {turnover:.2f} USD ({ratio:.2%} стоимости {self.total_value:.2f} USD)\n"
+                f"Расчёт плана: {self.plan_ms:.1f} мс, фиксация: {self.commit_ms:.1f} мс")
+
+
+def _execution_order(trade: PlannedTrade) -> Tuple[int, bool]:
+    return trade.index, trade.amount > 0
+
+
+def parse_targets(spec: str) -> Dict[str, float]:
+    """
+    Целевые доли: "USD=60,BTC=30,ETH=10" (проценты) или "USD=0.6,BTC=0.3,ETH=0.1".
+    Сумма должна составлять 100% (или 1).
+    """
+    targets: Dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        code, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Ожидается КОД=доля, получено '{item}'")
+        weight = float(value.rstrip("%"))
+        if weight < 0:
+            raise ValueError(f"Доля {code} не может быть отрицательной")
+        targets[code.strip().upper()] = weight
+    total = sum(targets.values())
+    if abs(total - 100.0) < 1e-6:
+        return {code: weight / 100.0 for code, weight in targets.items()}
+    if abs(total - 1.0) < 1e-9:
+        return targets
+    raise ValueError(f"Сумма долей должна быть 100% (сейчас {total:g})")
+
+
+def plan(
+    holdings: List[Dict[str, float]],
+    prices: Dict[str, float],
+    targets: Dict[str, float],
+    min_trade_value: float = 1.0,
+) -> RebalanceReport:
+    """
+    Минимальный набор сделок для всех портфелей по одному снимку цен (USD за единицу).
+
+    По каждой валюте — одна сделка против USD до целевой стоимости; USD выравнивается сам.
+    Сделки дешевле min_trade_value пропускаются. Валюты без курса не оцениваются и не трогаются.
+    Если округления не дают хватить USD на покупки, покупки портфеля пропорционально уменьшаются.
+    Сделки упорядочены по портфелям, в портфеле сначала продажи: покупки рассчитаны на USD от них.
+    """
+    missing = [code for code in targets if code not in prices]
+    if missing:
+        raise ValueError(f"Нет курса для целевых валют: {', '.join(missing)}")
+    currencies = sorted({code for wallets in holdings for code in wallets if code in prices} | set(targets))
+    trade_codes = [code for code in currencies if code != SETTLEMENT]
+    report = RebalanceReport(portfolios=len(holdings), total_value=0.0)
+    if not holdings:
+        return report
+
+    column = {code: i for i, code in enumerate(currencies)}
+    usd = column.get(SETTLEMENT)
+    if np is not None:
+        price = np.array([prices[code] for code in currencies])
+        weight = np.array([targets.get(code, 0.0) for code in currencies])
+        amounts = np.zeros((len(holdings), len(currencies)))
+        for row, wallets in enumerate(holdings):
+            for code, balance in wallets.items():
+                if code in column:
+                    amounts[row, column[code]] = balance
+        values = amounts * price
+        totals = values.sum(axis=1)
+        deltas = totals[:, None] * weight - values
+        deltas[np.abs(deltas) < min_trade_value] = 0.0
+        if usd is not None:
+            deltas[:, usd] = 0.0
+        # Покупки не должны превышать USD после продаж
+        buys = np.where(deltas > 0, deltas, 0.0).sum(axis=1)
+        cash = (values[:, usd] if usd is not None else 0.0) - np.where(deltas < 0, deltas, 0.0).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.where(buys > cash, cash / buys, 1.0)
+        deltas = np.where(deltas > 0, deltas * scale[:, None], deltas)
+        report.total_value = float(totals.sum())
+        rows, cols = np.nonzero(deltas)
+        report.trades = [
+            PlannedTrade(int(r), currencies[c], float(deltas[r, c] / price[c]), float(price[c]))
+            for r, c in zip(rows.tolist(), cols.tolist())
+        ]
+        report.trades.sort(key=_execution_order)
+        return report
+
+    for row, wallets in enumerate(holdings):
+        values = {code: wallets.get(code, 0.0) * prices[code] for code in currencies}
+        total = sum(values.values())
+        report.total_value += total
+        deltas: List[Tuple[str, float]] = []
+        for code in trade_codes:
+            delta = total * targets.get(code, 0.0) - values[code]
+            if abs(delta) >= min_trade_value:
+                deltas.append((code, delta))
+        cash = values.get(SETTLEMENT, 0.0) - sum(d for _, d in deltas if d < 0)
+        buys = sum(d for _, d in deltas if d > 0)
+        scale = cash / buys if buys > cash else 1.0
+        for code, delta in deltas:
+            delta = delta * scale if delta > 0 else delta
+            if delta:
+                report.trades.append(PlannedTrade(row, code, delta / prices[code], prices[code]))
+    report.trades.sort(key=_execution_order)
+    return report
@@ -0,0 +1,203 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from valutatrade_hub.core import utils
+from valutatrade_hub.core.exceptions import ReadOnlyReplicaError, ReplicaLagError
+from valutatrade_hub.core.models import Portfolio, User
+from valutatrade_hub.infra.changelog import ChangeLog, ChangeLogGap, open_tailer
+from valutatrade_hub.infra.settings import SettingsLoader
+
+logger = logging.getLogger(__name__)
+
+PRIMARY, REPLICA = "primary", "replica"
+LOG_FILENAME = 'changes.log'
+# Сколько последних задержек применения хранится для перцентилей
+LAG_WINDOW = 1024
+
+
+def role() -> str:
+    """Роль процесса: переменная VALUTATRADE_ROLE, иначе настройка replication_role ('' — без репликации)."""
+    return os.environ.get("VALUTATRADE_ROLE") or SettingsLoader().get('replication_role', '')
+
+
+def require_primary() -> None:
+    """ReadOnlyReplicaError, если процесс — реплика."""
+    if role() == REPLICA:
+        raise ReadOnlyReplicaError()
+
+
+def get_changelog() -> Optional[ChangeLog]:
+    """Журнал изменений, который ведёт primary; в остальных ролях — None."""
+    if role() != PRIMARY:
+        return None
+    max_bytes = SettingsLoader().get('replication_log_max_bytes', 64 * 1024 * 1024)
+    return ChangeLog(utils.get_data_path(LOG_FILENAME), max_bytes)
+
+
+def _percentile(values: List[float], share: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+class Replica:
+    """
+    Пользователи, портфели и курсы в памяти процесса-реплики.
+
+    Начальный снимок файлов data снимается под блокировками данных и журнала вместе с seq
+    его последней записи. Записи accounts primary дописывает под блокировкой данных вместе
+    с фиксацией шардов, поэтому снимок согласован с записями accounts до этого seq (запись,
+    чья фиксация сорвалась, исправляется следующей); запись rates может оказаться в снимке раньше,
+    чем в журнале. Дальше sync() применяет новые записи журнала
+    (из файла или из сокета раздатчика). Записи содержат записи целиком, поэтому повторное
+    применение безопасно; removed — пользователи, чья регистрация так и не была зафиксирована.
+    Применённые портфели и курсы заменяются новыми объектами, а не правятся на месте:
+    читатель может держать прежние, пока фоновый поток follow() применяет журнал.
+    """
+
+    def __init__(self, source: str = "file", max_lag: float = 5.0):
+        self.source = source
+        self.max_lag = max_lag
+        self.users: Dict[int, User] = {}
+        self.portfolios: Dict[int, Portfolio] = {}
+        self.rates: dict = {"pairs": {}}
+        self.applied = 0
+        self.entries = 0
+        self.bootstraps = 0
+        self.lags: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self._log = ChangeLog(utils.get_data_path(LOG_FILENAME))
+        self._tailer = None
+        self._synced_at = 0.0
+        self._user_list: Optional[List[User]] = None
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self.bootstrap()
+
+    def bootstrap(self) -> None:
+        from valutatrade_hub.core.shards import AccountStore
+
+        store = AccountStore(utils.get_data_dir(), SettingsLoader().get('shard_load_workers', 0))
+        with utils.data_lock(), self._log.lock():
+            head = self._log.head()
+            taken = time.time()
+            store.refresh()
+            rates = utils.load_rates()
+        with self._lock:
+            self._reset(store, rates, head, taken)
+
+    def _reset(self, store, rates: dict, head: int, taken: float) -> None:
+        self.users = {user.user_id: user for user in store.users()}
+        self.portfolios = store.portfolios
+        self.rates = rates
+        self.applied = head
+        self._user_list = None
+        if self._tailer is not None:
+            self._tailer.close()
+        self._tailer = open_tailer(self.source, self._log.path, head)
+        self._synced_at = taken
+        self.bootstraps += 1
+        logger.info(f"Replica bootstrapped at seq {head}: {len(self.users)} users")
+
+    def user_list(self) -> List[User]:
+        with self._lock:
+            if self._user_list is None:
+                self._user_list = list(self.users.values())
+            return self._user_list
+
+    def sync(self) -> int:
+        """Применяет новые записи журнала. Возвращает их число."""
+        with self._lock:
+            return self._sync()
+
+    def _sync(self) -> int:
+        try:
+            entries = self._tailer.poll()
+        except ChangeLogGap as e:
+            logger.warning(f"Change log gap ({e}), replica re-bootstraps")
+            self.bootstrap()
+            return 0
+        except OSError as e:
+            logger.warning(f"Replication source unavailable: {e}")
+            self._reconnect()
+            return 0
+        for entry in entries:
+            self._apply(entry)
+        self._synced_at = max(self._synced_at, self._tailer.synced_at)
+        return len(entries)
+
+    def _reconnect(self) -> None:
+        try:
+            tailer = open_tailer(self.source, self._log.path, self.applied)
+        except OSError:
+            return  # следующая попытка — при следующем sync; отставание тем временем растёт
+        self._tailer.close()
+        self._tailer = tailer
+
+    def _apply(self, entry: dict) -> None:
+        if entry["kind"] == "accounts":
+            for user_id in entry.get("removed", ()):
+                self.users.pop(user_id, None)
+                self.portfolios = {uid: p for uid, p in self.portfolios.items() if uid != user_id}
+                self._user_list = None
+            for data in entry["users"]:
+                self.users[data["user_id"]] = User.from_dict(data)
+                self._user_list = None
+            for data in entry["portfolios"]:
+                user = self.users.get(data["user_id"])
+                if user is None:
+                    continue
+                portfolio = Portfolio.from_dict(data, user)
+                if user.user_id in self.portfolios:
+                    self.portfolios[user.user_id] = portfolio
+                else:
+                    # Новый ключ — новый словарь: читатель может перебирать прежний
+                    self.portfolios = {**self.portfolios, user.user_id: portfolio}
+        elif entry["kind"] == "rates":
+            # Новый словарь, а не правка на месте: прежний снимок мог остаться в индексах и кэшах
+            self.rates = {**self.rates, "pairs": {**self.rates.get("pairs", {}), **entry["pairs"]},
+                          "last_refresh": entry["last_refresh"], "version": entry["version"]}
+        self.applied = entry["seq"]
+        self.entries += 1
+        self.lags.append(time.time() - entry["ts"])
+
+    def follow(self, interval: float) -> None:
+        """Фоновый поток, применяющий журнал раз в interval секунд: задержка не зависит от частоты чтений."""
+        def loop():
+            while not self._stopped.wait(interval):
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.warning(f"Replica follow failed: {e}")
+
+        threading.Thread(target=loop, name="replica-follow", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def staleness(self) -> float:
+        """Сколько секунд назад реплика в последний раз точно догнала primary."""
+        return time.time() - self._synced_at
+
+    def check_lag(self) -> None:
+        staleness = self.staleness()
+        if staleness > self.max_lag:
+            raise ReplicaLagError(staleness, self.max_lag)
+
+    def status(self) -> dict:
+        with self._lock:
+            lags = sorted(self.lags)
+        return {
+            "source": self.source,
+            "applied": self.applied,
+            "head": None if self.source.startswith("unix:") else self._log.head(),
+            "entries": self.entries,
+            "bootstraps": self.bootstraps,
+            "staleness": self.staleness(),
+            "max_lag": self.max_lag,
+            "lag_p50": _percentile(lags, 0.5),
+            "lag_p99": _percentile(lags, 0.99),
+            "lag_max": lags[-1] if lags else 0.0,
+            "users": len(self.users),
+        }
@@ -0,0 +1,181 @@
+import math
+from datetime import datetime
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен: без него матрицы считаются на чистом Python
+    np = None
+
+# Портфели обрабатываются блоками, чтобы матрица сценариев P&L (портфели × окно) не росла без предела
+_CHUNK = 10_000
+
+
+def _bucket(timestamp: str, seconds: int) -> int:
+    return int(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()) // seconds
+
+
+def aligned_prices(records: Iterable[dict], bucket_seconds: int) -> Tuple[List[str], List[List[float]]]:
+    """
+    Выравнивает историю курсов к USD по интервалам bucket_seconds за один проход:
+    в каждом интервале берётся последний курс валюты, пропуски заполняются предыдущим значением.
+    Матрица начинается с первого интервала, где известны курсы всех валют.
+    Возвращает (валюты, строки цен по интервалам).
+    """
+    last: Dict[str, float] = {}
+    snapshots: List[Dict[str, float]] = []
+    current = None
+    for record in records:
+        if record["to_currency"] != "USD":
+            continue
+        bucket = _bucket(record["timestamp"], bucket_seconds)
+        if current is not None and bucket != current:
+            snapshots.append(dict(last))
+        current = bucket
+        last[record["from_currency"]] = float(record["rate"])
+    if current is not None:
+        snapshots.append(dict(last))
+    if not snapshots:
+        return [], []
+
+    currencies = sorted(snapshots[-1])
+    start = next(i for i, snap in enumerate(snapshots) if len(snap) == len(currencies))
+    return currencies, [[snap[code] for code in currencies] for snap in snapshots[start:]]
+
+
+def _simple_returns(prices: List[List[float]]):
+    if np is not None:
+        arr = np.asarray(prices, dtype=float)
+        return arr[1:] / arr[:-1] - 1.0
+    return [[cur / prev - 1.0 for cur, prev in zip(row, prev_row)] for prev_row, row in zip(prices, prices[1:])]
+
+
+def _rolling_std(returns, window: int):
+    """Скользящее стандартное отклонение по столбцам (по суммам и суммам квадратов)."""
+    if np is not None:
+        padded = np.vstack([np.zeros((1, returns.shape[1])), returns])
+        s1 = np.cumsum(padded, axis=0)
+        s2 = np.cumsum(padded ** 2, axis=0)
+        total = s1[window:] - s1[:-window]
+        squares = s2[window:] - s2[:-window]
+        return np.sqrt(np.maximum((squares - total ** 2 / window) / (window - 1), 0.0))
+    result = []
+    for end in range(window, len(returns) + 1):
+        rows = returns[end - window:end]
+        result.append([_std([row[c] for row in rows]) for c in range(len(rows[0]))])
+    return result
+
+
+def _std(values: Sequence[float]) -> float:
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+
+
+class RiskModel:
+    """
+    Матрица доходностей валют к USD, выровненная по времени, и оценки по последним window интервалам:
+    скользящая волатильность, средняя доходность, ковариационная и корреляционная матрицы.
+    Строится один раз на версию истории и переиспользуется для всех портфелей.
+    """
+
+    def __init__(self, currencies: List[str], prices: List[List[float]], window: int, bucket_seconds: int):
+        self.currencies = currencies
+        self.index = {code: i for i, code in enumerate(currencies)}
+        self.bucket_seconds = bucket_seconds
+        self.returns = _simple_returns(prices) if len(prices) > 1 else []
+        self.window = min(window, len(self.returns))
+        if self.window < 2:
+            self.rolling_vol = self.vol = self.mean = self.cov = self.corr = None
+            return
+
+        recent = self.returns[-self.window:]
+        self.rolling_vol = _rolling_std(self.returns, self.window)
+        self.vol = list(self.rolling_vol[-1])
+        if np is not None:
+            self.mean = recent.mean(axis=0)
+            self.cov = np.atleast_2d(np.cov(recent, rowvar=False, ddof=1))
+            std = np.sqrt(np.diag(self.cov))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.corr = np.nan_to_num(self.cov / np.outer(std, std))
+            np.fill_diagonal(self.corr, 1.0)
+        else:
+            n, size = len(recent), len(currencies)
+            self.mean = [sum(row[c] for row in recent) / n for c in range(size)]
+            self.cov = [[sum((row[a] - self.mean[a]) * (row[b] - self.mean[b]) for row in recent) / (n - 1)
+                         for b in range(size)] for a in range(size)]
+            std = [math.sqrt(self.cov[c][c]) for c in range(size)]
+            self.corr = [[1.0 if a == b else (self.cov[a][b] / (std[a] * std[b]) if std[a] and std[b] else 0.0)
+                          for b in range(size)] for a in range(size)]
+
+    @property
+    def ready(self) -> bool:
+        return self.cov is not None
+
+    @classmethod
+    def from_history(cls, records: Iterable[dict], window: int, bucket_seconds: int) -> "RiskModel":
+        currencies, prices = aligned_prices(records, bucket_seconds)
+        return cls(currencies, prices, window, bucket_seconds)
+
+    def exposure_matrix(self, holdings: List[Dict[str, float]], prices: Dict[str, float]):
+        """Позиции портфелей в USD по валютам модели: матрица портфели × валюты."""
+        size = len(self.currencies)
+        if np is not None:
+            matrix = np.zeros((len(holdings), size))
+        else:
+            matrix = [[0.0] * size for _ in holdings]
+        for row, wallets in enumerate(holdings):
+            for code, balance in wallets.items():
+                column = self.index.get(code)
+                if column is not None and code in prices:
+                    matrix[row][column] = balance * prices[code]
+        return matrix
+
+    def value_at_risk(self, exposures, confidence: float) -> Tuple[List[float], List[float]]:
+        """
+        VaR на один интервал для всех портфелей сразу (в USD, положительное число — возможная потеря).
+        Параметрический: z·sqrt(hᵀΣh) − hᵀμ; исторический: квантиль P&L портфеля по сценариям окна.
+        """
+        z = NormalDist().inv_cdf(confidence)
+        if np is not None:
+            recent = self.returns[-self.window:]
+            parametric, historical = [], []
+            for start in range(0, len(exposures), _CHUNK):
+                block = exposures[start:start + _CHUNK]
+                sigma = np.sqrt(np.maximum(np.einsum("pc,cd,pd->p", block, self.cov, block), 0.0))
+                parametric.append(z * sigma - block @ self.mean)
+                historical.append(-np.quantile(block @ recent.T, 1.0 - confidence, axis=1))
+            if not parametric:
+                return [], []
+            return np.concatenate(parametric).tolist(), np.concatenate(historical).tolist()
+
+        recent = self.returns[-self.window:]
+        parametric, historical = [], []
+        for h in exposures:
+            variance = sum(h[a] * self.cov[a][b] * h[b] for a in range(len(h)) for b in range(len(h)))
+            parametric.append(z * math.sqrt(max(variance, 0.0)) - sum(x * m for x, m in zip(h, self.mean)))
+            pnl = sorted(sum(x * r for x, r in zip(h, row)) for row in recent)
+            historical.append(-_quantile(pnl, 1.0 - confidence))
+        return parametric, historical
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    """Квантиль с линейной интерполяцией (как numpy.quantile по умолчанию)."""
+    position = (len(sorted_values) - 1) * q
+    low = math.floor(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+_model_key: Optional[tuple] = None
+_model: Optional[RiskModel] = None
+
+
+def get_model(storage, window: int, bucket_seconds: int) -> RiskModel:
+    """Модель риска для текущей истории; пересобирается только после добавления записей в историю."""
+    global _model_key, _model
+    key = (storage.history_version(), window, bucket_seconds)
+    if _model is None or key != _model_key:
+        _model = RiskModel.from_history(storage.iter_history(), window, bucket_seconds)
+        _model_key = key
+    return _model
@@ -0,0 +1,246 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from valutatrade_hub.infra.settings import SettingsLoader
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+
+class Kdf(ABC):
+    """
+    Функция выработки ключа из пароля.
+    Запись хеша версионирована: "<scheme>$<params>$<hex>", чтобы при смене настроек
+    старые записи продолжали проверяться и могли быть перехешированы при входе.
+    """
+
+    scheme: str = ""
+
+    @property
+    @abstractmethod
+    def params(self) -> str:
+        """Параметры в виде строки, сохраняемой в записи хеша."""
+        pass
+
+    @abstractmethod
+    def derive(self, password: str, salt: str) -> str:
+        """Возвращает hex-дайджест пароля."""
+        pass
+
+    def make_record(self, digest: str) -> str:
+        return f"{self.scheme}${self.params}${digest}"
+
+
+class LegacySha256Kdf(Kdf):
+    """Исходная схема: один SHA-256 над password + salt. Только для проверки старых записей."""
+
+    scheme = "sha256"
+
+    @property
+    def params(self) -> str:
+        return ""
+
+    def derive(self, password: str, salt: str) -> str:
+        return hashlib.sha256((password + salt).encode()).hexdigest()
+
+    def make_record(self, digest: str) -> str:
+        return digest
+
+
+class Pbkdf2Kdf(Kdf):
+    scheme = "pbkdf2_sha256"
+
+    def __init__(self, iterations: int = 600_000):
+        self.iterations = int(iterations)
+
+    @property
+    def params(self) -> str:
+        return f"i={self.iterations}"
+
+    def derive(self, password: str, salt: str) -> str:
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), self.iterations).hex()
+
+
+class ScryptKdf(Kdf):
+    scheme = "scrypt"
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1):
+        self.n, self.r, self.p = int(n), int(r), int(p)
+
+    @property
+    def params(self) -> str:
+        return f"n={self.n},r={self.r},p={self.p}"
+
+    def derive(self, password: str, salt: str) -> str:
+        return hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=self.n, r=self.r, p=self.p,
+            maxmem=128 * self.n * self.r * self.p + 1024 * 1024,
+        ).hex()
+
+
+_KDF_CLASSES = {cls.scheme: cls for cls in (LegacySha256Kdf, Pbkdf2Kdf, ScryptKdf)}
+
+
+def _parse_params(params: str) -> Dict[str, int]:
+    return {k: int(v) for k, v in (item.split("=") for item in params.split(",") if item)}
+
+
+def parse_record(record: str) -> Tuple[Kdf, str]:
+    """Разбирает запись хеша на (kdf, дайджест). Запись без '$' — старый формат SHA-256."""
+    if "$" not in record:
+        return LegacySha256Kdf(), record
+    scheme, params, digest = record.split("$", 2)
+    if scheme not in _KDF_CLASSES:
+        raise ValueError(f"Неизвестная схема хеширования пароля: {scheme}")
+    kdf_params = _parse_params(params)
+    if scheme == Pbkdf2Kdf.scheme:
+        return Pbkdf2Kdf(kdf_params["i"]), digest
+    if scheme == ScryptKdf.scheme:
+        return ScryptKdf(**kdf_params), digest
+    return LegacySha256Kdf(), digest
+
+
+def configured_kdf() -> Kdf:
+    """KDF для новых записей по настройкам password_kdf / password_kdf_params."""
+    settings = SettingsLoader()
+    scheme = settings.get("password_kdf", ScryptKdf.scheme)
+    if scheme not in _KDF_CLASSES or scheme == LegacySha256Kdf.scheme:
+        raise ValueError(f"Недопустимая схема хеширования пароля: {scheme}")
+    return _KDF_CLASSES[scheme](**settings.get("password_kdf_params", {}))
+
+
+# --- Вычисление в пуле процессов ---
+
+_pool: Optional["ProcessPoolExecutor"] = None
+_pool_guard = threading.Lock()
+
+
+def _derive(record_prefix: str, password: str, salt: str) -> str:
+    """Точка входа для рабочих процессов пула (должна быть picklable)."""
+    kdf, _ = parse_record(record_prefix + "$")
+    return kdf.derive(password, salt)
+
+
+def _get_pool() -> Optional["ProcessPoolExecutor"]:
+    """Пул процессов для KDF; kdf_workers=0 — вычислять в текущем процессе."""
+    global _pool
+    workers = SettingsLoader().get("kdf_workers", 0)
+    if not workers:
+        return None
+    with _pool_guard:
+        if _pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def _prefix(kdf: Kdf) -> str:
+    return f"{kdf.scheme}${kdf.params}"
+
+
+def derive(kdf: Kdf, password: str, salt: str) -> str:
+    """Вычисляет дайджест; при настроенном пуле — в отдельном процессе, не удерживая GIL."""
+    pool = _get_pool()
+    if pool is None or kdf.scheme == LegacySha256Kdf.scheme:
+        return kdf.derive(password, salt)
+    return pool.submit(_derive, _prefix(kdf), password, salt).result()
+
+
+async def derive_async(kdf: Kdf, password: str, salt: str) -> str:
+    """Асинхронный вариант derive: не блокирует цикл событий."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    if pool is None or kdf.scheme == LegacySha256Kdf.scheme:
+        return await loop.run_in_executor(None, kdf.derive, password, salt)
+    return await loop.run_in_executor(pool, _derive, _prefix(kdf), password, salt)
+
+
+def hash_password(password: str, salt: str) -> str:
+    """Возвращает версионированную запись хеша по текущей настройке KDF."""
+    kdf = configured_kdf()
+    return kdf.make_record(derive(kdf, password, salt))
+
+
+# --- Кэш успешных проверок ---
+
+class VerifyCache:
+    """
+    Ограниченный кэш недавних успешных проверок пароля с TTL.
+    Хранит только HMAC от (запись хеша, пароль) на случайном ключе процесса,
+    поэтому сами пароли в памяти не оседают, а смена пароля инвалидирует запись.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_size: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._secret = os.urandom(32)
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, record: str, password: str) -> bytes:
+        return hmac.new(self._secret, f"{record}\0{password}".encode(), hashlib.sha256).digest()
+
+    def contains(self, record: str, password: str) -> bool:
+        key = self._key(record, password)
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, record: str, password: str) -> None:
+        key = self._key(record, password)
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl_seconds
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_verify_cache: Optional[VerifyCache] = None
+
+
+def get_verify_cache() -> Optional[VerifyCache]:
+    """Кэш проверок по настройкам auth_cache_ttl_seconds / auth_cache_size (ttl=0 — выключен)."""
+    global _verify_cache
+    if _verify_cache is None:
+        settings = SettingsLoader()
+        ttl = settings.get("auth_cache_ttl_seconds", 300)
+        if not ttl:
+            return None
+        _verify_cache = VerifyCache(ttl, settings.get("auth_cache_size", 1024))
+    return _verify_cache
+
+
+def verify_password(password: str, salt: str, record: str) -> bool:
+    """Проверяет пароль по записи любой поддерживаемой версии."""
+    cache = get_verify_cache()
+    if cache is not None and cache.contains(record, password):
+        return True
+    kdf, digest = parse_record(record)
+    ok = hmac.compare_digest(digest, derive(kdf, password, salt))
+    if ok and cache is not None:
+        cache.add(record, password)
+    return ok
+
+
+def needs_rehash(record: str) -> bool:
+    """True, если запись сделана не текущей KDF или с другими параметрами."""
+    kdf, _ = parse_record(record)
+    current = configured_kdf()
+    return (kdf.scheme, kdf.params) != (current.scheme, current.params)
@@ -0,0 +1,359 @@
+import json
+import os
+import shutil
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from valutatrade_hub.core.models import Portfolio, User
+from valutatrade_hub.infra import durable
+
+# Описание раскладки в каталоге data; без него данные лежат в общих users.json и portfolios.json
+LAYOUT_FILENAME = 'shards.json'
+SHARDS_DIRNAME = 'shards'
+KINDS = ('users', 'portfolios')
+# Меньше этого суммарного объёма шарды читаются последовательно: запуск пула процессов дороже разбора
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+
+def shard_of(user_id: int, count: int) -> int:
+    """Номер шарда пользователя: crc32 от user_id, одинаковый во всех процессах и запусках."""
+    return zlib.crc32(str(user_id).encode()) % count if count > 1 else 0
+
+
+def _stat(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _read_list(path: str) -> list:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ShardLayout:
+    """
+    Раскладка users/portfolios по count шардам поколения generation (data/shards.json).
+    Поколение 0 — исходный формат: один шард в data/users.json и data/portfolios.json.
+    Шарды поколения G лежат в data/shards/G/users-NNN.json и portfolios-NNN.json;
+    пересборка пишет следующее поколение рядом и переключается заменой shards.json.
+    """
+
+    def __init__(self, data_dir: str, count: int = 1, generation: int = 0):
+        self.data_dir = data_dir
+        self.count = count
+        self.generation = generation
+
+    @classmethod
+    def read(cls, data_dir: str) -> "ShardLayout":
+        path = os.path.join(data_dir, LAYOUT_FILENAME)
+        if not os.path.exists(path):
+            return cls(data_dir)
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data_dir, data["count"], data["generation"])
+
+    @property
+    def directory(self) -> str:
+        if not self.generation:
+            return self.data_dir
+        return os.path.join(self.data_dir, SHARDS_DIRNAME, str(self.generation))
+
+    def path(self, kind: str, shard: int) -> str:
+        if not self.generation:
+            return os.path.join(self.data_dir, f"{kind}.json")
+        return os.path.join(self.directory, f"{kind}-{shard:03d}.json")
+
+    def paths(self, shard: int) -> Tuple[str, str]:
+        return self.path('users', shard), self.path('portfolios', shard)
+
+    def shard_of(self, user_id: int) -> int:
+        return shard_of(user_id, self.count)
+
+    def signature(self, shard: int) -> tuple:
+        """Отпечаток файлов шарда (inode, mtime, размер): меняется при каждой атомарной замене."""
+        return tuple(_stat(path) for path in self.paths(shard))
+
+    def size(self, shard: int) -> int:
+        return sum(os.path.getsize(path) for path in self.paths(shard) if os.path.exists(path))
+
+
+def read_shard(paths: Tuple[str, str]) -> Tuple[list, list]:
+    """(users, portfolios) одного шарда; верхнеуровневая функция — выполняется и в процессах пула."""
+    users_path, portfolios_path = paths
+    return _read_list(users_path), _read_list(portfolios_path)
+
+
+def read_shards(layout: ShardLayout, shards: List[int], workers: int = 0) -> Dict[int, Tuple[list, list]]:
+    """
+    Читает шарды: несколько крупных — параллельно в пуле процессов (разбор JSON держит GIL,
+    потоки не помогают), иначе последовательно. workers=0 — по числу ядер.
+    """
+    workers = min(len(shards), workers or os.cpu_count() or 1)
+    if workers < 2 or sum(layout.size(shard) for shard in shards) < PARALLEL_MIN_BYTES:
+        return {shard: read_shard(layout.paths(shard)) for shard in shards}
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(shards, pool.map(read_shard, [layout.paths(shard) for shard in shards])))
+
+
+def iter_records(layout: ShardLayout, kind: str) -> Iterator[dict]:
+    """Записи users или portfolios всех шардов по одной, без загрузки файлов в память."""
+    from valutatrade_hub.parser_service.storage import iter_json_array
+
+    for shard in range(layout.count):
+        path = layout.path(kind, shard)
+        if os.path.exists(path):
+            yield from iter_json_array(path)
+
+
+class AccountStore:
+    """
+    Пользователи и портфели процесса поверх шардов.
+
+    refresh() перечитывает только шарды, чьи файлы изменились с прошлого чтения или записи,
+    save() пишет только шарды с изменёнными записями: портфель изменён, если его version
+    отличается от запомненной при чтении, пользователь — если он добавлен через add()
+    или отмечен touch_user(). Смена раскладки (пересборка шардов) перечитывает всё.
+
+    После track_aggregates() хранилище ведёт и сводные показатели (data/aggregates.json):
+    подписывается на изменения кошельков своих портфелей, перечитывает сводку вместе с шардами
+    и записывает её в той же фиксации. Если файла сводки нет, она пересчитывается по портфелям.
+    """
+
+    def __init__(self, data_dir: str, workers: int = 0):
+        self.data_dir = data_dir
+        self.workers = workers
+        self.layout = ShardLayout(data_dir)
+        self.portfolios: Dict[int, Portfolio] = {}
+        self._users: Dict[int, List[User]] = {}
+        self._layout_signature: Optional[tuple] = ()
+        self._signatures: Dict[int, tuple] = {}
+        self._versions: Dict[int, int] = {}
+        self._touched: Set[int] = set()  # user_id новых и изменённых пользователей
+        self.aggregates = None
+        self._aggregates_top_k = 0
+        self._aggregates_signature: Optional[tuple] = ()
+
+    def users(self) -> List[User]:
+        return [user for shard in range(self.layout.count) for user in self._users.get(shard, ())]
+
+    def signature(self) -> tuple:
+        """Отпечаток прочитанного состояния всех шардов (для ключей кэшей)."""
+        return self._layout_signature, tuple(self._signatures.get(s) for s in range(self.layout.count))
+
+    def refresh(self, force: Iterable[int] = ()) -> bool:
+        """Перечитывает изменившиеся на диске шарды и шарды из force. True, если что-то перечитано."""
+        layout_signature = _stat(os.path.join(self.data_dir, LAYOUT_FILENAME))
+        if layout_signature != self._layout_signature:
+            self.layout = ShardLayout.read(self.data_dir)
+            self._layout_signature = layout_signature
+            self.portfolios.clear()
+            self._users, self._signatures, self._versions = {}, {}, {}
+            self._touched.clear()
+            self._aggregates_signature = ()
+        force = set(force)
+        # Отпечаток снимается до чтения: замена файла во время чтения даст лишнее перечитывание, а не пропуск
+        signatures = {shard: self.layout.signature(shard) for shard in range(self.layout.count)}
+        stale = [shard for shard, signature in signatures.items()
+                 if shard in force or shard not in self._signatures or self._signatures[shard] != signature]
+        for shard, (users_data, portfolios_data) in read_shards(self.layout, stale, self.workers).items():
+            self._replace(shard, users_data, portfolios_data)
+            self._signatures[shard] = signatures[shard]
+        if self._aggregates_top_k:
+            self._refresh_aggregates(bool(stale))
+        return bool(stale)
+
+    def track_aggregates(self, top_k: int = 10) -> None:
+        """Включает ведение сводных показателей (см. PlatformAggregates)."""
+        self._aggregates_top_k = top_k
+        for portfolio in self.portfolios.values():
+            portfolio.set_observer(self)
+
+    @property
+    def aggregates_path(self) -> str:
+        from valutatrade_hub.core.aggregates import aggregates_path
+
+        return aggregates_path(self.data_dir)
+
+    def _refresh_aggregates(self, reloaded: bool) -> None:
+        from valutatrade_hub.core.aggregates import PlatformAggregates
+
+        signature = _stat(self.aggregates_path)
+        # Несохранённые изменения сводки (откат транзакции) отбрасываются вместе с шардами;
+        # без файла сводка пересчитывается, когда перечитаны портфели
+        if (signature == self._aggregates_signature and not (self.aggregates and self.aggregates.dirty)
+                and not (signature is None and reloaded)):
+            return
+        aggregates = PlatformAggregates.load(self.aggregates_path) if signature is not None else None
+        self.aggregates = aggregates or PlatformAggregates.build(self.portfolios.values(), self._aggregates_top_k)
+        self._aggregates_signature = signature
+
+    def rebuild_aggregates(self) -> None:
+        """Пересчитывает сводку с нуля по всем портфелям; запишется при ближайшем save()."""
+        from valutatrade_hub.core.aggregates import PlatformAggregates
+
+        self.aggregates = PlatformAggregates.build(self.portfolios.values(), self._aggregates_top_k)
+        self.aggregates.dirty = True
+
+    def wallet_added(self, user_id: int, code: str, balance: float) -> None:
+        self.aggregates.wallet_added(user_id, code, balance)
+
+    def balance_changed(self, user_id: int, code: str, old: float, new: float) -> None:
+        self.aggregates.balance_changed(user_id, code, old, new)
+
+    def _replace(self, shard: int, users_data: list, portfolios_data: list) -> None:
+        for user in self._users.pop(shard, ()):
+            self.portfolios.pop(user.user_id, None)
+            self._versions.pop(user.user_id, None)
+        users = self._users[shard] = [User.from_dict(u) for u in users_data]
+        users_by_id = {u.user_id: u for u in users}
+        for pd in portfolios_data:
+            user = users_by_id.get(pd['user_id'])
+            if user is not None:
+                portfolio = self.portfolios[user.user_id] = Portfolio.from_dict(pd, user)
+                self._versions[user.user_id] = portfolio.version
+                if self._aggregates_top_k:
+                    portfolio.set_observer(self)
+        self._touched = {uid for uid in self._touched if self.layout.shard_of(uid) != shard}
+
+    def add(self, user: User, portfolio: Portfolio) -> None:
+        """Новый пользователь с портфелем; его шард запишется при ближайшем save()."""
+        shard = self.layout.shard_of(user.user_id)
+        self._users.setdefault(shard, []).append(user)
+        self.portfolios[user.user_id] = portfolio
+        self._touched.add(user.user_id)
+        if self._aggregates_top_k:
+            self.aggregates.add_portfolio(portfolio)
+            portfolio.set_observer(self)
+
+    def touch_user(self, user_id: int) -> None:
+        """Отмечает изменение записи пользователя (портфели отслеживаются по version сами)."""
+        self._touched.add(user_id)
+
+    def changed_users(self) -> Set[int]:
+        """user_id с изменениями с прошлого чтения или записи: отмеченные и с новой version портфеля."""
+        versions = self._versions
+        return self._touched | {uid for uid, p in self.portfolios.items() if versions.get(uid) != p.version}
+
+    def dirty_shards(self) -> Set[int]:
+        return {self.layout.shard_of(uid) for uid in self.changed_users()}
+
+    def changes(self) -> Tuple[List[dict], List[dict]]:
+        """
+        Изменённые записи до save(): (пользователи из touch_user/add, портфели всех изменённых).
+        Портфель отмеченного пользователя входит всегда — он ссылается на запись пользователя.
+        """
+        touched = [u for shard in {self.layout.shard_of(uid) for uid in self._touched}
+                   for u in self._users.get(shard, ()) if u.user_id in self._touched]
+        portfolios = [self.portfolios[uid] for uid in sorted(self.changed_users()) if uid in self.portfolios]
+        return [u.to_dict() for u in touched], [p.to_dict() for p in portfolios]
+
+    def save(self) -> List[int]:
+        """
+        Записывает изменённые шарды (внутри transaction — при общей фиксации).
+        Возвращает их номера для remember().
+        """
+        dirty = sorted(self.dirty_shards())
+        for shard in dirty:
+            users = self._users.get(shard, [])
+            portfolios = [self.portfolios[u.user_id] for u in users if u.user_id in self.portfolios]
+            users_path, portfolios_path = self.layout.paths(shard)
+            durable.atomic_write_json(users_path, [u.to_dict() for u in users])
+            durable.atomic_write_json(portfolios_path, [p.to_dict() for p in portfolios])
+            for portfolio in portfolios:
+                self._versions[portfolio.user.user_id] = portfolio.version
+        self._touched.clear()
+        if self.aggregates is not None and (self.aggregates.dirty or self._aggregates_signature is None):
+            self.aggregates.save(self.aggregates_path)
+        return dirty
+
+    def remember(self, shards: Iterable[int]) -> None:
+        """Запоминает отпечатки записанных шардов; вызывать после фиксации под той же блокировкой."""
+        for shard in shards:
+            self._signatures[shard] = self.layout.signature(shard)
+        if self.aggregates is not None:
+            self._aggregates_signature = _stat(self.aggregates_path)
+
+
+class _ArrayWriter:
+    """Потоковая запись JSON-массива по элементу во временный файл рядом с целевым."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.temp_path = path + ".reshard.tmp"
+        self.count = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(self.temp_path, 'w', encoding='utf-8')
+        self._file.write("[")
+
+    def write(self, item) -> None:
+        self._file.write(("\n" if not self.count else ",\n") + json.dumps(item, ensure_ascii=False))
+        self.count += 1
+
+    def close(self) -> None:
+        self._file.write("\n]")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def discard(self) -> None:
+        self._file.close()
+        if os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+
+
+def reshard(data_dir: str, count: int) -> Tuple[ShardLayout, ShardLayout, int]:
+    """
+    Перекладывает users/portfolios в count шардов (count=1 — обратно в общие файлы).
+    Записи читаются и пишутся потоково, память не зависит от числа пользователей.
+    Новое поколение пишется целиком с fsync, переключение — атомарная замена shards.json,
+    и лишь затем удаляются старые файлы: сбой до переключения оставляет в силе прежнюю раскладку.
+    Вызывается под блокировкой данных и вне transaction(). Возвращает (старая, новая, число пользователей).
+    """
+    if count < 1:
+        raise ValueError("Число шардов должно быть положительным")
+    old = ShardLayout.read(data_dir)
+    if old.count == count:
+        return old, old, sum(1 for _ in iter_records(old, 'users'))
+    new = ShardLayout(data_dir, count, old.generation + 1 if count > 1 else 0)
+    writers: List[_ArrayWriter] = []
+    try:
+        for kind in KINDS:
+            shard_writers = [_ArrayWriter(new.path(kind, shard)) for shard in range(count)]
+            writers.extend(shard_writers)
+            for record in iter_records(old, kind):
+                shard_writers[new.shard_of(record['user_id'])].write(record)
+            for writer in shard_writers:
+                writer.close()
+    except BaseException:
+        for writer in writers:
+            writer.discard()
+        raise
+    # Целевые файлы новой раскладки не читаются, пока она не включена, — их можно заменять
+    for writer in writers:
+        os.replace(writer.temp_path, writer.path)
+    durable.fsync_dir(new.directory)
+
+    layout_path = os.path.join(data_dir, LAYOUT_FILENAME)
+    if new.generation:
+        durable.atomic_write_json(layout_path, {"count": new.count, "generation": new.generation})
+    else:
+        os.unlink(layout_path)
+        durable.fsync_dir(data_dir)
+
+    if old.generation:
+        shutil.rmtree(old.directory, ignore_errors=True)
+        if not new.generation and not os.listdir(os.path.dirname(old.directory)):
+            os.rmdir(os.path.dirname(old.directory))
+    else:
+        for kind in KINDS:
+            path = old.path(kind, 0)
+            if os.path.exists(path):
+                os.unlink(path)
+    return old, new, sum(writer.count for writer in writers[:count])
@@ -1,67 +1,313 @@
-from typing import Dict, List, Optional
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from valutatrade_hub.core import utils
 from valutatrade_hub.core.currencies import get_currency
-from valutatrade_hub.core.exceptions import CurrencyNotFoundError, InsufficientFundsError
-from valutatrade_hub.core.models import Portfolio, User, Wallet
+from valutatrade_hub.core.exceptions import (
+    AccessDeniedError,
+    ApiRequestError,
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+    StaleRateError,
+)
+from valutatrade_hub.core.models import Portfolio, User
 from valutatrade_hub.decorators import log_action
+from valutatrade_hub.infra.lru import LRUCache
 from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.parser_service.shared_rates import SharedRatesTable
+
+logger = logging.getLogger(__name__)
 
 # Глобальное состояние
 _current_user: Optional[User] = None
 _users: List[User] = []
 _portfolios: Dict[int, Portfolio] = {}
+_loaded = False
+_store = None
+_replica = None
+
+_shared_rates = SharedRatesTable(utils.get_data_path('rates.shm'))
 
-settings = SettingsLoader()
+def _get_store():
+    """Хранилище пользователей и портфелей по шардам; создаётся при первом обращении к данным."""
+    global _store
+    if _store is None:
+        from valutatrade_hub.core.shards import AccountStore
 
-def _load_all():
-    global _users, _portfolios
-    users_data = utils.load_users()
-    portfolios_data = utils.load_portfolios()
+        settings = SettingsLoader()
+        _store = AccountStore(utils.get_data_dir(), settings.get('shard_load_workers', 0))
+        _store.track_aggregates(settings.get('aggregates_top_k', 10))
+    return _store
 
-    _users = [User.from_dict(u) for u in users_data]
-    users_by_id = {u.user_id: u for u in _users}
+def _load_all(force: Iterable[int] = ()):
+    """Перечитывает изменившиеся на диске шарды (и шарды из force); остальные остаются в памяти."""
+    global _users, _portfolios, _loaded
+    store = _get_store()
+    if store.refresh(force) or not _loaded:
+        _users = store.users()
+        _portfolios = store.portfolios
+    _loaded = True
 
-    _portfolios = {}
-    for pd in portfolios_data:
-        uid = pd['user_id']
-        if uid in users_by_id:
-            _portfolios[uid] = Portfolio.from_dict(pd, users_by_id[uid])
+def _save_all() -> List[int]:
+    """Ставит на запись только шарды, в которых что-то изменилось."""
+    return _get_store().save()
 
-def _save_all():
-    utils.save_users([u.to_dict() for u in _users])
-    utils.save_portfolios([p.to_dict() for p in _portfolios.values()])
+@contextmanager
+def _transaction() -> Iterator[None]:
+    """
+    Изменение данных под межпроцессной блокировкой:
+    перечитывает шарды users/portfolios, изменённые другим процессом, выполняет блок
+    и фиксирует изменённые шарды одной групповой записью. При ошибке они перечитываются с диска.
+    У primary изменения дописываются в журнал для реплик под той же блокировкой до фиксации:
+    порядок записей журнала совпадает с порядком фиксаций, а запись, чья фиксация не состоялась,
+    исправляет _reconcile_changelog.
+    """
+    from valutatrade_hub.core import replication
 
-def _refresh_rates() -> bool:
+    global _current_user
+    replication.require_primary()
+    log = replication.get_changelog()
+    with utils.data_lock():
+        saved: List[int] = []
+        try:
+            with utils.transaction():
+                _load_all()
+                if log is not None:
+                    _reconcile_changelog(log)
+                if _current_user is not None:
+                    _current_user = next((u for u in _users if u.user_id == _current_user.user_id), None)
+                try:
+                    yield
+                except BaseException:
+                    _load_all(force=_get_store().dirty_shards())
+                    raise
+                changes = _get_store().changes() if log is not None else None
+                saved = _save_all()
+                if changes and (changes[0] or changes[1]):
+                    log.append("accounts", {"users": changes[0], "portfolios": changes[1]})
+        except BaseException:
+            if saved:
+                # Фиксация не удалась после записи в журнал: в памяти и у реплик — незаписанные изменения
+                _load_all(force=saved)
+                if log is not None:
+                    _reconcile_changelog(log)
+            raise
+        # Отпечатки записанных шардов снимаются после фиксации, но ещё под блокировкой
+        _get_store().remember(saved)
+
+def _reconcile_changelog(log) -> None:
+    """
+    Сверка последней записи accounts журнала с прочитанными шардами; вызывается под блокировкой данных.
+    Запись дописывается до фиксации, и если писатель упал между ними, реплики получили изменения,
+    которых нет в файлах. Незафиксированной может быть только последняя такая запись: при расхождении
+    журнал дописывается состоянием её пользователей из файлов (отсутствующие — в removed).
     """
-    Попытка обновить курсы валют (заглушка).
-    В реальной системе здесь был бы вызов Parser Service.
+    entry = log.last("accounts")
+    if entry is None:
+        return
+    portfolios = _get_store().portfolios
+    committed = all(u["user_id"] in portfolios and portfolios[u["user_id"]].user.to_dict() == u
+                    for u in entry["users"]) and \
+        all(p["user_id"] in portfolios and portfolios[p["user_id"]].to_dict() == p for p in entry["portfolios"])
+    if committed:
+        return
+    ids = {u["user_id"] for u in entry["users"]} | {p["user_id"] for p in entry["portfolios"]}
+    present = [portfolios[uid] for uid in sorted(ids) if uid in portfolios]
+    logger.warning(f"Change log entry {entry['seq']} was not committed, appending the committed state")
+    log.append("accounts", {"users": [p.user.to_dict() for p in present],
+                            "portfolios": [p.to_dict() for p in present],
+                            "removed": sorted(ids - set(portfolios))})
+
+def _load_rates() -> dict:
+    """
+    Снимок курсов: из общей памяти без разбора JSON, а если её ещё нет — из rates.json.
+    В реплике — из её копии, догнанной по журналу изменений.
+    """
+    replica = _get_replica()
+    if replica is not None:
+        _sync_replica(replica)
+        return replica.rates
+    snapshot = _shared_rates.snapshot()
+    return snapshot if snapshot is not None else utils.load_rates()
+
+def _usd_prices(pairs: dict) -> Dict[str, float]:
+    """Цены валют в USD по кэшу пар (прямые X_USD и обратные USD_X)."""
+    prices = {"USD": 1.0}
+    for pair, data in pairs.items():
+        from_curr, to_curr = pair.split('_')
+        if to_curr == "USD":
+            prices[from_curr] = data['rate']
+        elif from_curr == "USD" and data['rate']:
+            prices.setdefault(to_curr, 1.0 / data['rate'])
+    return prices
+
+def _record_trade(side: str, currency: str, amount: float, rate: float) -> None:
+    """Добавляет сделку в журнал; вызывается внутри _transaction и фиксируется вместе с портфелями."""
+    _record_trades([(_current_user.user_id, side, currency, amount, rate)])
+
+def _record_trades(entries: List[tuple]) -> None:
+    """
+    Пакетная запись сделок (user_id, side, currency, amount, rate) с общим временем исполнения.
+    Сделки дописываются в конец журнала trades.log (JSON Lines): цена записи не зависит от его длины.
+    """
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    utils.append_trades({
+        "user_id": user_id,
+        "side": side,
+        "currency": currency,
+        "amount": amount,
+        "rate": rate,
+        "timestamp": timestamp,
+    } for user_id, side, currency, amount, rate in entries)
+
+def _refresh_rates(pair: str, max_age: Optional[float] = None) -> bool:
+    """
+    Точечное обновление одной пары через её источник (Parser Service).
+    Одновременные обновления одной пары схлопываются в один запрос.
     Возвращает True, если обновление удалось, иначе False.
     """
-    return False
+    from valutatrade_hub.core import replication
+    from valutatrade_hub.parser_service.updater import get_updater
+
+    replication.require_primary()
+    try:
+        return get_updater().refresh_pair(pair, max_age) is not None
+    except ApiRequestError as e:
+        logger.warning(f"Refresh of {pair} failed: {e.reason}")
+        return False
+
+def _lookup_usd_rate(currency: str) -> Optional[tuple]:
+    """
+    (пара, курс currency→USD, время последнего подтверждения курса) из кэша или None, если пары нет.
+    Подтверждение — более позднее из updated_at и checked_at (источник ответил, что курс прежний).
+    """
+    from valutatrade_hub.parser_service.freshness import confirmed_at
 
-_load_all()
+    pairs = _load_rates().get('pairs', {})
+    rate_key = f"{currency}_USD"
+    inv_key = f"USD_{currency}"
+    for key in (rate_key, inv_key):
+        if key in pairs:
+            data = pairs[key]
+            checked_at = utils.load_rate_checks().get(key)
+            rate = data['rate'] if key == rate_key else 1.0 / data['rate']
+            return key, rate, confirmed_at({**data, "checked_at": checked_at})
+    return None
+
+def _trade_rate(currency: str) -> float:
+    """
+    Курс currency→USD для сделки с проверкой свежести.
+    Пара старше допустимого (rates_ttl_seconds / rates_ttl_overrides) или отсутствующая в кэше
+    обновляется точечно; если курс так и остался устаревшим — StaleRateError.
+    """
+    from valutatrade_hub.parser_service.freshness import FreshnessPolicy
+
+    settings = SettingsLoader()
+    policy = FreshnessPolicy.from_settings(settings)
+    found = _lookup_usd_rate(currency)
+    if found is None or policy.is_stale(found[0], found[2]):
+        pair = found[0] if found else f"{currency}_USD"
+        if _refresh_rates(pair, policy.max_age(pair)):
+            found = _lookup_usd_rate(currency)
+    if found is None:
+        raise CurrencyNotFoundError(f"Не удалось получить курс для {currency}→USD")
+    pair, rate, updated_at = found
+    if policy.is_stale(pair, updated_at) and not settings.get('rates_allow_stale', False):
+        raise StaleRateError(pair, policy.age(updated_at), policy.max_age(pair))
+    return rate
+
+def _get_replica():
+    """Копия данных процесса-реплики (создаётся при первом чтении); в остальных ролях — None."""
+    global _replica
+    if _replica is None:
+        from valutatrade_hub.core import replication
+
+        if replication.role() != replication.REPLICA:
+            return None
+        settings = SettingsLoader()
+        _replica = replication.Replica(settings.get('replication_source', 'file'),
+                                       settings.get('replication_max_lag_seconds', 5.0))
+        interval_ms = settings.get('replication_follow_interval_ms', 10)
+        if interval_ms:
+            _replica.follow(interval_ms / 1000)
+    return _replica
+
+def _sync_replica(replica) -> None:
+    """Догоняет primary по журналу; ReplicaLagError, если реплика отстала больше допустимого."""
+    global _users, _portfolios, _loaded
+    replica.sync()
+    replica.check_lag()
+    _users = replica.user_list()
+    _portfolios = replica.portfolios
+    _loaded = True
+
+def _ensure_loaded():
+    """
+    Данные пользователей читаются при первой операции, которой они нужны, а не при импорте.
+    Реплика перед каждым чтением применяет новые записи журнала изменений primary.
+    """
+    replica = _get_replica()
+    if replica is not None:
+        _sync_replica(replica)
+    elif not _loaded:
+        _load_all()
 
 def get_current_user() -> Optional[User]:
     return _current_user
 
+def is_admin() -> bool:
+    """Текущий пользователь входит в admin_usernames настроек."""
+    return _current_user is not None and _current_user.username in SettingsLoader().get('admin_usernames', [])
+
+def _require_admin(operation: str) -> None:
+    """Операции над чужими или всеми данными: нужен вход под администратором."""
+    if not _current_user:
+        raise ValueError("Сначала выполните login")
+    if not is_admin():
+        raise AccessDeniedError(operation)
+
+def export_user_id(username: Optional[str] = None) -> Optional[int]:
+    """
+    user_id, которым ограничивается выгрузка пользовательских данных: администратор выгружает всех
+    или пользователя username, остальные — только свои записи (чужой username — AccessDeniedError).
+    """
+    from valutatrade_hub.core import export
+
+    if not _current_user:
+        raise ValueError("Сначала выполните login")
+    if is_admin():
+        return export.resolve_user(username) if username is not None else None
+    if username is not None and username != _current_user.username:
+        raise AccessDeniedError("export --user")
+    return _current_user.user_id
+
 @log_action()
 def register(username: str, password: str) -> str:
-    if any(u.username == username for u in _users):
-        raise ValueError(f"Имя пользователя '{username}' уже занято")
     if len(password) < 4:
         raise ValueError("Пароль должен быть не короче 4 символов")
+    _ensure_loaded()
+    if any(u.username == username for u in _users):
+        raise ValueError(f"Имя пользователя '{username}' уже занято")
+    # KDF — до блокировки данных: иначе она держала бы записи всех остальных сессий
+    password_record = User.new_password_record(password)
+
+    with _transaction():
+        if any(u.username == username for u in _users):
+            raise ValueError(f"Имя пользователя '{username}' уже занято")
 
-    new_id = max((u.user_id for u in _users), default=0) + 1
-    user = User(new_id, username, password)
-    _users.append(user)
+        new_id = max((u.user_id for u in _users), default=0) + 1
+        user = User(new_id, username, password, password_record=password_record)
 
-    # Создаём портфель с начальным USD кошельком (1000 для демонстрации)
-    portfolio = Portfolio(user)
-    portfolio._wallets["USD"] = Wallet("USD", 1000.0)
-    _portfolios[user.user_id] = portfolio
+        # Создаём портфель с начальным USD кошельком (1000 для демонстрации)
+        portfolio = Portfolio(user)
+        portfolio.add_currency("USD")
+        portfolio.get_wallet("USD").deposit(1000.0)
+        _get_store().add(user, portfolio)
+        _users.append(user)
 
-    _save_all()
     return (
     f"Пользователь '{username}' зарегистрирован (id={new_id}). "
     f"Войдите: login --username {username} --password ****"
@@ -70,11 +316,22 @@ def register(username: str, password: str) -> str:
 @log_action()
 def login(username: str, password: str) -> str:
     global _current_user
+    _ensure_loaded()
     user = next((u for u in _users if u.username == username), None)
     if not user:
         raise ValueError(f"Пользователь '{username}' не найден")
     if not user.verify_password(password):
         raise ValueError("Неверный пароль")
+    if user.needs_rehash() and _get_replica() is None:
+        # Прозрачно переводим старую запись хеша на текущую KDF; хеш считается до блокировки данных
+        verified = user.password_record
+        password_record = User.new_password_record(password)
+        with _transaction():
+            user = next(u for u in _users if u.user_id == user.user_id)
+            # Пароль могли сменить, пока считался хеш: тогда проверенная запись уже не та
+            if user.password_record == verified:
+                user.rehash_password(password, password_record)
+                _get_store().touch_user(user.user_id)
     _current_user = user
     return f"Вы вошли как '{username}'"
 
@@ -82,20 +339,20 @@ def logout():
     global _current_user
     _current_user = None
 
-def show_portfolio(base_currency: Optional[str] = None) -> str:
-    # Если базовая валюта не указана явно, берём из настроек
-    if base_currency is None:
-        base_currency = settings.get('default_base_currency', 'USD')
+# Оценки для show_portfolio: (user_id, база, версия портфеля, версия курсов) -> (строки, итог, текст).
+# Строки — (код, баланс, курс или None, стоимость в базе)
+_portfolio_cache: Optional[LRUCache] = None
 
-    if not _current_user:
-        raise ValueError("Сначала выполните login")
-    portfolio = _portfolios.get(_current_user.user_id)
-    if not portfolio:
-        raise ValueError("Портфель не найден")
+def _get_portfolio_cache() -> LRUCache:
+    global _portfolio_cache
+    if _portfolio_cache is None:
+        _portfolio_cache = LRUCache(SettingsLoader().get('portfolio_cache_size', 1024))
+    return _portfolio_cache
 
-    rates_data = utils.load_rates()
-    pairs = rates_data.get('pairs', {})
-    lines = [f"Портфель пользователя '{_current_user.username}' (база: {base_currency}):"]
+def _value_portfolio(portfolio: Portfolio, pairs: dict, base_currency: str) -> tuple:
+    """Пересчёт всех кошельков в базовую валюту и текст отчёта."""
+    lines = [f"Портфель пользователя '{portfolio.user.username}' (база: {base_currency}):"]
+    rows = []
     total = 0.0
     if not portfolio.wallets:
         lines.append("  Кошельков нет.")
@@ -122,9 +379,297 @@ def show_portfolio(base_currency: Optional[str] = None) -> str:
                     converted = balance * rate
                     rate_str = f"{rate:.4f}"
             total += converted
+            rows.append((code, balance, rate, converted))
             lines.append(f"  - {code}: {balance:.2f}  → {converted:.2f} {base_currency} (курс: {rate_str})")
     lines.append("-" * 40)
     lines.append(f"ИТОГО: {total:.2f} {base_currency}")
+    return tuple(rows), total, "\n".join(lines)
+
+def show_portfolio(base_currency: Optional[str] = None) -> str:
+    """
+    Портфель в базовой валюте. Результат кэшируется по (пользователь, база, версия портфеля,
+    версия курсов): пока не изменились ни кошельки, ни кэш курсов, повторный вызов ничего не пересчитывает.
+    """
+    # Если базовая валюта не указана явно, берём из настроек
+    if base_currency is None:
+        base_currency = SettingsLoader().get('default_base_currency', 'USD')
+
+    if not _current_user:
+        raise ValueError("Сначала выполните login")
+    _ensure_loaded()
+    portfolio = _portfolios.get(_current_user.user_id)
+    if not portfolio:
+        raise ValueError("Портфель не найден")
+
+    rates_data = _load_rates()
+    rates_version = rates_data.get('version')
+    cache = _get_portfolio_cache()
+    # Без счётчика версий только снимок, восстановленный из истории при повреждённом rates.json: он не кэшируется
+    key = (_current_user.user_id, base_currency, portfolio.version, rates_version)
+    if rates_version is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached[2]
+    valuation = _value_portfolio(portfolio, rates_data.get('pairs', {}), base_currency)
+    if rates_version is not None:
+        cache.put(key, valuation)
+    return valuation[2]
+
+def cache_stats() -> str:
+    """Счётчики кэша оценок портфелей."""
+    stats = _get_portfolio_cache().stats()
+    return (f"Кэш show-portfolio: попаданий {stats['hits']}, промахов {stats['misses']} "
+            f"({stats['hit_ratio']:.1%}), записей {stats['size']}/{stats['max_size']}")
+
+def show_pnl(base_currency: Optional[str] = None) -> str:
+    """
+    Себестоимость (средняя и FIFO), реализованный/нереализованный P&L по каждой валюте
+    и доходность портфеля, взвешенная по времени, с первой сделки пользователя.
+    """
+    if base_currency is None:
+        base_currency = SettingsLoader().get('default_base_currency', 'USD')
+    base_currency = base_currency.upper()
+
+    if not _current_user:
+        raise ValueError("Сначала выполните login")
+    _ensure_loaded()
+    portfolio = _portfolios.get(_current_user.user_id)
+    if not portfolio:
+        raise ValueError("Портфель не найден")
+
+    prices = _usd_prices(_load_rates().get('pairs', {}))
+    if base_currency not in prices:
+        raise CurrencyNotFoundError(f"Курс {base_currency}→USD недоступен. Выполните update-rates.")
+    base_price = prices[base_currency]
+
+    from valutatrade_hub.core import analytics
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    trades = [t for t in utils.load_trades() if t['user_id'] == _current_user.user_id]
+    positions = analytics.build_positions(trades)
+    holdings = {code: w.balance for code, w in portfolio.wallets.items()}
+
+    lines = [f"P&L пользователя '{_current_user.username}' (база: {base_currency}):"]
+    total_realized = total_unrealized = 0.0
+    for code, position in positions.items():
+        price = prices.get(code)
+        total_realized += position.realized
+        line = (f"  - {code}: {position.quantity:.4f} (ср. цена {position.avg_cost / base_price:.2f}, "
+                f"себестоимость FIFO {position.cost_basis / base_price:.2f})")
+        if price is None:
+            line += " | курс N/A"
+        else:
+            unrealized = position.unrealized(price)
+            total_unrealized += unrealized
+            line += (f" → {position.quantity * price / base_price:.2f} {base_currency}"
+                     f" | нереализ.: {unrealized / base_price:+.2f}")
+        line += f" | реализ.: {position.realized / base_price:+.2f}"
+        untracked = holdings.get(code, 0.0) - position.quantity
+        if untracked > 1e-9:
+            line += f" | без себестоимости: {untracked:.4f}"
+        lines.append(line)
+    if not positions:
+        lines.append("  Сделок нет.")
+
+    storage = RatesStorage(utils.get_data_path('exchange_rates.json'), utils.get_data_path('rates.json'))
+    twr = analytics.time_weighted_return(trades, storage.iter_history(), holdings, prices, base_currency)
+
+    lines.append("-" * 40)
+    lines.append(f"Реализованный P&L: {total_realized / base_price:+.2f} {base_currency}")
+    lines.append(f"Нереализованный P&L: {total_unrealized / base_price:+.2f} {base_currency}")
+    if twr is not None:
+        lines.append(f"Доходность (TWR) с {twr[1]}: {twr[0] * 100:+.2f}%")
+    return "\n".join(lines)
+
+# Пакетный VaR всех портфелей: (ключ версий данных, {user_id: (параметрический, исторический)})
+_risk_cache: Optional[tuple] = None
+
+def _portfolio_var(model, prices: Dict[str, float], confidence: float) -> Tuple[Dict[int, tuple], bool]:
+    """
+    VaR всех портфелей одной матричной операцией. Результат кэшируется до изменения
+    истории курсов, портфелей или кэша курсов. Возвращает (результаты, взят ли из кэша).
+    """
+    global _risk_cache
+    replica = _get_replica()
+    accounts_version = (replica.bootstraps, replica.applied) if replica is not None else _get_store().signature()
+    key = (model, model.window, confidence, accounts_version, tuple(sorted(prices.items())))
+    if _risk_cache is not None and _risk_cache[0] == key:
+        return _risk_cache[1], True
+
+    user_ids = list(_portfolios)
+    holdings = [{code: w.balance for code, w in _portfolios[uid].wallets.items()} for uid in user_ids]
+    parametric, historical = model.value_at_risk(model.exposure_matrix(holdings, prices), confidence)
+    result = dict(zip(user_ids, zip(parametric, historical)))
+    _risk_cache = (key, result)
+    return result, False
+
+def show_risk(base_currency: Optional[str] = None, window: Optional[int] = None,
+              confidence: Optional[float] = None) -> str:
+    """
+    Волатильность позиций, корреляции и VaR портфеля (параметрический и исторический) на один интервал.
+    Модель строится по истории один раз, VaR считается сразу для всех портфелей.
+    """
+    from valutatrade_hub.core import risk
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    settings = SettingsLoader()
+    base_currency = (base_currency or settings.get('default_base_currency', 'USD')).upper()
+    window = window or settings.get('risk_window', 30)
+    confidence = confidence or settings.get('risk_confidence', 0.95)
+    if not 0.5 < confidence < 1:
+        raise ValueError("Уровень доверия должен быть в интервале (0.5, 1), например 0.95")
+    if window < 2:
+        raise ValueError("Окно должно содержать хотя бы 2 интервала")
+    if not _current_user:
+        raise ValueError("Сначала выполните login")
+    _ensure_loaded()
+    portfolio = _portfolios.get(_current_user.user_id)
+    if not portfolio:
+        raise ValueError("Портфель не найден")
+
+    prices = _usd_prices(_load_rates().get('pairs', {}))
+    if base_currency not in prices:
+        raise CurrencyNotFoundError(f"Курс {base_currency}→USD недоступен. Выполните update-rates.")
+    base_price = prices[base_currency]
+
+    storage = RatesStorage(utils.get_data_path('exchange_rates.json'), utils.get_data_path('rates.json'))
+    model = risk.get_model(storage, window, settings.get('risk_bucket_seconds', 60))
+    if not model.ready:
+        return "Недостаточно истории курсов для оценки риска. Выполните update-rates несколько раз."
+
+    start = time.perf_counter()
+    results, cached = _portfolio_var(model, prices, confidence)
+    elapsed = (time.perf_counter() - start) * 1000
+    parametric, historical = results[_current_user.user_id]
+
+    lines = [f"Риск портфеля '{_current_user.username}' (база: {base_currency}, доверие {confidence:.0%}, "
+             f"окно {model.window} интервалов по {model.bucket_seconds} с):"]
+    held = [code for code, w in portfolio.wallets.items() if w.balance > 0 and code in model.index]
+    for code in held:
+        value = portfolio.get_wallet(code).balance * prices[code] / base_price
+        lines.append(f"  - {code}: {value:.2f} {base_currency} | волатильность {model.vol[model.index[code]]:.2%}")
+    if not held:
+        lines.append("  Нет позиций в валютах с историей курсов — риск не оценивается.")
+    lines.append(f"VaR параметрический: {parametric / base_price:.2f} {base_currency}")
+    lines.append(f"VaR исторический: {historical / base_price:.2f} {base_currency}")
+    if len(held) > 1:
+        lines.append("Корреляции:")
+        lines.append("       " + "".join(f"{code:>8}" for code in held))
+        for a in held:
+            row = model.corr[model.index[a]]
+            lines.append(f"  {a:<5}" + "".join(f"{row[model.index[b]]:>8.2f}" for b in held))
+    lines.append(f"VaR рассчитан для {len(results)} портфелей за {elapsed:.1f} мс" + (" (кэш)" if cached else ""))
+    return "\n".join(lines)
+
+def _apply_planned_trade(portfolio: Portfolio, trade) -> Optional[tuple]:
+    """
+    Исполняет сделку плана ребалансировки против USD-кошелька портфеля.
+    Объём ограничивается фактическим остатком (защита от погрешностей округления).
+    Возвращает запись для журнала (side, currency, amount, rate) или None.
+    """
+    # Portfolio.wallets копирует словарь — на сотнях тысяч сделок проверяем наличие через один снимок
+    wallets = portfolio.wallets
+    for code in ("USD", trade.currency):
+        if code not in wallets:
+            portfolio.add_currency(code)
+            wallets[code] = portfolio.get_wallet(code)
+    usd = wallets["USD"]
+    wallet = wallets[trade.currency]
+    if trade.amount > 0:
+        cost = min(trade.amount * trade.rate, usd.balance)
+        if cost <= 0:
+            return None
+        usd.withdraw(cost)
+        wallet.deposit(cost / trade.rate)
+        return "buy", trade.currency, cost / trade.rate, trade.rate
+    amount = min(-trade.amount, wallet.balance)
+    if amount <= 0:
+        return None
+    wallet.withdraw(amount)
+    usd.deposit(amount * trade.rate)
+    return "sell", trade.currency, amount, trade.rate
+
+@log_action()
+def rebalance(targets: str, usernames: Optional[List[str]] = None, all_users: bool = False,
+              dry_run: bool = False) -> str:
+    """
+    Ребалансировка к целевым долям ("USD=60,BTC=30,ETH=10") для текущего пользователя,
+    списка пользователей или всех сразу (чужие портфели — только администратору).
+    Цены берутся одним снимком (устаревшие пары сначала обновляются), план — минимальный набор
+    сделок против USD; все сделки всех портфелей и журнал фиксируются одной транзакцией.
+    """
+    from valutatrade_hub.core import rebalance as engine
+
+    weights = engine.parse_targets(targets)
+    for code in weights:
+        get_currency(code)
+    if not _current_user:
+        raise ValueError("Сначала выполните login")
+    if all_users or (usernames and set(usernames) != {_current_user.username}):
+        _require_admin("rebalance --users/--all")
+    _ensure_loaded()
+
+    def cohort() -> List[int]:
+        if all_users:
+            return list(_portfolios)
+        if usernames:
+            by_name = {u.username: u.user_id for u in _users}
+            unknown = [name for name in usernames if name not in by_name]
+            if unknown:
+                raise ValueError(f"Пользователи не найдены: {', '.join(unknown)}")
+            return [by_name[name] for name in usernames if by_name[name] in _portfolios]
+        return [_current_user.user_id]
+
+    # Один снимок цен: проверка свежести (и точечное обновление) до захвата блокировки данных
+    snapshot_prices = _usd_prices(_load_rates().get('pairs', {}))
+    codes = set(weights) | {code for uid in cohort() for code in _portfolios[uid].wallets if code in snapshot_prices}
+    for code in sorted(codes - {"USD"}):
+        _trade_rate(code)
+    prices = _usd_prices(_load_rates().get('pairs', {}))
+    min_trade = SettingsLoader().get('rebalance_min_trade_usd', 1.0)
+
+    def build_plan(user_ids: List[int]):
+        start = time.perf_counter()
+        holdings = [{code: w.balance for code, w in _portfolios[uid].wallets.items()} for uid in user_ids]
+        report = engine.plan(holdings, prices, weights, min_trade)
+        report.plan_ms = (time.perf_counter() - start) * 1000
+        return report
+
+    if dry_run:
+        user_ids = cohort()
+        report = build_plan(user_ids)
+    else:
+        with _transaction():
+            # Портфели перечитаны под блокировкой — план строится по актуальным остаткам
+            user_ids = cohort()
+            report = build_plan(user_ids)
+            start = time.perf_counter()
+            entries, executed_trades = [], []
+            for trade in report.trades:
+                user_id = user_ids[trade.index]
+                executed = _apply_planned_trade(_portfolios[user_id], trade)
+                if executed is not None:
+                    entries.append((user_id,) + executed)
+                    side, currency, amount, rate = executed
+                    executed_trades.append(engine.PlannedTrade(trade.index, currency,
+                                                               amount if side == "buy" else -amount, rate))
+            if entries:
+                _record_trades(entries)
+            # Отчёт — по исполненным сделкам: объём ограничивается фактическими остатками
+            report.skipped = len(report.trades) - len(executed_trades)
+            report.trades = executed_trades
+        report.commit_ms = (time.perf_counter() - start) * 1000
+
+    lines = [("План" if dry_run else "Ребалансировка") + " к долям " +
+             ", ".join(f"{code} {weight:.0%}" for code, weight in weights.items()) + ":"]
+    if len(user_ids) == 1:
+        for trade in report.trades:
+            side = "купить" if trade.amount > 0 else "продать"
+            lines.append(f"  - {side} {abs(trade.amount):.6f} {trade.currency} по {trade.rate:.2f} USD"
+                         f" ({trade.value:.2f} USD)")
+        if not report.trades:
+            lines.append("  Портфель уже соответствует целевым долям.")
+    lines.append(report.summary())
     return "\n".join(lines)
 
 @log_action(verbose=True)
@@ -133,40 +678,30 @@ def buy(currency: str, amount: float) -> str:
         raise ValueError("Сначала выполните login")
     if amount <= 0:
         raise ValueError("amount должен быть положительным числом")
-    currency = currency.upper()
+    # Валидация через get_currency (выбросит CurrencyNotFoundError); алиасы и символы приводятся к коду
+    currency = get_currency(currency).code
 
-    # Валидация кода валюты через get_currency (выбросит CurrencyNotFoundError)
-    get_currency(currency)
+    # Курс проверяется (и при необходимости обновляется) до захвата блокировки данных
+    rate = _trade_rate(currency)
 
-    portfolio = _portfolios[_current_user.user_id]
-
-    rates = utils.load_rates()
-    pairs = rates.get('pairs', {})  # получаем словарь пар
-    rate_key = f"{currency}_USD"
-    inv_key = f"USD_{currency}"
-    rate = None
-    if rate_key in pairs:
-        rate = pairs[rate_key]['rate']
-    elif inv_key in pairs:
-        rate = 1.0 / pairs[inv_key]['rate']
-    else:
-        raise CurrencyNotFoundError(f"Не удалось получить курс для {currency}→USD")
+    with _transaction():
+        portfolio = _portfolios[_current_user.user_id]
 
-    cost = amount * rate
+        cost = amount * rate
 
-    usd_wallet = portfolio.get_wallet("USD")
-    if usd_wallet.balance < cost:
-        raise InsufficientFundsError(usd_wallet.balance, cost, "USD")
+        usd_wallet = portfolio.get_wallet("USD")
+        if usd_wallet.balance < cost:
+            raise InsufficientFundsError(usd_wallet.balance, cost, "USD")
 
-    usd_wallet.withdraw(cost)
-    if currency in portfolio.wallets:
-        target = portfolio.get_wallet(currency)
-    else:
-        portfolio.add_currency(currency)
-        target = portfolio.get_wallet(currency)
-    target.deposit(amount)
+        usd_wallet.withdraw(cost)
+        if currency in portfolio.wallets:
+            target = portfolio.get_wallet(currency)
+        else:
+            portfolio.add_currency(currency)
+            target = portfolio.get_wallet(currency)
+        target.deposit(amount)
+        _record_trade("buy", currency, amount, rate)
 
-    _save_all()
     return (f"Покупка выполнена: {amount:.4f} {currency} по курсу {rate:.2f} USD/{currency}\n"
             f"Изменения в портфеле:\n"
             f"- {currency}: было {target.balance - amount:.4f} → стало {target.balance:.4f}\n"
@@ -179,54 +714,257 @@ def sell(currency: str, amount: float) -> str:
         raise ValueError("Сначала выполните login")
     if amount <= 0:
         raise ValueError("amount должен быть положительным числом")
-    currency = currency.upper()
+    # Валидация кода валюты (алиас или символ приводится к коду)
+    currency = get_currency(currency).code
+    rate = _trade_rate(currency)
 
-    # Валидация кода валюты
-    get_currency(currency)
+    with _transaction():
+        portfolio = _portfolios[_current_user.user_id]
 
-    portfolio = _portfolios[_current_user.user_id]
+        if currency not in portfolio.wallets:
+            raise CurrencyNotFoundError(f"У вас нет кошелька '{currency}'. "
+                                        f"Добавьте валюту: она создаётся автоматически при первой покупке.")
 
-    if currency not in portfolio.wallets:
-        raise CurrencyNotFoundError(f"У вас нет кошелька '{currency}'. "
-                                    f"Добавьте валюту: она создаётся автоматически при первой покупке.")
-
-    target = portfolio.get_wallet(currency)
-    if target.balance < amount:
-        raise InsufficientFundsError(target.balance, amount, currency)
+        target = portfolio.get_wallet(currency)
+        if target.balance < amount:
+            raise InsufficientFundsError(target.balance, amount, currency)
 
-    rates_data = utils.load_rates()
-    pairs = rates_data.get('pairs', {})
-    rate_key = f"{currency}_USD"
-    inv_key = f"USD_{currency}"
-    rate = None
-    if rate_key in pairs:
-        rate = pairs[rate_key]['rate']
-    elif inv_key in pairs:
-        rate = 1.0 / pairs[inv_key]['rate']
-    else:
-        raise CurrencyNotFoundError(f"Не удалось получить курс для {currency}→USD")
-    proceeds = amount * rate
+        proceeds = amount * rate
 
-    target.withdraw(amount)
-    usd_wallet = portfolio.get_wallet("USD")
-    usd_wallet.deposit(proceeds)
+        target.withdraw(amount)
+        usd_wallet = portfolio.get_wallet("USD")
+        usd_wallet.deposit(proceeds)
+        _record_trade("sell", currency, amount, rate)
 
-    _save_all()
     return (f"Продажа выполнена: {amount:.4f} {currency} по курсу {rate:.2f} USD/{currency}\n"
             f"Изменения в портфеле:\n"
             f"- {currency}: было {target.balance + amount:.4f} → стало {target.balance:.4f}\n"
             f"- USD: было {usd_wallet.balance - proceeds:.2f} → стало {usd_wallet.balance:.2f}\n"
             f"Оценочная выручка: {proceeds:.2f} USD")
 
-def get_rate(from_curr: str, to_curr: str) -> str:
-    from_curr = from_curr.upper()
-    to_curr = to_curr.upper()
+# Внутренняя биржа в памяти процесса и отпечаток файлов заявок, которому она соответствует
+_engine = None
+_engine_signature: Optional[tuple] = None
+_engine_journal = 0  # строк в orders.log
+# Журнал заявок сворачивается в снимок orders.json, когда становится длиннее
+# max(ORDERS_LOG_MIN, ORDERS_LOG_FACTOR · число стоящих заявок): запись снимка окупается
+ORDERS_LOG_MIN = 1000
+ORDERS_LOG_FACTOR = 2
+
+def _get_engine():
+    """
+    Книги заявок из памяти; снимок orders.json и журнал orders.log перечитываются,
+    только если их изменил другой процесс (или книга в памяти отброшена после ошибки).
+    """
+    from valutatrade_hub.core import orderbook
 
-    # Валидация кодов валют
-    get_currency(from_curr)
-    get_currency(to_curr)
+    global _engine, _engine_signature, _engine_journal
+    with utils.data_lock():
+        signature = utils.orders_signature()
+        if _engine is None or signature != _engine_signature:
+            data = utils.load_orders()
+            _engine = orderbook.MatchingEngine.from_dict(data)
+            _engine_signature, _engine_journal = signature, data["journal"]
+        return _engine
 
-    rates_data = utils.load_rates()
+def _save_order_changes(engine, changed: Iterable[int]) -> None:
+    """Изменённые заявки — строкой в журнал каждая (исполненные и снятые — removed); длинный журнал — в снимок."""
+    global _engine_journal
+    records = []
+    for order_id in sorted(changed):
+        order = engine.find(order_id)
+        records.append(order.to_dict() if order is not None else {"order_id": order_id, "removed": True})
+    resting = sum(len(book) for book in engine.books.values())
+    if _engine_journal + len(records) > max(ORDERS_LOG_MIN, ORDERS_LOG_FACTOR * resting):
+        utils.save_orders(engine.to_dict())
+        _engine_journal = 0
+    else:
+        utils.save_order_changes(records)
+        _engine_journal += len(records)
+
+@contextmanager
+def _order_transaction() -> Iterator[tuple]:
+    """
+    _transaction над книгами заявок: даёт (книга из памяти, множество номеров изменённых заявок),
+    изменения попадают в журнал заявок той же фиксацией. Если блок или фиксация не удались,
+    книга в памяти отбрасывается и при следующем обращении перечитывается с диска.
+    """
+    global _engine, _engine_signature
+    changed = set()
+    with utils.data_lock():
+        try:
+            with _transaction():
+                engine = _get_engine()
+                yield engine, changed
+                _save_order_changes(engine, changed)
+        except BaseException:
+            _engine = None
+            raise
+        # Отпечаток снимается после фиксации, но ещё под блокировкой: чужих изменений в нём нет
+        _engine_signature = utils.orders_signature()
+
+def _order_pair(pair: str) -> str:
+    """Пара внутренней биржи BASE_QUOTE с кодами из реестра валют."""
+    base, sep, quote = pair.strip().partition("_")
+    if not sep or not base or not quote:
+        raise ValueError(f"Пара задаётся как BASE_QUOTE (например, BTC_USD), получено '{pair}'")
+    base, quote = get_currency(base).code, get_currency(quote).code
+    if base == quote:
+        raise ValueError("Валюты пары должны различаться")
+    return f"{base}_{quote}"
+
+def _fill_entries(fill, quote_usd: float) -> List[tuple]:
+    """
+    Записи журнала сделок по исполнению (курс в USD, как у buy/sell): покупатель купил BASE,
+    продавец продал; для пары не к USD — ещё и встречные движения QUOTE.
+    """
+    base, _, quote = fill.pair.partition("_")
+    rate = fill.price * quote_usd
+    entries = [(fill.buyer_id, "buy", base, fill.amount, rate),
+               (fill.seller_id, "sell", base, fill.amount, rate)]
+    if quote != "USD":
+        value = fill.price * fill.amount
+        entries += [(fill.buyer_id, "sell", quote, value, quote_usd),
+                    (fill.seller_id, "buy", quote, value, quote_usd)]
+    return entries
+
+@log_action(verbose=True)
+def place_order(side: str, pair: str, amount: float, price: float) -> str:
+    """
+    Лимитная заявка во внутреннюю книгу пары BASE_QUOTE (price — QUOTE за единицу BASE).
+    Средства резервируются при выставлении; встречные заявки исполняются по приоритету цена-время
+    по цене стоящей заявки, каждое исполнение сразу рассчитывается по кошелькам обеих сторон,
+    неисполненный остаток встаёт в книгу.
+    """
+    from valutatrade_hub.core import orderbook
+
+    if not _current_user:
+        raise ValueError("Сначала выполните login")
+    side = side.lower()
+    pair = _order_pair(pair)
+    quote = pair.partition("_")[2]
+    quote_usd = 1.0 if quote == "USD" else _usd_prices(_load_rates().get('pairs', {})).get(quote)
+    if quote_usd is None:
+        raise CurrencyNotFoundError(f"Курс {quote}→USD недоступен для учёта сделок. Выполните update-rates.")
+
+    with _order_transaction() as (engine, changed):
+        order = engine.new_order(_current_user.user_id, pair, side, amount, price)
+        orderbook.reserve(order, _portfolios[_current_user.user_id])
+        fills = engine.submit(order)
+        changed.add(order.order_id)
+        entries = []
+        for fill in fills:
+            changed.update((fill.buy_order_id, fill.sell_order_id))
+            orderbook.settle(fill, _portfolios[fill.buyer_id], _portfolios[fill.seller_id])
+            entries.extend(_fill_entries(fill, quote_usd))
+        if entries:
+            _record_trades(entries)
+
+    text = f"Заявка #{order.order_id}: {side} {amount:.4f} {order.base} по {price:.2f} {quote}"
+    if fills:
+        average = sum(f.price * f.amount for f in fills) / order.filled
+        text += (f"\nИсполнено {order.filled:.4f} {order.base} (сделок: {len(fills)}), "
+                 f"средняя цена {average:.2f} {quote}")
+    if order.remaining > 0:
+        text += f"\nОстаток {order.remaining:.4f} {order.base} стоит в книге {pair}"
+    else:
+        text += "\nЗаявка исполнена полностью"
+    return text
+
+@log_action(verbose=True)
+def cancel_order(order_id: int) -> str:
+    """Снимает свою стоящую заявку и возвращает резерв неисполненного остатка."""
+    from valutatrade_hub.core import orderbook
+
+    if not _current_user:
+        raise ValueError("Сначала выполните login")
+    with _order_transaction() as (engine, changed):
+        order = engine.find(order_id)
+        if order is None or order.user_id != _current_user.user_id:
+            raise ValueError(f"Открытая заявка #{order_id} не найдена")
+        engine.cancel(order_id)
+        changed.add(order_id)
+        orderbook.release(order, _portfolios[_current_user.user_id])
+    refund = (f"{order.remaining * order.price:.2f} {order.quote}" if order.side == orderbook.BUY
+              else f"{order.remaining:.4f} {order.base}")
+    return f"Заявка #{order_id} снята, возвращено {refund}"
+
+def show_orderbook(pair: Optional[str] = None, depth: int = 10) -> str:
+    """
+    Стакан пары: лучшие depth уровней продаж и покупок (цена, объём, число заявок)
+    и открытые заявки текущего пользователя. Без пары — только свои заявки по всем парам.
+    """
+    from valutatrade_hub.core import orderbook
+
+    if pair is None and not _current_user:
+        raise ValueError("Укажите --pair или выполните login, чтобы увидеть свои заявки")
+    engine = _get_engine()
+    lines = []
+    if pair is not None:
+        pair = _order_pair(pair)
+        book = engine.book(pair)
+        lines.append(f"Книга {pair}:")
+        asks = book.depth(orderbook.SELL, depth)
+        bids = book.depth(orderbook.BUY, depth)
+        for price, volume, count in reversed(asks):
+            lines.append(f"  sell {price:>14.2f} {volume:>14.4f} ({count})")
+        lines.append("  " + "-" * 36)
+        for price, volume, count in bids:
+            lines.append(f"  buy  {price:>14.2f} {volume:>14.4f} ({count})")
+        if not asks and not bids:
+            lines.append("  Заявок нет.")
+    if _current_user:
+        mine = [o for o in engine.open_orders()
+                if o.user_id == _current_user.user_id and (pair is None or o.pair == pair)]
+        lines.append("Мои заявки:" if mine else "Открытых заявок нет.")
+        for o in mine:
+            lines.append(f"  #{o.order_id} {o.pair} {o.side} {o.remaining:.4f}/{o.amount:.4f} по {o.price:.2f}"
+                         f" ({o.created_at})")
+    return "\n".join(lines)
+
+def show_rates(
+    currency: Optional[str] = None,
+    base: Optional[str] = None,
+    sort: str = "pair",
+    descending: bool = False,
+    page: int = 1,
+    limit: Optional[int] = None,
+    top: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Таблица кэшированных курсов построчно (для потокового вывода).
+    currency — фильтр по базовой валюте пары (BTC в BTC_USD), base — по котируемой (USD).
+    Ошибки аргументов выбрасываются сразу, до начала вывода.
+    """
+    from valutatrade_hub.core import rates_query
+
+    snapshot = _load_rates()
+    if not snapshot.get('pairs'):
+        return iter(["Локальный кеш курсов пуст. Выполните 'update-rates', чтобы загрузить данные."])
+    if limit is None:
+        limit = SettingsLoader().get('rates_page_size', 50)
+    index = rates_query.get_index(snapshot)
+    rows, total = index.query(currency, base, sort, descending, page, limit, top)
+    if total == 0:
+        return iter([f"Курс для '{currency or base}' не найден в кеше."])
+    pages = (total + limit - 1) // limit if top is None and limit else 1
+    if top is None and page > pages:
+        raise ValueError(f"Страница {page} вне диапазона: всего страниц {pages} (пар: {total})")
+
+    def lines() -> Iterator[str]:
+        yield f"Rates from cache (updated at {snapshot.get('last_refresh', 'unknown')}):"
+        yield from rates_query.render_rows(index, rows)
+        if pages > 1:
+            footer = f"Страница {page} из {pages} (всего пар: {total})."
+            yield footer + (f" Следующая: --page {page + 1}" if page < pages else "")
+    return lines()
+
+def get_rate(from_curr: str, to_curr: str) -> str:
+    # Валидация кодов валют (алиасы и символы приводятся к кодам)
+    from_curr = get_currency(from_curr).code
+    to_curr = get_currency(to_curr).code
+
+    rates_data = _load_rates()
     pairs = rates_data.get('pairs', {})
 
     direct_key = f"{from_curr}_{to_curr}"
@@ -249,3 +987,94 @@ def get_rate(from_curr: str, to_curr: str) -> str:
 
     return (f"Курс {from_curr}→{to_curr}: {rate:.8f} (обновлено: {updated})\n"
             f"Обратный курс {to_curr}→{from_curr}: {1.0/rate:.8f}" if rate != 0 else "Курс равен нулю")
+
+def reshard(count: int) -> str:
+    """Перекладывает пользователей и портфели в count шардов под блокировкой данных (администратор)."""
+    from valutatrade_hub.core import replication, shards
+
+    _require_admin("reshard")
+    replication.require_primary()
+    start = time.perf_counter()
+    with utils.data_lock():
+        old, new, users = shards.reshard(utils.get_data_dir(), count)
+        if _loaded:
+            _load_all()
+    if old is new:
+        return f"Данные уже разложены по {count} шардам (пользователей: {users})."
+    logger.info(f"Resharded {users} users: {old.count} -> {new.count} shards")
+    return (f"Пользователи ({users}) переложены: {old.count} → {new.count} шардов "
+            f"за {time.perf_counter() - start:.2f} с")
+
+def archive_history(before: Optional[str] = None, codec: Optional[str] = None) -> str:
+    """Переносит закрытые дни истории курсов в сжатый архив (см. RatesStorage.archive_history; администратор)."""
+    from valutatrade_hub.core import replication
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    _require_admin("archive-history")
+    replication.require_primary()
+    settings = SettingsLoader()
+    storage = RatesStorage(utils.get_data_path('exchange_rates.json'), utils.get_data_path('rates.json'),
+                           keep_days=settings.get('history_archive_keep_days', 1))
+    start = time.perf_counter()
+    added, kept = storage.archive_history(before, codec or settings.get('history_archive_codec', 'lzma') or None)
+    if not added:
+        return f"Закрытых дней для архивации нет (в журнале записей: {kept})."
+    records = sum(segment["records"] for segment in added)
+    raw = sum(segment["raw_bytes"] for segment in added)
+    packed = sum(segment["bytes"] for segment in added)
+    logger.info(f"Archived {records} history records into {len(added)} segments")
+    return (f"В архив перенесено записей: {records} за {len(added)} дн. ({added[0]['day']} — {added[-1]['day']}), "
+            f"{raw / 1024:,.0f} → {packed / 1024:,.0f} КиБ (×{raw / max(packed, 1):.1f}) "
+            f"за {time.perf_counter() - start:.2f} с; в журнале осталось записей: {kept}")
+
+def admin_stats(top: Optional[int] = None, rebuild: bool = False) -> str:
+    """
+    Сводка по платформе из data/aggregates.json: читается один небольшой файл, а не все портфели.
+    rebuild (или отсутствие сводки) пересчитывает её по всем портфелям и записывает. Только для администратора.
+    """
+    from valutatrade_hub.core.aggregates import PlatformAggregates, aggregates_path
+
+    _require_admin("admin-stats")
+    aggregates = None if rebuild else PlatformAggregates.load(aggregates_path(utils.get_data_dir()))
+    if aggregates is None:
+        start = time.perf_counter()
+        with _transaction():
+            _get_store().rebuild_aggregates()
+        aggregates = _get_store().aggregates
+        logger.info(f"Aggregates rebuilt over {aggregates.users} users in {time.perf_counter() - start:.2f}s")
+    limit = min(top or aggregates.top_k, aggregates.top_k)
+    lines = [f"Пользователей: {aggregates.users}"]
+    for code, totals in sorted(aggregates.currencies.items()):
+        lines.append(f"{code}: сумма {totals.total:,.8f}, держателей {totals.holders} (кошельков {totals.wallets})")
+        holders, exact = totals.top.top(limit)
+        if holders:
+            ranked = ", ".join(f"#{user_id} {balance:,.8f}" for user_id, balance in holders)
+            lines.append(f"  топ-{limit}: {ranked}")
+        if not exact:
+            lines.append("  (топ неполный: выполните admin-stats --rebuild)")
+    return "\n".join(lines)
+
+def replica_stats() -> Optional[dict]:
+    """Счётчики реплики (после применения новых записей журнала) или None, если процесс не реплика."""
+    replica = _get_replica()
+    if replica is None:
+        return None
+    replica.sync()
+    return replica.status()
+
+def replica_status() -> str:
+    """Состояние реплики: применённый seq, отставание и задержки применения записей журнала."""
+    from valutatrade_hub.core import replication
+
+    status = replica_stats()
+    if status is None:
+        role = replication.role() or "без репликации"
+        return f"Роль процесса: {role}. Журнал изменений: {utils.get_data_path(replication.LOG_FILENAME)}"
+    head = f" из {status['head']}" if status['head'] is not None else ""
+    return "\n".join([
+        f"Реплика ({status['source']}): применено до seq {status['applied']}{head}, "
+        f"записей {status['entries']}, снимков {status['bootstraps']}, пользователей {status['users']}",
+        f"Отставание: {status['staleness'] * 1000:.1f} мс (допустимо {status['max_lag']:.1f} с)",
+        f"Задержка применения: p50 {status['lag_p50'] * 1000:.1f} мс, p99 {status['lag_p99'] * 1000:.1f} мс, "
+        f"макс {status['lag_max'] * 1000:.1f} мс",
+    ])
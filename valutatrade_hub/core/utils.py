@@ -1,14 +1,28 @@
 import json
 import os
-from datetime import datetime
-from typing import Any
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional
 
+from valutatrade_hub.infra import durable
 
-def get_data_path(filename: str) -> str:
-    """Возвращает полный путь к файлу в папке data."""
+# Общий файл блокировки для шардов users/portfolios и журналов в data
+LOCK_FILENAME = '.data.lock'
+# Журнал изменений заявок поверх снимка orders.json
+ORDERS_LOG_FILENAME = 'orders.log'
+# Журнал сделок в JSON Lines (прежний формат — JSON-массив trades.json, переносится при первом обращении)
+TRADES_LOG_FILENAME = 'trades.log'
+
+
+def get_data_dir() -> str:
+    """Возвращает путь к папке data (создаёт её при необходимости)."""
     base = os.path.join(os.getcwd(), 'data')
     os.makedirs(base, exist_ok=True)
-    return os.path.join(base, filename)
+    return base
+
+
+def get_data_path(filename: str) -> str:
+    """Возвращает полный путь к файлу в папке data."""
+    return os.path.join(get_data_dir(), filename)
 
 
 def load_json(filename: str, default: Any) -> Any:
@@ -21,38 +35,213 @@ def load_json(filename: str, default: Any) -> Any:
         return json.load(f)
 
 
+def iter_json(filename: str) -> Iterator[Any]:
+    """Элементы JSON-массива из data/<filename> по одному, без загрузки файла в память."""
+    from valutatrade_hub.parser_service.storage import iter_json_array
+
+    path = get_data_path(filename)
+    if os.path.exists(path):
+        yield from iter_json_array(path)
+
+
 def save_json(filename: str, data: Any) -> None:
+    """Атомарно и надёжно (fsync) сохраняет файл под блокировкой каталога data."""
     path = get_data_path(filename)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    with durable.file_lock(get_data_path(LOCK_FILENAME)):
+        durable.atomic_write_json(path, data)
 
 
-def load_users() -> list:
-    return load_json('users.json', [])
+def data_lock():
+    """Эксклюзивная блокировка каталога data без групповой фиксации (реентерабельна)."""
+    return durable.file_lock(get_data_path(LOCK_FILENAME))
 
 
-def save_users(users: list) -> None:
-    save_json('users.json', users)
+@contextmanager
+def transaction() -> Iterator[None]:
+    """
+    Межпроцессная транзакция над файлами data: эксклюзивная блокировка
+    и групповая фиксация всех save_* внутри блока.
+    """
+    with durable.transaction(get_data_path(LOCK_FILENAME)):
+        yield
 
 
-def load_portfolios() -> list:
-    return load_json('portfolios.json', [])
+def _iter_sharded(kind: str) -> Iterator[dict]:
+    from valutatrade_hub.core import shards
+
+    return shards.iter_records(shards.ShardLayout.read(get_data_dir()), kind)
+
 
+def load_users() -> list:
+    """Записи пользователей всех шардов (в исходной раскладке — data/users.json)."""
+    return list(iter_users())
+
+
+def iter_users() -> Iterator[dict]:
+    return _iter_sharded('users')
 
-def save_portfolios(portfolios: list) -> None:
-    save_json('portfolios.json', portfolios)
+
+def load_portfolios() -> list:
+    return list(iter_portfolios())
+
+
+def iter_portfolios() -> Iterator[dict]:
+    return _iter_sharded('portfolios')
+
+
+def _migrate_trades() -> None:
+    """
+    Однократно переносит журнал сделок из JSON-массива trades.json в trades.log.
+    trades.log пишется атомарно до удаления trades.json: если процесс упал между ними,
+    повторный перенос только удаляет trades.json, не дублируя сделки.
+    """
+    legacy = get_data_path('trades.json')
+    if not os.path.exists(legacy):
+        return
+    with durable.file_lock(get_data_path(LOCK_FILENAME)):
+        if not os.path.exists(legacy):
+            return
+        log_path = get_data_path(TRADES_LOG_FILENAME)
+        if not os.path.exists(log_path):
+            durable.atomic_write_json_lines(log_path, iter_json('trades.json'), defer=False)
+        os.remove(legacy)
+        durable.fsync_dir(get_data_dir())
+
+
+def load_trades() -> list:
+    """Журнал сделок (buy/sell) всех пользователей в порядке исполнения."""
+    return list(iter_trades())
+
+
+def append_trades(trades: Iterable[dict]) -> None:
+    """
+    Дописывает сделки в конец журнала trades.log (O_APPEND, под блокировкой каталога data):
+    цена не зависит от длины журнала. Внутри transaction() — при фиксации.
+    """
+    _migrate_trades()
+    with durable.file_lock(get_data_path(LOCK_FILENAME)):
+        durable.append_json_lines(get_data_path(TRADES_LOG_FILENAME), trades)
+
+
+def iter_trades() -> Iterator[dict]:
+    """Журнал сделок потоково, в порядке исполнения."""
+    _migrate_trades()
+    return durable.iter_json_lines(get_data_path(TRADES_LOG_FILENAME))
+
+
+def load_orders() -> dict:
+    """
+    Стоящие заявки внутренней биржи: {'next_id': N, 'orders': [...], 'journal': K} в порядке поступления.
+    Снимок orders.json дополняется журналом orders.log — по строке на изменение заявки
+    (её состояние целиком или {'order_id', 'removed': true}); K — число строк журнала.
+    """
+    snapshot = load_json('orders.json', {"next_id": 1, "orders": []})
+    orders = {record["order_id"]: record for record in snapshot.get("orders", [])}
+    next_id = snapshot.get("next_id", 1)
+    journal = durable.read_json_lines(get_data_path(ORDERS_LOG_FILENAME))
+    for record in journal:
+        order_id = record["order_id"]
+        next_id = max(next_id, order_id + 1)
+        if record.get("removed"):
+            orders.pop(order_id, None)
+        else:
+            orders[order_id] = record
+    return {"next_id": next_id, "orders": sorted(orders.values(), key=lambda r: r["order_id"]),
+            "journal": len(journal)}
+
+
+def save_order_changes(records: list) -> None:
+    """Дописывает изменения заявок в журнал orders.log (внутри transaction — при фиксации)."""
+    durable.append_json_lines(get_data_path(ORDERS_LOG_FILENAME), records)
+
+
+def save_orders(orders: dict) -> None:
+    """
+    Полный снимок заявок: заменяет orders.json и очищает журнал. Снимок фиксируется раньше журнала:
+    после сбоя между ними старый журнал лишь повторно применится к снимку, который уже его содержит.
+    """
+    save_json('orders.json', orders)
+    durable.atomic_write_json_lines(get_data_path(ORDERS_LOG_FILENAME), [])
+
+
+def orders_signature() -> tuple:
+    """Отпечаток файлов заявок (inode, mtime, размер): меняется при каждой записи снимка или журнала."""
+    signature = []
+    for name in ('orders.json', ORDERS_LOG_FILENAME):
+        try:
+            st = os.stat(get_data_path(name))
+        except FileNotFoundError:
+            signature.append(None)
+            continue
+        signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _normalize_rates(data: Any) -> Optional[dict]:
+    """
+    Приводит кэш курсов к форме {'pairs': {...}, 'last_refresh': ..., 'version': ...}.
+    Старый плоский формат (пары на верхнем уровне) переносится в 'pairs'; None — данные непригодны.
+    version — счётчик записей кэша; у кэша, записанного до его появления, он 0
+    (первая запись update_cache даст 1), так что и по такому кэшу работает мемоизация.
+    """
+    if not isinstance(data, dict):
+        return None
+    if isinstance(data.get("pairs"), dict):
+        data.setdefault("last_refresh", None)
+        if data.get("version") is None:
+            data["version"] = 0
+        return data
+    pairs = {k: v for k, v in data.items() if isinstance(v, dict) and "rate" in v}
+    if not pairs:
+        return None
+    return {"pairs": pairs, "last_refresh": data.get("last_refresh"), "version": 0}
+
+
+def _rates_from_history() -> dict:
+    """
+    Последний известный курс каждой пары по истории курсов (архив и журнал exchange_rates.json).
+    version None: у восстановленного снимка нет места в последовательности версий кэша.
+    """
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    pairs = {}
+    last_refresh = None
+    storage = RatesStorage(get_data_path('exchange_rates.json'), get_data_path('rates.json'))
+    for record in storage.iter_history():
+        pairs[f"{record['from_currency']}_{record['to_currency']}"] = {
+            "rate": record["rate"],
+            "updated_at": record["timestamp"],
+            "source": record.get("source", "unknown"),
+        }
+        last_refresh = record["timestamp"]
+    return {"pairs": pairs, "last_refresh": last_refresh, "version": None}
 
 
 def load_rates() -> dict:
-    default = {
-        "EUR_USD": {"rate": 1.08, "updated_at": datetime.now().isoformat()},
-        "BTC_USD": {"rate": 50000.0, "updated_at": datetime.now().isoformat()},
-        "RUB_USD": {"rate": 0.012, "updated_at": datetime.now().isoformat()},
-        "ETH_USD": {"rate": 3000.0, "updated_at": datetime.now().isoformat()},
-        "source": "Local fallback",
-        "last_refresh": datetime.now().isoformat()
-    }
-    return load_json('rates.json', default)
+    """
+    Последний удачный снимок курсов, всегда в форме {'pairs': {...}, 'last_refresh': ..., 'version': ...}.
+    Если rates.json нет или он повреждён, снимок восстанавливается из журнала истории
+    (в худшем случае — пустой кэш); выдуманные курсы не подставляются.
+    """
+    try:
+        rates = _normalize_rates(load_json('rates.json', None))
+    except (OSError, ValueError):
+        rates = None
+    if rates is None:
+        try:
+            rates = _rates_from_history()
+        except (OSError, ValueError, KeyError):
+            rates = {"pairs": {}, "last_refresh": None, "version": None}
+    return rates
+
+
+def load_rate_checks() -> dict:
+    """Когда источник последний раз подтвердил неизменившийся курс: {пара: checked_at} (см. RatesStorage.confirm)."""
+    try:
+        checks = load_json('rates_checked.json', {})
+    except (OSError, ValueError):
+        return {}
+    return checks if isinstance(checks, dict) else {}
 
 
 def save_rates(rates: dict) -> None:
@@ -0,0 +1,301 @@
+import json
+import os
+import socket
+import time
+from typing import Iterator, List, Optional
+
+from valutatrade_hub.infra import durable
+
+# Окно, которым журнал читается с конца (записи журнала обычно много меньше)
+_TAIL_BYTES = 64 * 1024
+
+
+class ChangeLogGap(Exception):
+    """Нужные записи журнала уже ротированы: читателю нужен свежий снимок."""
+
+
+def _encode(entry: dict) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+
+
+def _first_seq(path: str) -> Optional[int]:
+    try:
+        with open(path, 'rb') as f:
+            line = f.readline()
+    except FileNotFoundError:
+        return None
+    return json.loads(line)["seq"] if line.endswith(b"\n") else None
+
+
+def _tail_entries(path: str) -> Iterator[dict]:
+    """
+    Записи сегмента с конца. Хвост читается окнами по _TAIL_BYTES; окно удваивается,
+    пока в нём нет целой строки. Недописанная последняя строка пропускается.
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        window = _TAIL_BYTES
+        while end > 0:
+            start = max(0, end - window)
+            f.seek(start)
+            lines = f.read(end - start).split(b"\n")
+            lines.pop()  # пустой остаток после последнего перевода строки или недописанная запись
+            # Первая строка окна может начинаться раньше него: она дочитывается следующим окном
+            first = lines.pop(0) if start > 0 else None
+            if not lines and first is not None:
+                window *= 2
+                continue
+            for line in reversed(lines):
+                if line.strip():
+                    yield json.loads(line)
+            if first is None:
+                return
+            end, window = start + len(first) + 1, _TAIL_BYTES
+
+
+def _last_seq(path: str) -> Optional[int]:
+    return next((entry["seq"] for entry in _tail_entries(path)), None)
+
+
+class ChangeLog:
+    """
+    Журнал изменений primary: JSON Lines {'seq', 'ts', 'kind', ...} с seq без пропусков.
+    Запись дописывается в режиме O_APPEND с fsync (durable.append_bytes). Записи accounts пишутся
+    под блокировкой данных до фиксации шардов (см. usecases._transaction), записи rates —
+    после записи кэша курсов. Файл длиннее max_bytes ротируется в <path>.1
+    (хранится один прошлый сегмент).
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    @property
+    def rotated_path(self) -> str:
+        return self.path + ".1"
+
+    def lock(self):
+        """Блокировка журнала: под ней head() неизменен (её берёт append)."""
+        return durable.file_lock(self.path + ".lock")
+
+    def head(self) -> int:
+        """seq последней записи (0 — журнал пуст)."""
+        for path in (self.path, self.rotated_path):
+            seq = _last_seq(path)
+            if seq is not None:
+                return seq
+        return 0
+
+    def last(self, kind: str) -> Optional[dict]:
+        """Последняя запись вида kind (None — в журнале её нет)."""
+        for path in (self.path, self.rotated_path):
+            for entry in _tail_entries(path):
+                if entry["kind"] == kind:
+                    return entry
+        return None
+
+    def append(self, kind: str, payload: dict) -> int:
+        """Дописывает запись под блокировкой журнала. Возвращает её seq."""
+        with self.lock():
+            seq = self.head() + 1
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.rotated_path)
+            # Недописанную при сбое запись отрезает append_bytes: иначе новая слилась бы с ней в одну строку
+            durable.append_bytes(self.path, _encode({"seq": seq, "ts": time.time(), "kind": kind, **payload}))
+        return seq
+
+
+class LogTailer:
+    """
+    Читатель журнала из файла: записи с seq > after по мере появления, переживает ротацию
+    (дочитывает открытый старый сегмент и переходит на новый, как tail -F).
+    synced_at — момент, до которого все зафиксированные записи уже прочитаны.
+    """
+
+    def __init__(self, path: str, after: int = 0):
+        self.path = path
+        self.after = after
+        self.synced_at = 0.0
+        self._file = None
+        self._inode: Optional[int] = None
+        self._partial = b""
+        self._open_segment()
+
+    def _open_segment(self) -> bool:
+        """Открывает сегмент, с которого продолжается чтение: прошлый, если в текущем нужной записи уже нет."""
+        first = _first_seq(self.path)
+        rotated = self.path + ".1"
+        if (first is None or first > self.after + 1) and os.path.exists(rotated):
+            return self._open(rotated)
+        return self._open(self.path)
+
+    def _open(self, path: str) -> bool:
+        try:
+            self._file = open(path, 'rb')
+        except FileNotFoundError:
+            return False
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = b""
+        return True
+
+    def _rotated(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return False
+
+    def _torn(self) -> bool:
+        """
+        Писатель упал посреди записи, а следующий append отрезал её и дописал на её место новую:
+        чтение продолжается с начала строки. True, если так и случилось.
+        """
+        start = self._file.tell() - len(self._partial)
+        if os.pread(self._file.fileno(), len(self._partial), start) == self._partial:
+            return False
+        self._file.seek(start)
+        self._partial = b""
+        return True
+
+    def poll(self) -> List[dict]:
+        """Новые записи по порядку; ChangeLogGap, если следующая по seq уже недоступна."""
+        started = time.time()
+        result: List[dict] = []
+        while True:
+            if self._file is None and not self._open_segment():
+                break
+            if self._partial and self._torn():
+                continue
+            chunk = self._file.read()
+            if chunk:
+                lines = (self._partial + chunk).split(b"\n")
+                self._partial = lines.pop()  # неполная строка дочитается при следующем опросе
+                for line in lines:
+                    if line.strip():
+                        self._accept(json.loads(line), result)
+                continue
+            if not self._rotated():
+                break
+            finished = self._inode
+            self._file.close()
+            self._file = None
+            if self._open_segment() and self._inode == finished:
+                raise ChangeLogGap(f"seq {self.after + 1} is no longer in the log")
+        if not self._partial:
+            self.synced_at = started
+        return result
+
+    def _accept(self, entry: dict, result: List[dict]) -> None:
+        if entry["seq"] <= self.after:
+            return
+        if entry["seq"] != self.after + 1:
+            raise ChangeLogGap(f"expected seq {self.after + 1}, got {entry['seq']}")
+        self.after = entry["seq"]
+        result.append(entry)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SocketTailer:
+    """
+    Те же записи из сокета раздатчика (serve). Раздатчик после каждой пачки и в простое
+    шлёт heartbeat {'seq', 'ts'}: получив его, читатель знает, что на момент ts всё до seq у него.
+    """
+
+    def __init__(self, socket_path: str, after: int = 0):
+        self.after = after
+        self.synced_at = 0.0
+        self._partial = b""
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._sock.sendall(_encode({"after": after}))
+        self._sock.setblocking(False)
+
+    def poll(self) -> List[dict]:
+        data = b""
+        while True:
+            try:
+                chunk = self._sock.recv(1024 * 1024)
+            except BlockingIOError:
+                break
+            if not chunk:
+                raise ConnectionError("replication socket closed by the primary")
+            data += chunk
+        if not data:
+            return []
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        result = []
+        for line in lines:
+            message = json.loads(line)
+            kind = message.get("kind")
+            if kind == "gap":
+                raise ChangeLogGap(message.get("reason", ""))
+            if kind == "heartbeat":
+                if message["seq"] <= self.after:
+                    self.synced_at = max(self.synced_at, message["ts"])
+                continue
+            if message["seq"] > self.after:
+                self.after = message["seq"]
+                result.append(message)
+        return result
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+def open_tailer(source: str, log_path: str, after: int):
+    """Читатель по строке источника: 'unix:<путь к сокету>' или 'file' (журнал log_path)."""
+    if source.startswith("unix:"):
+        return SocketTailer(source[len("unix:"):], after)
+    return LogTailer(log_path, after)
+
+
+def serve(log_path: str, socket_path: str, interval: float = 0.01, heartbeat: float = 0.5) -> None:
+    """
+    Раздатчик журнала по Unix-сокету: каждый клиент присылает {'after': seq}
+    и получает записи после seq, затем новые по мере появления (опрос файла раз в interval).
+    Работает до прерывания процесса.
+    """
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            after = json.loads(self.rfile.readline())["after"]
+            tailer = LogTailer(log_path, after)
+            last_beat = 0.0
+            try:
+                while True:
+                    try:
+                        entries = tailer.poll()
+                    except ChangeLogGap as e:
+                        self.wfile.write(_encode({"kind": "gap", "reason": str(e)}))
+                        return
+                    if entries:
+                        self.wfile.write(b"".join(_encode(entry) for entry in entries))
+                    if entries or time.time() - last_beat >= heartbeat:
+                        self.wfile.write(_encode({"kind": "heartbeat", "seq": tailer.after, "ts": tailer.synced_at}))
+                        self.wfile.flush()
+                        last_beat = time.time()
+                    time.sleep(interval)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            finally:
+                tailer.close()
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with Server(socket_path, Handler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
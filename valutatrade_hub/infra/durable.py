@@ -0,0 +1,339 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: advisory-блокировки недоступны, остаётся только атомарная запись
+    fcntl = None
+
+
+_local = threading.local()
+
+# Списки длиннее этого пишутся компактно: с indent json использует медленный кодировщик на Python,
+# а без него — C-реализацию (на больших портфелях и журнале сделок разница в разы)
+PRETTY_MAX_ITEMS = 1000
+# Блок потокового копирования при дозаписи в конец JSON-массива
+COPY_CHUNK = 1024 * 1024
+
+# Блокировки, удерживаемые процессом: путь -> [счётчик входов, fd, RLock].
+# flock привязан к открытому файлу, поэтому повторный захват тем же процессом
+# через новый дескриптор привёл бы к взаимоблокировке — считаем входы сами.
+_held_locks: Dict[str, list] = {}
+_held_guard = threading.Lock()
+
+
+def fsync_dir(path: str) -> None:
+    """Сбрасывает на диск метаданные каталога (нужно, чтобы переименование пережило сбой)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Lines(list):
+    """Отложенные элементы JSON Lines: replace=False — дописать в конец файла, True — заменить ими файл."""
+
+    def __init__(self, replace: bool):
+        super().__init__()
+        self.replace = replace
+
+
+class _ArrayAppend(list):
+    """Отложенные элементы для конца JSON-массива: при фиксации файл не разбирается (см. atomic_append_json_array)."""
+
+
+def _encode_lines(items: Iterable[Any]) -> str:
+    return "".join(json.dumps(item, ensure_ascii=False, separators=(',', ':')) + "\n" for item in items)
+
+
+def _write_temp(path: str, data: Any) -> str:
+    """Пишет данные во временный файл рядом с целевым и делает fsync. Возвращает путь к нему."""
+    import tempfile
+    if isinstance(data, _ArrayAppend):
+        return _append_temp(path, data, _array_end(path) if os.path.exists(path) else None)
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            if isinstance(data, _Lines):
+                f.write(_encode_lines(data))
+            elif isinstance(data, list) and len(data) > PRETTY_MAX_ITEMS:
+                f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+            else:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path
+
+
+def atomic_write_json(path: str, data: Any) -> None:
+    """
+    Атомарно заменяет файл: запись во временный файл, fsync, rename, fsync каталога.
+    После сбоя на диске остаётся либо старая, либо новая версия целиком.
+    Внутри transaction() запись откладывается до фиксации.
+    """
+    pending = getattr(_local, "pending", None)
+    if pending is not None:
+        pending[os.path.abspath(path)] = data
+        return
+    temp_path = _write_temp(path, data)
+    os.replace(temp_path, path)
+    fsync_dir(os.path.dirname(path))
+
+
+def _cut_torn_tail(fd: int) -> None:
+    """Отрезает недописанную при сбое последнюю строку: дозапись после неё испортила бы и новую."""
+    size = os.fstat(fd).st_size
+    if not size or os.pread(fd, 1, size - 1) == b"\n":
+        return
+    end = size
+    while end > 0:
+        start = max(0, end - COPY_CHUNK)
+        newline = os.pread(fd, end - start, start).rfind(b"\n")
+        if newline >= 0:
+            os.ftruncate(fd, start + newline + 1)
+            return
+        end = start
+    os.ftruncate(fd, 0)
+
+
+def append_bytes(path: str, data: bytes) -> None:
+    """
+    Сразу, минуя transaction(), дописывает готовые строки (data заканчивается переводом строки)
+    в конец файла: O_APPEND, запись до конца при частичных write, fsync.
+    Недописанная при сбое последняя строка сначала отрезается.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    created = not os.path.exists(path)
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        _cut_torn_tail(fd)
+        data = memoryview(data)
+        while data:
+            data = data[os.write(fd, data):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    if created:
+        fsync_dir(directory)
+
+
+def append_json_lines(path: str, items: Iterable[Any]) -> None:
+    """
+    Дописывает элементы в конец файла JSON Lines (O_APPEND, fsync): цена не зависит от размера файла.
+    Недописанную при сбое последнюю строку отрезает следующая дозапись, а read_json_lines пропускает.
+    Внутри transaction() дозапись выполняется при фиксации, после замены остальных файлов.
+    """
+    pending = getattr(_local, "pending", None)
+    if pending is not None:
+        key = os.path.abspath(path)
+        lines = pending.get(key)
+        if lines is None:
+            lines = pending[key] = _Lines(replace=False)
+        lines.extend(items)
+        return
+    append_bytes(path, _encode_lines(items).encode('utf-8'))
+
+
+def atomic_write_json_lines(path: str, items: Iterable[Any], defer: bool = True) -> None:
+    """
+    Атомарно заменяет файл JSON Lines, как atomic_write_json; внутри transaction() — при фиксации.
+    defer=False — заменить сразу и внутри transaction() (для перестроек, не зависящих от исхода транзакции).
+    """
+    lines = _Lines(replace=True)
+    lines.extend(items)
+    pending = getattr(_local, "pending", None)
+    if pending is not None and defer:
+        pending[os.path.abspath(path)] = lines
+        return
+    temp_path = _write_temp(path, lines)
+    os.replace(temp_path, path)
+    fsync_dir(os.path.dirname(path))
+
+
+def read_json_lines(path: str) -> list:
+    """Элементы файла JSON Lines (пустой список, если файла нет); недописанная последняя строка пропускается."""
+    return list(iter_json_lines(path))
+
+
+def iter_json_lines(path: str) -> Iterator[Any]:
+    """Элементы файла JSON Lines по одному, без загрузки файла в память; как read_json_lines."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                return  # недописанная при сбое запись
+            if line.strip():
+                yield json.loads(line)
+
+
+def _array_end(path: str) -> Optional[Tuple[int, bool]]:
+    """
+    Где дописывать элементы JSON-массива: (смещение сразу после последнего элемента или '[',
+    массив пуст). Читается только хвост файла. None — файл пуст.
+    """
+    size = os.path.getsize(path)
+    window = 4096
+    with open(path, 'rb') as f:
+        while True:
+            start = max(0, size - window)
+            f.seek(start)
+            stripped = f.read(size - start).rstrip(b" \t\r\n")
+            before = stripped[:-1].rstrip(b" \t\r\n")
+            if before or start == 0:
+                break
+            window *= 2
+    if not stripped:
+        return None
+    if not stripped.endswith(b"]") or not before:
+        raise ValueError(f"{path}: файл не является JSON-массивом")
+    return start + len(before), before.endswith(b"[")
+
+
+def _append_temp(path: str, items: list, end: Optional[Tuple[int, bool]]) -> str:
+    """
+    Временный файл с массивом path, дополненным items: содержимое до закрывающей скобки
+    копируется потоково, за ним — новые элементы (по одному на строку), затем fsync.
+    end — результат _array_end(path); None — файла нет или он пуст.
+    """
+    if end is None:
+        return _write_temp(path, list(items))
+    offset, empty = end
+    import tempfile
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with open(path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            remaining = offset
+            while remaining:
+                block = src.read(min(COPY_CHUNK, remaining))
+                if not block:
+                    raise ValueError(f"{path}: файл изменился во время дозаписи")
+                dst.write(block)
+                remaining -= len(block)
+            body = ",\n".join(json.dumps(item, ensure_ascii=False) for item in items)
+            dst.write(("\n" if empty else ",\n").encode('utf-8') + body.encode('utf-8') + b"\n]")
+            dst.flush()
+            os.fsync(dst.fileno())
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path
+
+
+def atomic_append_json_array(path: str, items: Iterable[Any]) -> None:
+    """
+    Дописывает элементы в конец JSON-массива, не разбирая файл: содержимое до закрывающей скобки
+    потоково копируется во временный файл, за ним — новые элементы; затем fsync, rename, fsync каталога.
+    Память не зависит от размера файла. Внутри transaction() дозапись копится и выполняется
+    так же при фиксации вместе с остальными файлами.
+    """
+    items = list(items)
+    pending = getattr(_local, "pending", None)
+    if pending is not None:
+        key = os.path.abspath(path)
+        current = pending.get(key)
+        if isinstance(current, _ArrayAppend):
+            current.extend(items)
+        elif current is not None:
+            pending[key] = current + items  # файл уже целиком заменяется в этой транзакции
+        else:
+            pending[key] = _ArrayAppend(items)
+        return
+    end = _array_end(path) if os.path.exists(path) else None
+    if end is not None and not items:
+        return
+    temp_path = _append_temp(path, items, end)
+    os.replace(temp_path, path)
+    fsync_dir(os.path.dirname(path))
+
+
+@contextmanager
+def file_lock(lock_path: str) -> Iterator[None]:
+    """
+    Эксклюзивная advisory-блокировка (fcntl.flock) на файле lock_path.
+    Реентерабельна в пределах процесса и сериализует потоки.
+    """
+    key = os.path.abspath(lock_path)
+    with _held_guard:
+        entry = _held_locks.get(key)
+        if entry is None:
+            entry = _held_locks[key] = [0, None, threading.RLock()]
+    rlock = entry[2]
+    rlock.acquire()
+    try:
+        if entry[0] == 0 and fcntl is not None:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+            fd = os.open(key, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                # Блокировка не взята (прерывание, EINTR, ENOLCK): дескриптор больше никому не нужен
+                os.close(fd)
+                raise
+            entry[1] = fd
+        entry[0] += 1
+        try:
+            yield
+        finally:
+            entry[0] -= 1
+            if entry[0] == 0 and entry[1] is not None:
+                fcntl.flock(entry[1], fcntl.LOCK_UN)
+                os.close(entry[1])
+                entry[1] = None
+    finally:
+        rlock.release()
+
+
+@contextmanager
+def transaction(lock_path: str) -> Iterator[None]:
+    """
+    Групповая фиксация: все atomic_write_json внутри блока копятся в памяти
+    и записываются одним пакетом под блокировкой — сначала все временные файлы с fsync,
+    затем переименования, дозаписи append_json_lines и по одному fsync на каталог.
+    При исключении отложенные записи отбрасываются. Вложенные транзакции сливаются с внешней.
+    """
+    with file_lock(lock_path):
+        if getattr(_local, "pending", None) is not None:
+            yield
+            return
+        _local.pending = {}
+        try:
+            yield
+            pending = _local.pending
+        finally:
+            _local.pending = None
+        _commit(pending)
+
+
+def _commit(pending: Dict[str, Any]) -> None:
+    appends = {path: data for path, data in pending.items() if isinstance(data, _Lines) and not data.replace}
+    temp_paths = {}
+    try:
+        for path, data in pending.items():
+            if path not in appends:
+                temp_paths[path] = _write_temp(path, data)
+    except BaseException:
+        for temp_path in temp_paths.values():
+            os.unlink(temp_path)
+        raise
+    for path, temp_path in temp_paths.items():
+        os.replace(temp_path, path)
+    for path, lines in appends.items():
+        append_bytes(path, _encode_lines(lines).encode('utf-8'))
+    for directory in {os.path.dirname(path) for path in temp_paths}:
+        fsync_dir(directory)
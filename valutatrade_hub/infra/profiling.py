@@ -0,0 +1,223 @@
+import functools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Переменная окружения для включения при запуске: cprofile (или 1) / sample
+ENV_VAR = "VALUTATRADE_PROFILE"
+MODES = ("cprofile", "sample")
+
+
+class _LabelStats:
+    """Накопленная статистика одной точки (команды, run_update, запроса к провайдеру)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.profile = None  # cProfile.Profile, накапливающий все вызовы
+        self.stacks: Counter = Counter()  # свёрнутые стеки сэмплера
+
+
+class ProfileSession:
+    """
+    Сеанс профилирования: статистика агрегируется по меткам ('command:buy', 'run_update',
+    'fetch:CoinGecko'). В режиме cprofile у каждой метки свой cProfile.Profile,
+    в режиме sample фоновый поток раз в interval снимает стеки потоков, выполняющих метку.
+    Вложенные метки (запрос к провайдеру внутри update-rates) учитываются по времени,
+    а их функции попадают в профиль внешней метки.
+    """
+
+    def __init__(self, mode: str, output_dir: str, interval: float):
+        self.mode = mode
+        self.output_dir = output_dir
+        self.interval = interval
+        self.stats: Dict[str, _LabelStats] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # cProfile одновременно может быть активен только один — остальные метки меряют только время
+        self._cprofile_lock = threading.Lock()
+        self._active: Dict[int, str] = {}
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        if mode == "sample":
+            self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+            self._sampler.start()
+
+    def _label_stats(self, label: str) -> _LabelStats:
+        with self._lock:
+            return self.stats.setdefault(label, _LabelStats())
+
+    @contextmanager
+    def measure(self, label: str) -> Iterator[None]:
+        stats = self._label_stats(label)
+        outer = getattr(self._local, "label", None) is None
+        profile = None
+        if outer:
+            self._local.label = label
+            if self.mode == "cprofile" and self._cprofile_lock.acquire(blocking=False):
+                import cProfile
+                profile = stats.profile = stats.profile or cProfile.Profile()
+                profile.enable()
+            elif self.mode == "sample":
+                self._active[threading.get_ident()] = label
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if outer:
+                if profile is not None:
+                    profile.disable()
+                    self._cprofile_lock.release()
+                self._active.pop(threading.get_ident(), None)
+                self._local.label = None
+            with self._lock:
+                stats.calls += 1
+                stats.total += elapsed
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, label in list(self._active.items()):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(label)
+                self.stats[label].stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def dump(self) -> List[str]:
+        """Пишет <метка>.pstats (cprofile) или <метка>.collapsed (sample, для flamegraph.pl). Возвращает пути."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = []
+        for label, stats in self.stats.items():
+            base = os.path.join(self.output_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", label))
+            if stats.profile is not None:
+                stats.profile.dump_stats(base + ".pstats")
+                paths.append(base + ".pstats")
+            if stats.stacks:
+                with open(base + ".collapsed", 'w', encoding='utf-8') as f:
+                    for stack, count in stats.stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+                paths.append(base + ".collapsed")
+        return paths
+
+    def summary(self) -> str:
+        lines = [f"{'Метка':<32}{'Вызовов':>9}{'Всего, мс':>12}{'Среднее, мс':>14}"]
+        for label, stats in sorted(self.stats.items(), key=lambda item: item[1].total, reverse=True):
+            average = stats.total / stats.calls if stats.calls else 0.0
+            lines.append(f"{label:<32}{stats.calls:>9}{stats.total * 1000:>12.2f}{average * 1000:>14.3f}")
+        return "\n".join(lines)
+
+
+_session: Optional[ProfileSession] = None
+# Подменённые атрибуты: (владелец, имя, исходное значение) — восстанавливаются при выключении
+_patched: List[Tuple[object, str, object]] = []
+
+
+def _patch(owner: object, attr: str, label: Callable[..., Optional[str]]) -> None:
+    original = getattr(owner, attr)
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        name = label(*args, **kwargs)
+        session = _session
+        if name is None or session is None:
+            return original(*args, **kwargs)
+        with session.measure(name):
+            return original(*args, **kwargs)
+
+    setattr(owner, attr, wrapper)
+    _patched.append((owner, attr, original))
+
+
+def _client_classes(cls: type) -> Iterator[type]:
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _client_classes(subclass)
+
+
+def _command_label(line: str, *args, **kwargs) -> Optional[str]:
+    command = (line.split(maxsplit=1) or ["?"])[0]
+    # Сама команда profile не профилируется: она включает и выключает сеанс
+    return None if command == "profile" else "command:" + command
+
+
+def _install_hooks() -> None:
+    """
+    Оборачивает точки измерения: разбор и выполнение команды CLI, RatesUpdater.run_update
+    и запросы каждого клиента API. Хуки ставятся только на время профилирования,
+    поэтому выключенное профилирование ничего не стоит.
+    """
+    from valutatrade_hub.cli import interface
+    from valutatrade_hub.parser_service.api_clients import BaseApiClient
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    _patch(interface, "execute", _command_label)
+    _patch(RatesUpdater, "run_update", lambda *a, **kw: "run_update")
+    for cls in _client_classes(BaseApiClient):
+        for method in ("fetch_rates", "fetch_pair"):
+            if method in cls.__dict__:
+                _patch(cls, method, lambda client, *a, **kw: f"fetch:{client.source}")
+
+
+def is_enabled() -> bool:
+    return _session is not None
+
+
+def enable(mode: str = "cprofile", output_dir: Optional[str] = None, interval_ms: Optional[float] = None) -> str:
+    """Включает профилирование. Повторное включение не сбрасывает накопленное."""
+    global _session
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим профилирования '{mode}'. Доступны: {', '.join(MODES)}")
+    if _session is not None:
+        return _session.output_dir
+    from valutatrade_hub.infra.settings import SettingsLoader
+
+    settings = SettingsLoader()
+    output_dir = output_dir or settings.get('profile_dir', 'logs/profiles')
+    interval = (interval_ms or settings.get('profile_interval_ms', 5)) / 1000
+    _session = ProfileSession(mode, output_dir, interval)
+    _install_hooks()
+    return output_dir
+
+
+def disable() -> Tuple[str, List[str]]:
+    """Выключает профилирование, снимает хуки и пишет файлы. Возвращает (сводка, пути файлов)."""
+    global _session
+    if _session is None:
+        return "", []
+    while _patched:
+        owner, attr, original = _patched.pop()
+        setattr(owner, attr, original)
+    session, _session = _session, None
+    session.stop()
+    return session.summary(), session.dump()
+
+
+def enable_from_env() -> None:
+    """Включает профилирование по VALUTATRADE_PROFILE; результаты пишутся при завершении процесса."""
+    mode = os.environ.get(ENV_VAR, "").strip().lower()
+    if not mode or mode in ("0", "off"):
+        return
+    import atexit
+
+    enable("cprofile" if mode in ("1", "on") else mode)
+
+    def report() -> None:
+        summary, paths = disable()
+        print(summary + "".join(f"\n  {path}" for path in paths), file=sys.stderr)
+
+    atexit.register(report)
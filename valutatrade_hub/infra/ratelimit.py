@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from valutatrade_hub.infra import durable
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов «ведро токенов»: rate токенов в секунду, не больше capacity в запасе.
+    Потокобезопасен; acquire блокирует поток, acquire_async — только текущую задачу.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float, max_wait: Optional[float]) -> Optional[float]:
+        """
+        Списывает токены (возможно, в долг) и возвращает, сколько нужно подождать до их появления.
+        None — ожидание превысило бы max_wait, токены не списаны.
+        """
+        with self._lock:
+            return self._take(tokens, max_wait, time.monotonic())
+
+    def _take(self, tokens: float, max_wait: Optional[float], now: float) -> Optional[float]:
+        self._tokens = min(self.capacity, self._tokens + max(0.0, now - self._stamp) * self.rate)
+        self._stamp = now
+        deficit = tokens - self._tokens
+        wait = deficit / self.rate if deficit > 0 else 0.0
+        if max_wait is not None and wait > max_wait:
+            return None
+        self._tokens -= tokens
+        return wait
+
+    def acquire(self, tokens: float = 1.0, max_wait: Optional[float] = None) -> bool:
+        """Ждёт токены; False, если ждать пришлось бы дольше max_wait секунд."""
+        wait = self._reserve(tokens, max_wait)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, tokens: float = 1.0, max_wait: Optional[float] = None) -> bool:
+        wait = self._reserve(tokens, max_wait)
+        if wait is None:
+            return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Ведро токенов, общее для всех процессов: остаток и время пополнения хранятся в JSON-файле
+    {имя: {'tokens', 'stamp'}} и меняются под его блокировкой (durable.file_lock).
+    Квота провайдера соблюдается и между запусками CLI, и между несколькими обновляющими процессами.
+    Время — wall clock: monotonic у разных процессов не сравнимы.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float, path: str):
+        super().__init__(rate, capacity)
+        self.name = name
+        self.path = path
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def _reserve(self, tokens: float, max_wait: Optional[float]) -> Optional[float]:
+        with self._lock, durable.file_lock(self.path + ".lock"):
+            state = self._load_state()
+            now = time.time()
+            saved = state.get(self.name)
+            if isinstance(saved, dict):
+                self._tokens, self._stamp = float(saved["tokens"]), float(saved["stamp"])
+            else:
+                self._tokens, self._stamp = self.capacity, now
+            wait = self._take(tokens, max_wait, now)
+            if wait is not None:
+                state[self.name] = {"tokens": self._tokens, "stamp": self._stamp}
+                durable.atomic_write_json(self.path, state)
+            return wait
+
+
+_buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(name: str, limit: Tuple[float, float], state_path: Optional[str] = None) -> TokenBucket:
+    """
+    Ведро для провайдера name; limit — (токенов в секунду, ёмкость).
+    С state_path — общее для всех процессов (SharedTokenBucket), без него — только для процесса.
+    """
+    key = (name, os.path.abspath(state_path) if state_path else None)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            if state_path:
+                bucket = SharedTokenBucket(name, limit[0], limit[1], key[1])
+            else:
+                bucket = TokenBucket(*limit)
+            _buckets[key] = bucket
+        return bucket
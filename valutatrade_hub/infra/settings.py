@@ -19,9 +19,8 @@ class SettingsLoader:
     def _load_config(self) -> None:
         """Загружает конфигурацию из JSON-файла."""
         if not os.path.exists(self._config_path):
-            # Если файла нет, создаём конфигурацию по умолчанию
+            # Если файла нет, работаем с конфигурацией по умолчанию; файл создаётся только через save()
             self._config = self._default_config()
-            self._save_config()
         else:
             with open(self._config_path, 'r', encoding='utf-8') as f:
                 self._config = json.load(f)
@@ -36,15 +35,46 @@ class SettingsLoader:
         return {
             "data_path": "data/",
             "rates_ttl_seconds": 300,
+            "rates_ttl_overrides": {},
+            "rates_allow_stale": False,
+            "rates_epsilon": 0.0,
+            "rates_page_size": 50,
+            "currencies_file": "currencies.json",
             "default_base_currency": "USD",
+            "portfolio_cache_size": 1024,
+            "shard_load_workers": 0,
+            "aggregates_top_k": 10,
+            "admin_usernames": [],
+            "history_archive_codec": "lzma",
+            "history_archive_keep_days": 1,
+            "replication_role": "",
+            "replication_source": "file",
+            "replication_max_lag_seconds": 5.0,
+            "replication_follow_interval_ms": 10,
+            "replication_log_max_bytes": 67108864,
+            "rebalance_min_trade_usd": 1.0,
+            "risk_window": 30,
+            "risk_confidence": 0.95,
+            "risk_bucket_seconds": 60,
             "log_format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            "log_file": "logs/trade.log"
+            "log_file": "logs/trade.log",
+            "profile_dir": "logs/profiles",
+            "profile_interval_ms": 5,
+            "password_kdf": "scrypt",
+            "password_kdf_params": {"n": 16384, "r": 8, "p": 1},
+            "kdf_workers": 0,
+            "auth_cache_ttl_seconds": 300,
+            "auth_cache_size": 1024
         }
 
     def get(self, key: str, default: Any = None) -> Any:
         """Возвращает значение параметра конфигурации."""
         return self._config.get(key, default)
 
+    def save(self) -> None:
+        """Явно сохраняет текущую конфигурацию (например, чтобы создать config.json с умолчаниями)."""
+        self._save_config()
+
     def reload(self) -> None:
         """Перезагружает конфигурацию из файла."""
         self._load_config()
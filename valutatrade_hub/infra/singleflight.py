@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class _Call:
+    """Выполняющийся вызов: ведущий кладёт сюда результат или ошибку, остальные ждут события."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # Ожидающие asyncio-задачи: (их цикл событий, future)
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+def _resolve(future: asyncio.Future, call: _Call) -> None:
+    if future.cancelled():
+        return
+    if call.error is not None:
+        future.set_exception(call.error)
+    else:
+        future.set_result(call.result)
+
+
+class SingleFlight:
+    """
+    Схлопывание одновременных вызовов: пока по ключу выполняется вызов,
+    остальные вызывающие с тем же ключом не запускают свой, а получают его результат (или исключение).
+    Потоки (do) и asyncio-задачи (do_async) разделяют одни и те же выполняющиеся вызовы.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def _begin(self, key: Hashable) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        with self._lock:
+            del self._calls[key]
+            call.done.set()
+            waiters, call.waiters = call.waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, call)
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        call, leader = self._begin(key)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        То же для asyncio: ведущая задача выполняет блокирующую fn в пуле потоков цикла,
+        остальные ждут future, не занимая потоков.
+        """
+        loop = asyncio.get_running_loop()
+        call, leader = self._begin(key)
+        if leader:
+            try:
+                call.result = await loop.run_in_executor(None, fn)
+                return call.result
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                self._finish(key, call)
+
+        future = loop.create_future()
+        with self._lock:
+            if call.done.is_set():
+                _resolve(future, call)
+            else:
+                call.waiters.append((loop, future))
+        return await future
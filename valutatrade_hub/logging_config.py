@@ -4,10 +4,10 @@ from logging.handlers import RotatingFileHandler
 
 from valutatrade_hub.infra.settings import SettingsLoader
 
-settings = SettingsLoader()
 
 def setup_logging():
     """Настраивает корневой логгер для приложения."""
+    settings = SettingsLoader()
     log_file = settings.get('log_file', 'logs/trade.log')
     log_dir = os.path.dirname(log_file)
     if log_dir and not os.path.exists(log_dir):
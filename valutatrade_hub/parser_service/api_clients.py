@@ -1,9 +1,14 @@
+import hashlib
+import json
+import os
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import requests
 
-from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.core.exceptions import ApiRequestError, RateLimitedError
+from valutatrade_hub.infra import durable
+from valutatrade_hub.infra.ratelimit import get_bucket
 
 from .config import ParserConfig
 
@@ -11,23 +16,125 @@ from .config import ParserConfig
 class BaseApiClient(ABC):
     """Абстрактный базовый класс для клиентов API курсов валют."""
 
+    # Имя провайдера: источник в истории и кэше, ключ квоты в ParserConfig.RATE_LIMITS
+    source: str = ""
+
     def __init__(self, config: ParserConfig):
         self.config = config
+        data_dir = os.path.dirname(config.RATES_FILE_PATH)
+        # Ведро токенов общее для всех клиентов и процессов, работающих с одним каталогом данных:
+        # квоты провайдеров глобальные, а не на процесс
+        limit = config.RATE_LIMITS.get(self.source)
+        self._bucket = get_bucket(self.source, limit, os.path.join(data_dir, "rate_limits.json")) if limit else None
+        # Валидаторы условных запросов (ETag / Last-Modified) и отпечаток тела ответа по ключу запроса.
+        # Хранятся рядом с кэшем курсов, чтобы условные запросы работали и между запусками CLI
+        self.validators_path = os.path.join(data_dir, "http_validators.json")
+        self._validators: Optional[Dict[str, Dict[str, str]]] = None
+        # Валидаторы новых ответов: действуют после записи курсов из них (save_validators)
+        self._pending: Dict[str, Dict[str, str]] = {}
 
     @abstractmethod
     def fetch_rates(self) -> Dict[str, float]:
         """
         Возвращает словарь вида {'BTC_USD': 59337.21, ...}
+        Пустой словарь означает, что с прошлого запроса данные не изменились.
         В случае ошибки выбрасывает ApiRequestError.
         """
         pass
 
-    def _make_request(self, url: str, params: Dict = None) -> Dict[str, Any]:
-        """Общий метод для выполнения HTTP-запроса."""
+    @abstractmethod
+    def supports(self, code: str) -> bool:
+        """Отдаёт ли этот источник курс валюты code к базовой валюте."""
+        pass
+
+    @abstractmethod
+    def pairs(self) -> List[str]:
+        """Пары, которые возвращает fetch_rates (их подтверждает и ответ «не изменилось»)."""
+        pass
+
+    def fetch_pair(self, code: str) -> Dict[str, float]:
+        """
+        Точечный запрос курса одной валюты: {'BTC_USD': 59337.21}.
+        По умолчанию — полный fetch_rates с отбором нужной пары; клиенты переопределяют,
+        если API умеет отдавать одну пару дешевле.
+        """
+        pair = f"{code}_{self.config.BASE_CURRENCY}"
+        return {k: v for k, v in self.fetch_rates().items() if k == pair}
+
+    def _load_validators(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self.validators_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return saved if isinstance(saved, dict) else {}
+
+    def _known(self) -> Dict[str, Dict[str, str]]:
+        if self._validators is None:
+            self._validators = self._load_validators()
+        return self._validators
+
+    def save_validators(self) -> None:
+        """
+        Сохраняет валидаторы полученных ответов. Вызывается после того, как курсы из них записаны:
+        иначе после сбоя следующий запуск счёл бы непринятые данные неизменившимися.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self._known().update(pending)
+        with durable.file_lock(self.validators_path + ".lock"):
+            saved = self._load_validators()
+            saved.update(pending)
+            durable.atomic_write_json(self.validators_path, saved)
+
+    def discard_validators(self) -> None:
+        """Забывает валидаторы ответов, данные которых не приняты (ошибка в ответе или при его разборе)."""
+        self._pending = {}
+
+    @staticmethod
+    def _request_key(url: str, params: Optional[Dict]) -> str:
+        """Ключ запроса в http_validators.json — отпечаток, а не сам URL: в URL бывает ключ API."""
+        if params:
+            url += "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _make_request(self, url: str, params: Dict = None) -> Optional[Dict[str, Any]]:
+        """
+        Общий метод для выполнения HTTP-запроса.
+        Использует If-None-Match / If-Modified-Since, если сервер ранее вернул ETag / Last-Modified.
+        Возвращает None, если данные не изменились (304 или то же тело ответа).
+        """
+        # Не превышаем квоту провайдера: ждём токен не дольше таймаута запроса
+        if self._bucket is not None and not self._bucket.acquire(max_wait=self.config.REQUEST_TIMEOUT):
+            raise RateLimitedError(f"Исчерпана квота запросов к {self.source}. Попробуйте позже.")
+
+        key = self._request_key(url, params)
+        headers = {}
+        known = self._known().get(key, {})
+        if "etag" in known:
+            headers["If-None-Match"] = known["etag"]
+        if "last_modified" in known:
+            headers["If-Modified-Since"] = known["last_modified"]
         try:
-            response = requests.get(url, params=params, timeout=self.config.REQUEST_TIMEOUT)
+            response = requests.get(url, params=params, headers=headers, timeout=self.config.REQUEST_TIMEOUT)
+            if response.status_code == 304:
+                return None
             response.raise_for_status()
-            return response.json()
+
+            # Сервер может не поддерживать условные запросы — сравниваем и отпечаток тела
+            validators = {"digest": hashlib.sha1(response.content).hexdigest()}
+            if response.headers.get("ETag"):
+                validators["etag"] = response.headers["ETag"]
+            if response.headers.get("Last-Modified"):
+                validators["last_modified"] = response.headers["Last-Modified"]
+            if known.get("digest") == validators["digest"]:
+                if validators != known:
+                    self._pending[key] = validators
+                return None
+            data = response.json()
+            self._pending[key] = validators
+            return data
         except requests.exceptions.Timeout:
             raise ApiRequestError(f"Timeout при запросе к {url}")
         except requests.exceptions.ConnectionError:
@@ -62,11 +169,23 @@ class BaseApiClient(ABC):
 class CoinGeckoClient(BaseApiClient):
     """Клиент для получения криптовалютных курсов."""
 
+    source = "CoinGecko"
+
+    def supports(self, code: str) -> bool:
+        return code in self.config.CRYPTO_ID_MAP
+
+    def pairs(self) -> List[str]:
+        return [f"{code}_{self.config.BASE_CURRENCY}" for code in self.config.CRYPTO_CURRENCIES if self.supports(code)]
+
     def fetch_rates(self) -> Dict[str, float]:
+        return self._fetch_codes(self.config.CRYPTO_CURRENCIES)
+
+    def fetch_pair(self, code: str) -> Dict[str, float]:
+        return self._fetch_codes((code,))
+
+    def _fetch_codes(self, codes) -> Dict[str, float]:
         # Формируем список ID для запроса
-        crypto_ids = [self.config.CRYPTO_ID_MAP[code]
-                      for code in self.config.CRYPTO_CURRENCIES
-                      if code in self.config.CRYPTO_ID_MAP]
+        crypto_ids = [self.config.CRYPTO_ID_MAP[code] for code in codes if code in self.config.CRYPTO_ID_MAP]
         if not crypto_ids:
             return {}
 
@@ -76,10 +195,13 @@ class CoinGeckoClient(BaseApiClient):
         }
 
         data = self._make_request(self.config.COINGECKO_URL, params)
+        if data is None:
+            return {}
 
         # Преобразуем ответ в стандартный формат
         result = {}
-        for code, coin_id in self.config.CRYPTO_ID_MAP.items():
+        for code in codes:
+            coin_id = self.config.CRYPTO_ID_MAP.get(code)
             if coin_id in data and self.config.BASE_CURRENCY.lower() in data[coin_id]:
                 rate = data[coin_id][self.config.BASE_CURRENCY.lower()]
                 pair = f"{code}_{self.config.BASE_CURRENCY}"
@@ -90,10 +212,21 @@ class CoinGeckoClient(BaseApiClient):
 class ExchangeRateApiClient(BaseApiClient):
     """Клиент для получения фиатных курсов."""
 
-    def fetch_rates(self) -> Dict[str, float]:
+    source = "ExchangeRate-API"
+
+    def supports(self, code: str) -> bool:
+        return code in self.config.FIAT_CURRENCIES
+
+    def pairs(self) -> List[str]:
+        return [f"{code}_{self.config.BASE_CURRENCY}" for code in self.config.FIAT_CURRENCIES]
+
+    def _check_key(self) -> None:
         if not self.config.EXCHANGERATE_API_KEY:
             raise ApiRequestError("API ключ для ExchangeRate-API не задан")
 
+    def fetch_rates(self) -> Dict[str, float]:
+        self._check_key()
+
         # Формируем URL: https://v6.exchangerate-api.com/v6/KEY/latest/USD
         url = (
             f"{self.config.EXCHANGERATE_API_URL}/"
@@ -101,6 +234,8 @@ class ExchangeRateApiClient(BaseApiClient):
                 f"{self.config.BASE_CURRENCY}"
                 )
         data = self._make_request(url)
+        if data is None:
+            return {}
 
         if data.get('result') != 'success':
             error_msg = data.get('error-type', 'Unknown error')
@@ -113,3 +248,15 @@ class ExchangeRateApiClient(BaseApiClient):
                 pair = f"{code}_{self.config.BASE_CURRENCY}"
                 result[pair] = rates[code]
         return result
+
+    def fetch_pair(self, code: str) -> Dict[str, float]:
+        self._check_key()
+        # /pair/USD/EUR отдаёт то же значение, что conversion_rates['EUR'] в latest/USD
+        url = (f"{self.config.EXCHANGERATE_API_URL}/{self.config.EXCHANGERATE_API_KEY}/pair/"
+               f"{self.config.BASE_CURRENCY}/{code}")
+        data = self._make_request(url)
+        if data is None:
+            return {}
+        if data.get('result') != 'success':
+            raise ApiRequestError(f"ExchangeRate-API вернул ошибку: {data.get('error-type', 'Unknown error')}")
+        return {f"{code}_{self.config.BASE_CURRENCY}": data['conversion_rate']}
@@ -0,0 +1,199 @@
+import json
+import lzma
+import os
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from valutatrade_hub.infra import durable
+
+INDEX_FILENAME = 'index.json'
+# Блок чтения сжатого сегмента
+READ_CHUNK = 256 * 1024
+# Кодек: (расширение файла, фабрика упаковщика, фабрика распаковщика)
+CODECS: Dict[str, Tuple[str, Callable, Callable]] = {
+    "lzma": (".jsonl.xz", lambda: lzma.LZMACompressor(preset=6), lzma.LZMADecompressor),
+    "zlib": (".jsonl.zz", lambda: zlib.compressobj(9), zlib.decompressobj),
+}
+
+
+def day_of(timestamp: str) -> str:
+    """День записи истории ('YYYY-MM-DD') по её ISO-времени."""
+    return timestamp[:10]
+
+
+def closed_before(keep_days: int = 1) -> str:
+    """Первый ещё открытый день (UTC): дни раньше него закрыты и могут уйти в архив."""
+    return (datetime.utcnow().date() - timedelta(days=max(keep_days, 1) - 1)).isoformat()
+
+
+def in_range(timestamp: str, start: Optional[str], end: Optional[str]) -> bool:
+    """Границы — префиксы ISO-времени включительно, как в backtest: end='2026-02-16' включает весь день."""
+    return (start is None or timestamp >= start) and (end is None or timestamp[:len(end)] <= end)
+
+
+def _replace(path: str, chunks: Iterable[bytes]) -> int:
+    """
+    Атомарная запись потока байтов: временный файл, fsync, rename, fsync каталога.
+    Пишет сразу, а не при фиксации transaction(): архив и оперативный журнал меняются в своём порядке.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    durable.fsync_dir(directory)
+    return size
+
+
+class _SegmentWriter:
+    """Сжатый сегмент одного дня: записи JSON Lines через упаковщик кодека, с min/max времени."""
+
+    def __init__(self, directory: str, day: str, codec: str, taken: Iterable[str]):
+        extension, compressor, _ = CODECS[codec]
+        name, n = day + extension, 1
+        # Записи дня, уже лежащего в архиве (часы процессов разошлись), — в соседний сегмент
+        while name in taken or os.path.exists(os.path.join(directory, name)):
+            name, n = f"{day}.{n}{extension}", n + 1
+        self.path = os.path.join(directory, name)
+        self.entry = {"file": name, "codec": codec, "day": day, "min_ts": None, "max_ts": None,
+                      "records": 0, "raw_bytes": 0, "bytes": 0}
+        self._compressor = compressor()
+        self._chunks: List[bytes] = []
+
+    def add(self, record: dict) -> None:
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+        entry = self.entry
+        ts = record["timestamp"]
+        entry["min_ts"] = ts if entry["min_ts"] is None else min(entry["min_ts"], ts)
+        entry["max_ts"] = ts if entry["max_ts"] is None else max(entry["max_ts"], ts)
+        entry["records"] += 1
+        entry["raw_bytes"] += len(line)
+        block = self._compressor.compress(line)
+        if block:
+            self._chunks.append(block)
+
+    def close(self) -> dict:
+        self._chunks.append(self._compressor.flush())
+        self.entry["bytes"] = _replace(self.path, self._chunks)
+        self._chunks = []
+        return self.entry
+
+
+class HistoryArchive:
+    """
+    Архив закрытых дней истории курсов: по сжатому сегменту (lzma или zlib) на день
+    и index.json с min/max времени записей каждого сегмента.
+
+    Чтение диапазона распаковывает только сегменты, пересекающиеся с ним по индексу.
+    Сегмент записывается целиком до того, как попадает в индекс, а индекс — до того,
+    как записи удаляются из оперативного журнала: после сбоя записи могут оказаться и там и там,
+    но не потеряются; читатели пропускают в журнале записи не позже archived_until().
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+
+    def segments(self) -> List[dict]:
+        """Записи индекса по возрастанию времени."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def version(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def archived_until(segments: List[dict]) -> Optional[str]:
+        """Время последней записи в архиве (None — архив пуст)."""
+        return max((segment["max_ts"] for segment in segments), default=None)
+
+    def read_segment(self, segment: dict) -> Iterator[dict]:
+        decompressor = CODECS[segment["codec"]][2]()
+        partial = b""
+        with open(os.path.join(self.directory, segment["file"]), 'rb') as f:
+            while True:
+                block = f.read(READ_CHUNK)
+                data = decompressor.decompress(block) if block else getattr(decompressor, "flush", bytes)()
+                lines = (partial + data).split(b"\n")
+                partial = lines.pop()
+                if lines:
+                    # Целые строки блока разбираются одним вызовом как массив — вдвое быстрее, чем по строке
+                    yield from json.loads(b"[" + b",".join(lines) + b"]")
+                if not block:
+                    break
+        if partial.strip():
+            yield json.loads(partial)
+
+    def iter_records(self, segments: List[dict], start: Optional[str] = None,
+                     end: Optional[str] = None) -> Iterator[dict]:
+        """Записи сегментов, пересекающихся с [start, end], в пределах диапазона."""
+        for segment in segments:
+            if (start is not None and segment["max_ts"] < start) or \
+                    (end is not None and segment["min_ts"][:len(end)] > end):
+                continue
+            for record in self.read_segment(segment):
+                timestamp = record["timestamp"]
+                if end is not None and timestamp[:len(end)] > end:
+                    return  # сегменты и записи в них упорядочены по времени
+                if start is None or timestamp >= start:
+                    yield record
+
+    def roll(self, records: Iterable[dict], before: str,
+             codec: str = "lzma") -> Tuple[List[dict], List[dict], int]:
+        """
+        Раскладывает поток записей журнала: дни раньше before — в новые сжатые сегменты
+        (индекс обновляется после их записи), остальные возвращаются для оперативного журнала.
+        Записи не позже archived_until() уже в архиве и отбрасываются.
+        Возвращает (новые записи индекса, оставшиеся записи, число отброшенных).
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Неизвестный кодек архива: {codec} (доступны: {', '.join(CODECS)})")
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        until = self.archived_until(segments)
+        taken = {segment["file"] for segment in segments}
+        added: List[dict] = []
+        kept: List[dict] = []
+        skipped = 0
+        writer: Optional[_SegmentWriter] = None
+        for record in records:
+            timestamp = record["timestamp"]
+            if until is not None and timestamp <= until:
+                skipped += 1
+                continue
+            day = day_of(timestamp)
+            if day >= before:
+                kept.append(record)
+                continue
+            # История упорядочена по времени: день сменился — сегмент прошлого дня закрыт
+            if writer is None or writer.entry["day"] != day:
+                if writer is not None:
+                    added.append(writer.close())
+                    taken.add(writer.entry["file"])
+                writer = _SegmentWriter(self.directory, day, codec, taken)
+            writer.add(record)
+        if writer is not None:
+            added.append(writer.close())
+        if added:
+            segments = sorted(segments + added, key=lambda segment: (segment["min_ts"], segment["file"]))
+            _replace(self.index_path, [json.dumps(segments, ensure_ascii=False, indent=1).encode('utf-8')])
+        return added, kept, skipped
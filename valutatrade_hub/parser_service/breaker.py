@@ -0,0 +1,108 @@
+import threading
+import time
+from typing import Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель для провайдера курсов.
+
+    closed — запросы идут; после failure_threshold ошибок подряд переходит в open.
+    open — запросы не выполняются, пока не истечёт пауза (cooldown).
+    half-open — пропускается один пробный запрос: успех закрывает выключатель,
+    ошибка снова открывает его с удвоенной паузой (не больше max_cooldown).
+    Время — wall clock, чтобы состояние можно было сохранять между запусками CLI.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, base_cooldown: float = 30.0,
+                 max_cooldown: float = 3600.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = base_cooldown
+        self.opened_at = 0.0
+        self.last_error = ""
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_in(self, now: Optional[float] = None) -> float:
+        """Сколько секунд осталось до пробного запроса (0 — можно пробовать)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - (now or time.time()))
+
+    def allow(self) -> bool:
+        """Можно ли сейчас обращаться к провайдеру. В half-open пропускает только один пробный запрос."""
+        with self._lock:
+            if self.state == OPEN and self.retry_in() == 0.0:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return self.state == CLOSED
+
+    def record_success(self) -> bool:
+        """Фиксирует успешный запрос. Возвращает True, если состояние изменилось."""
+        with self._lock:
+            changed = self.state != CLOSED or self.failures != 0
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._probing = False
+            return changed
+
+    def release(self) -> None:
+        """Запрос к провайдеру так и не выполнен: пробу half-open можно повторить, состояние не меняется."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, error: str = "") -> bool:
+        """Фиксирует ошибку запроса. Возвращает True, если выключатель открылся."""
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.failures < self.failure_threshold:
+                return False
+            self.state = OPEN
+            self.opened_at = time.time()
+            self._probing = False
+            return True
+
+    def snapshot(self) -> Dict[str, object]:
+        """Состояние для результата обновления и логов."""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "cooldown": self.cooldown,
+            "retry_in": round(self.retry_in(), 1),
+            "last_error": self.last_error,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "cooldown": self.cooldown,
+            "opened_at": self.opened_at,
+            "last_error": self.last_error,
+        }
+
+    def restore(self, data: dict) -> None:
+        """Восстанавливает сохранённое состояние (незавершённая проба half-open снова считается open)."""
+        self.state = OPEN if data.get("state") in (OPEN, HALF_OPEN) else CLOSED
+        self.failures = int(data.get("failures", 0))
+        self.cooldown = float(data.get("cooldown", self.base_cooldown))
+        self.opened_at = float(data.get("opened_at", 0.0))
+        self.last_error = data.get("last_error", "")
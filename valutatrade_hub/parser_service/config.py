@@ -22,6 +22,18 @@ class ParserConfig:
 
     REQUEST_TIMEOUT: int = 10
 
+    # Квоты провайдеров для token bucket: (запросов в секунду, запас на всплеск).
+    # CoinGecko Demo — 30 запросов в минуту; ExchangeRate-API Free — 1500 запросов в месяц.
+    RATE_LIMITS: Dict[str, Tuple[float, float]] = None
+
+    # Circuit breaker провайдеров: ошибок подряд до размыкания, начальная и предельная пауза (сек)
+    BREAKER_FAILURE_THRESHOLD: int = 3
+    BREAKER_BASE_COOLDOWN: float = 30.0
+    BREAKER_MAX_COOLDOWN: float = 3600.0
+
+    # Относительное изменение курса, начиная с которого пара пишется в историю и кэш (0 — любое изменение)
+    RATES_EPSILON: float = 0.0
+
     def __post_init__(self):
         if self.CRYPTO_ID_MAP is None:
             self.CRYPTO_ID_MAP = {
@@ -29,5 +41,10 @@ class ParserConfig:
                 "ETH": "ethereum",
                 "SOL": "solana",
             }
+        if self.RATE_LIMITS is None:
+            self.RATE_LIMITS = {
+                "CoinGecko": (30 / 60, 5),
+                "ExchangeRate-API": (1500 / (30 * 24 * 3600), 10),
+            }
         # Проверим наличие ключа (можно выбросить ошибку, если его нет)
         # Но оставим как есть: если ключ пустой, запросы к ExchangeRate-API будут падать с ошибкой.
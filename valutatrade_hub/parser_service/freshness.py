@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """ISO-время из кэша ('2026-02-16T10:00:00Z') в aware datetime (UTC); None, если разобрать нельзя."""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def confirmed_at(entry: dict) -> str:
+    """
+    Когда курс пары последний раз был подтверждён источником: updated_at (курс изменился)
+    или более поздний checked_at (источник ответил, что курс прежний).
+    """
+    updated_at = entry.get("updated_at", "")
+    checked_at = entry.get("checked_at")
+    checked = parse_timestamp(checked_at) if checked_at else None
+    if checked is None:
+        return updated_at
+    updated = parse_timestamp(updated_at)
+    return checked_at if updated is None or checked > updated else updated_at
+
+
+class FreshnessPolicy:
+    """
+    Допустимый возраст курса для каждой пары.
+
+    По умолчанию — rates_ttl_seconds; rates_ttl_overrides задаёт свои значения для пары ('BTC_USD')
+    или актива ('BTC'). Для пары без собственного значения берётся самый строгий из её активов.
+    """
+
+    def __init__(self, default_ttl: float, overrides: Optional[Dict[str, float]] = None):
+        self.default_ttl = float(default_ttl)
+        self.overrides = {key.upper(): float(ttl) for key, ttl in (overrides or {}).items()}
+
+    @classmethod
+    def from_settings(cls, settings) -> "FreshnessPolicy":
+        return cls(settings.get('rates_ttl_seconds', 300), settings.get('rates_ttl_overrides', {}))
+
+    def max_age(self, pair: str) -> float:
+        if pair in self.overrides:
+            return self.overrides[pair]
+        legs = [self.overrides[code] for code in pair.split('_') if code in self.overrides]
+        return min(legs) if legs else self.default_ttl
+
+    @staticmethod
+    def age(updated_at: str, now: Optional[datetime] = None) -> float:
+        """Возраст курса в секундах; неразборчивая метка времени считается бесконечно старой."""
+        updated = parse_timestamp(updated_at)
+        if updated is None:
+            return float('inf')
+        return ((now or datetime.now(timezone.utc)) - updated).total_seconds()
+
+    def is_stale(self, pair: str, updated_at: str, now: Optional[datetime] = None) -> bool:
+        return self.age(updated_at, now) > self.max_age(pair)
@@ -0,0 +1,169 @@
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Optional
+
+# Заголовок: магия, счётчик версии (seqlock), число пар, ёмкость, last_refresh
+_HEADER = struct.Struct("<8sQII32s")
+# Запись: пара, курс, updated_at, источник
+_ENTRY = struct.Struct("<12sd32s24s")
+_MAGIC = b"VTRATES1"
+# Таблица без данных: последний снимок не поместился в поля фиксированной длины, читатели берут rates.json
+_UNAVAILABLE = b"VTRATES0"
+_SEQ_OFFSET = 8
+_SEQ = struct.Struct("<Q")
+_MIN_CAPACITY = 64
+# Сколько читатель ждёт завершения записи, прежде чем сдаться (писатель мог упасть посреди записи)
+_READ_TIMEOUT = 0.05
+
+
+def _encode(value: Optional[str], size: int) -> bytes:
+    """Строка в поле из size байт; длинное значение — ValueError (обрезка могла бы разрезать символ UTF-8)."""
+    raw = (value or "").encode("utf-8")
+    if len(raw) > size:
+        raise ValueError(f"{value!r} does not fit into {size} bytes")
+    return raw
+
+
+def _decode(raw: bytes) -> str:
+    return raw.rstrip(b"\0").decode("utf-8")
+
+
+class SharedRatesTable:
+    """
+    Таблица последних курсов в отображаемом в память файле (mmap), общая для всех процессов.
+
+    Писатель (RatesStorage.update_cache, уже под файловой блокировкой) публикует снимок
+    по схеме seqlock: счётчик версии становится нечётным на время записи и чётным после.
+    Читатели не берут блокировок: копируют данные и повторяют чтение, если версия
+    изменилась или была нечётной. Разобранный снимок кэшируется до смены версии,
+    поэтому повторные чтения без обновлений не стоят ничего.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm: Optional[mmap.mmap] = None
+        self._cached_seq = None
+        self._cached = None
+
+    # --- запись ---
+
+    def publish(self, pairs: Dict[str, dict], last_refresh: Optional[str], version: Optional[int] = None) -> bool:
+        """
+        Публикует полный набор пар {'BTC_USD': {'rate', 'updated_at', 'source'}}.
+        version — счётчик версий кэша курсов из rates.json: счётчик seqlock доводится до 2·version,
+        поэтому snapshot()['version'] совпадает с ним и не откатывается, если файл таблицы пересоздан.
+        Если код пары, источник или время не помещаются в поля таблицы, она помечается
+        недоступной (читатели возвращаются к rates.json) и возвращается False.
+        """
+        try:
+            entries = [
+                (_encode(pair, 12), float(data["rate"]),
+                 _encode(data.get("updated_at"), 32), _encode(data.get("source"), 24))
+                for pair, data in pairs.items()
+            ]
+            magic, header_refresh = _MAGIC, _encode(last_refresh, 32)
+        except ValueError:
+            entries, magic, header_refresh = [], _UNAVAILABLE, b""
+        capacity = max(_MIN_CAPACITY, len(entries))
+        size = _HEADER.size + capacity * _ENTRY.size
+        mm = self._open(create=True, min_size=size)
+        _, seq, _, old_capacity, _ = _HEADER.unpack_from(mm, 0)
+        capacity = max(capacity, old_capacity)
+        # Нечётный счётчик остался от писателя, упавшего посреди записи: отсчёт — от следующего чётного,
+        # иначе final - 1 оказался бы чётным и читатели приняли бы таблицу в процессе записи за готовую
+        seq += seq & 1
+        final = seq + 2 if version is None else max(seq + 2, 2 * version)
+
+        _SEQ.pack_into(mm, _SEQ_OFFSET, final - 1)  # нечётная версия — запись в процессе
+        offset = _HEADER.size
+        for entry in entries:
+            _ENTRY.pack_into(mm, offset, *entry)
+            offset += _ENTRY.size
+        _HEADER.pack_into(mm, 0, magic, final - 1, len(entries), capacity, header_refresh)
+        _SEQ.pack_into(mm, _SEQ_OFFSET, final)
+        mm.flush()
+        return magic == _MAGIC
+
+    # --- чтение ---
+
+    def snapshot(self) -> Optional[dict]:
+        """
+        Возвращает согласованный снимок {'pairs': {...}, 'last_refresh': ..., 'version': ...}
+        или None, если таблица ещё не опубликована (счётчик 0: файл только создан), помечена
+        недоступной или её не удалось прочитать за _READ_TIMEOUT.
+        """
+        mm = self._open(create=False)
+        if mm is None:
+            return None
+        deadline = time.monotonic() + _READ_TIMEOUT
+        while time.monotonic() < deadline:
+            seq_before = _SEQ.unpack_from(mm, _SEQ_OFFSET)[0]
+            if seq_before == 0:
+                return None
+            if seq_before & 1:
+                time.sleep(0)
+                continue
+            if seq_before == self._cached_seq:
+                return self._cached
+            magic, _, count, capacity, last_refresh = _HEADER.unpack_from(mm, 0)
+            end = _HEADER.size + count * _ENTRY.size
+            if end > len(mm):
+                # Писатель увеличил файл — переоткрываем отображение
+                mm = self._open(create=False, remap=True)
+                continue
+            raw = mm[_HEADER.size:end]
+            if _SEQ.unpack_from(mm, _SEQ_OFFSET)[0] != seq_before:
+                continue
+            if magic != _MAGIC:
+                return None
+            pairs = {}
+            for pair, rate, updated_at, source in _ENTRY.iter_unpack(raw):
+                pairs[_decode(pair)] = {"rate": rate, "updated_at": _decode(updated_at), "source": _decode(source)}
+            self._cached_seq = seq_before
+            self._cached = {"pairs": pairs, "last_refresh": _decode(last_refresh) or None, "version": seq_before // 2}
+            return self._cached
+        return None
+
+    @property
+    def version(self) -> Optional[int]:
+        """
+        Текущая версия таблицы (нечётная — запись в процессе или писатель упал)
+        или None, если таблицы нет или она ещё не опубликована.
+        """
+        mm = self._open(create=False)
+        seq = _SEQ.unpack_from(mm, _SEQ_OFFSET)[0] if mm is not None else 0
+        return seq or None
+
+    # --- служебное ---
+
+    def _open(self, create: bool, min_size: int = 0, remap: bool = False) -> Optional[mmap.mmap]:
+        if self._mm is not None and not remap and len(self._mm) >= min_size:
+            return self._mm
+        if not create and not os.path.exists(self.path):
+            return None
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size < _HEADER.size:
+                if not create:
+                    return None
+                os.ftruncate(fd, max(min_size, _HEADER.size))
+                mm = mmap.mmap(fd, 0)
+                _HEADER.pack_into(mm, 0, _MAGIC, 0, 0, 0, b"")
+            else:
+                if size < min_size:
+                    os.ftruncate(fd, min_size)
+                mm = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mm
+        return mm
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
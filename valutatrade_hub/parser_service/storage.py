@@ -1,33 +1,266 @@
 import json
 import os
-import shutil
+import re
 from datetime import datetime
-from typing import Dict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from valutatrade_hub.infra import durable
+
+from .archive import HistoryArchive, closed_before, day_of, in_range
+from .shared_rates import SharedRatesTable
+
+# Блок чтения при потоковом разборе JSON-массивов
+READ_CHUNK = 64 * 1024
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Разделитель после элемента массива вместе с окружающими пробелами: ',' или закрывающая ']'
+_DELIMITER = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+def _refill(f, buf: str, pos: int, size: int) -> Tuple[str, int, bool]:
+    """Отбрасывает разобранное начало буфера и дочитывает блок. Возвращает (буфер, 0, eof)."""
+    chunk = f.read(size)
+    return buf[pos:] + chunk, 0, not chunk
+
+
+def iter_json_array(path: str, chunk_size: int = READ_CHUNK) -> Iterator[Any]:
+    """
+    Элементы JSON-массива из файла по одному, без загрузки файла целиком (для многосотмегабайтного
+    exchange_rates.json json.load требует в разы больше памяти, чем весь файл).
+    Файл читается блоками, каждый элемент разбирается JSONDecoder.raw_decode прямо в буфере;
+    в памяти — только текущий блок и недоразобранный хвост. Элемент, не поместившийся в блок,
+    дочитывается блоками удвоенного размера. Пустой файл — пустой массив.
+    Файл заменяется атомарно, поэтому открытый дескриптор видит согласованную версию целиком.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from iter_json_file(f, chunk_size)
+
+
+def iter_json_file(f: TextIO, chunk_size: int = READ_CHUNK) -> Iterator[Any]:
+    """То же, что iter_json_array, для уже открытого текстового файла (закрывает его вызывающий)."""
+    scan = json.JSONDecoder().raw_decode
+    buf, pos, eof = "", 0, False
+    # Открывающая скобка и пустой массив
+    for expected in ("[", "]"):
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                break
+            buf, pos, eof = _refill(f, buf, pos, chunk_size)
+        if pos == len(buf):
+            if expected == "[":
+                return
+            raise json.JSONDecodeError("Unexpected end of JSON array", buf, pos)
+        if expected == "[" and buf[pos] != "[":
+            raise json.JSONDecodeError("Expecting '['", buf, pos)
+        if buf[pos] == expected:
+            pos += 1
+            if expected == "]":
+                return
+
+    read_size = chunk_size
+    while True:
+        try:
+            value, end = scan(buf, pos)
+        except json.JSONDecodeError:
+            # Пробелы после разделителя, дочитанные в новом блоке, raw_decode не пропускает
+            skipped = _WHITESPACE.match(buf, pos).end()
+            if skipped != pos:
+                pos = skipped
+                continue
+            if eof:
+                raise
+            buf, pos, eof = _refill(f, buf, pos, read_size)
+            read_size *= 2
+            continue
+        # Число на границе блока могло оборваться ("1.5e" → 1.5) — принимаем элемент,
+        # только увидев после него символ, который не может продолжать число
+        if not eof and (end == len(buf) or buf[end] in _NUMBER_CHARS):
+            buf, pos, eof = _refill(f, buf, pos, read_size)
+            read_size *= 2
+            continue
+        read_size = chunk_size
+        delimiter = _DELIMITER.match(buf, end)
+        while delimiter is None and not eof and _WHITESPACE.match(buf, end).end() == len(buf):
+            buf, end, eof = _refill(f, buf, end, chunk_size)
+            delimiter = _DELIMITER.match(buf, end)
+        if delimiter is None:
+            raise json.JSONDecodeError("Expecting ',' delimiter", buf, end)
+        yield value
+        if delimiter.group(1) == "]":
+            return
+        pos = delimiter.end()
 
 
 class RatesStorage:
-    """Управляет сохранением курсов в exchange_rates.json и rates.json."""
+    """
+    Управляет сохранением курсов в exchange_rates.json и rates.json.
+
+    Закрытые дни истории переносятся из exchange_rates.json в сжатый архив
+    (<журнал>.archive/, см. HistoryArchive): archive_history() или, если задан archive_codec,
+    автоматически при дозаписи. В оперативном журнале остаются последние keep_days дней.
+    """
 
-    def __init__(self, history_path: str, cache_path: str):
+    def __init__(self, history_path: str, cache_path: str, epsilon: float = 0.0,
+                 archive_codec: Optional[str] = None, keep_days: int = 1):
         self.history_path = history_path
         self.cache_path = cache_path
+        # Относительный порог изменения курса, ниже которого пара считается неизменной
+        self.epsilon = epsilon
+        self.archive = HistoryArchive(os.path.splitext(history_path)[0] + ".archive")
+        self.archive_codec = archive_codec
+        self.keep_days = keep_days
         self._ensure_dirs()
+        # Общая для процессов копия кэша в памяти (читается без разбора JSON)
+        self.shared = SharedRatesTable(os.path.join(os.path.dirname(cache_path), "rates.shm"))
+        # Журнал изменений для реплик (ChangeLog), если процесс — primary
+        self.changelog = None
+        # Подтверждения неизменившихся курсов источником: {пара: checked_at}. Хранятся отдельно,
+        # чтобы опрос без изменений не переписывал rates.json и не менял его версию
+        self.checks_path = os.path.join(os.path.dirname(cache_path), "rates_checked.json")
 
     def _ensure_dirs(self):
         os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
         os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
 
+    def _load_cache(self) -> dict:
+        cache = {}
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        if "pairs" not in cache:
+            cache["pairs"] = {}
+        return cache
+
+    def _load_checks(self) -> Dict[str, str]:
+        try:
+            with open(self.checks_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def cached_pair(self, pair: str) -> Optional[dict]:
+        """
+        Запись кэша для пары ({'rate', 'updated_at', 'source'}) или None.
+        Если источник позже подтвердил курс без изменений, в записи есть и 'checked_at'.
+        """
+        entry = self._load_cache()["pairs"].get(pair)
+        if entry is None:
+            return None
+        checked_at = self._load_checks().get(pair)
+        return {**entry, "checked_at": checked_at} if checked_at else entry
+
+    def confirm(self, pairs: Iterable[str]) -> None:
+        """
+        Отмечает, что источник только что подтвердил курсы пар (ответ без изменений, 304):
+        их checked_at обновляется в rates_checked.json, а rates.json, его версия и общая таблица не меняются.
+        Пары, которых нет в кэше, пропускаются.
+        """
+        with durable.file_lock(self.cache_path + ".lock"):
+            cached = self._load_cache()["pairs"]
+            confirmed = [pair for pair in pairs if pair in cached]
+            if not confirmed:
+                return
+            checks = {pair: stamp for pair, stamp in self._load_checks().items() if pair in cached}
+            checks.update(dict.fromkeys(confirmed, datetime.utcnow().isoformat() + 'Z'))
+            durable.atomic_write_json(self.checks_path, checks)
+
+    def _has_moved(self, old_rate: float, new_rate: float) -> bool:
+        return abs(new_rate - old_rate) > self.epsilon * abs(old_rate) if self.epsilon else new_rate != old_rate
+
+    def _diff(self, cached_pairs: dict, rates_dict: Dict[str, float]) -> Dict[str, float]:
+        return {
+            pair: rate for pair, rate in rates_dict.items()
+            if pair not in cached_pairs or self._has_moved(cached_pairs[pair]["rate"], rate)
+        }
+
+    def compute_deltas(self, rates_dict: Dict[str, float]) -> Dict[str, float]:
+        """
+        Возвращает только те пары, курс которых отличается от кэша больше, чем на epsilon
+        (а также пары, которых в кэше ещё нет).
+        """
+        return self._diff(self._load_cache()["pairs"], rates_dict)
+
+    def history_version(self) -> Optional[tuple]:
+        """Версия истории: меняется при каждом добавлении и архивировании (файлы заменяются атомарно)."""
+        try:
+            st = os.stat(self.history_path)
+            hot = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            hot = None
+        archive = self.archive.version()
+        return None if hot is None and archive is None else (hot, archive)
+
+    def iter_history(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[dict]:
+        """
+        Записи истории по одной, в порядке времени, потоково: сначала архив, затем exchange_rates.json.
+        start/end — границы-префиксы ISO-времени включительно; распаковываются только
+        архивные сегменты, пересекающиеся с диапазоном.
+        """
+        # Журнал открывается до чтения индекса: архивирование обновляет индекс раньше, чем укорачивает
+        # журнал, поэтому открытая версия журнала согласована с индексом или содержит перенесённые
+        # записи, которые отбрасываются по archived_until
+        try:
+            f = open(self.history_path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            f = None
+        try:
+            segments = self.archive.segments()
+            until = self.archive.archived_until(segments)
+            yield from self.archive.iter_records(segments, start, end)
+            if f is None:
+                return
+            for record in iter_json_file(f):
+                timestamp = record["timestamp"]
+                if until is not None and timestamp <= until:
+                    continue
+                if end is not None and timestamp[:len(end)] > end:
+                    break  # история упорядочена по времени
+                if in_range(timestamp, start, end):
+                    yield record
+        finally:
+            if f is not None:
+                f.close()
+
+    def archive_history(self, before: Optional[str] = None, codec: Optional[str] = None) -> Tuple[List[dict], int]:
+        """
+        Переносит дни раньше before ('YYYY-MM-DD'; по умолчанию — все закрытые, кроме keep_days последних)
+        из exchange_rates.json в сжатые сегменты архива. Журнал читается потоково, в памяти —
+        только оставляемые записи. Возвращает (новые сегменты, записей осталось в журнале).
+        """
+        with durable.file_lock(self.history_path + ".lock"):
+            return self._roll(before or closed_before(self.keep_days), codec or self.archive_codec or "lzma")
+
+    def _roll(self, before: str, codec: str) -> Tuple[List[dict], int]:
+        if not os.path.exists(self.history_path):
+            return [], 0
+        added, kept, skipped = self.archive.roll(iter_json_array(self.history_path), before, codec)
+        if added or skipped:
+            durable.atomic_write_json(self.history_path, kept)
+        return added, len(kept)
+
+    def _roll_due(self, before: str) -> bool:
+        """Первая запись журнала относится к закрытому дню (журнал упорядочен по времени)."""
+        if not os.path.exists(self.history_path):
+            return False
+        first = next(iter_json_array(self.history_path), None)
+        return first is not None and day_of(first["timestamp"]) < before
+
     def save_historical_rates(self, rates_dict: Dict[str, float], source: str) -> None:
         """
         Сохраняет каждый курс как отдельную запись в исторический файл.
         rates_dict: {'BTC_USD': 59337.21, 'EUR_USD': 1.0786}
         """
-        timestamp = datetime.utcnow().isoformat() + 'Z'  # UTC в формате ISO
-        history = []
-        if os.path.exists(self.history_path):
-            with open(self.history_path, 'r', encoding='utf-8') as f:
-                history = json.load(f)
+        with durable.file_lock(self.history_path + ".lock"):
+            if self.archive_codec:
+                before = closed_before(self.keep_days)
+                if self._roll_due(before):
+                    self._roll(before, self.archive_codec)
+            self._append_history(rates_dict, source)
 
+    def _append_history(self, rates_dict: Dict[str, float], source: str) -> None:
+        timestamp = datetime.utcnow().isoformat() + 'Z'  # UTC в формате ISO
+        records = []
         for pair, rate in rates_dict.items():
             from_curr, to_curr = pair.split('_')
             record_id = f"{from_curr}_{to_curr}_{timestamp}"
@@ -40,37 +273,49 @@ class RatesStorage:
                 "source": source,
                 "meta": {}
             }
-            history.append(record)
+            records.append(record)
 
-        temp_path = self.history_path + ".tmp"
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
-        shutil.move(temp_path, self.history_path)
+        # Журнал не разбирается и не загружается: новые записи дописываются за последним элементом
+        durable.atomic_append_json_array(self.history_path, records)
 
-    def update_cache(self, rates_dict: Dict[str, float], source_map: Dict[str, str]) -> None:
+    def update_cache(self, rates_dict: Dict[str, float], source_map: Dict[str, str]) -> Dict[str, float]:
         """
         Обновляет rates.json (кэш последних значений).
+        Перезаписываются только изменившиеся пары; если изменений нет, файл не трогается
+        (подтверждение неизменившихся курсов — confirm).
+        Итоговое состояние публикуется в общую таблицу курсов (SharedRatesTable).
         source_map: {'BTC_USD': 'CoinGecko', 'EUR_USD': 'ExchangeRate-API'}
+        Возвращает словарь фактически обновлённых пар.
         """
-        cache = {}
-        if os.path.exists(self.cache_path):
-            with open(self.cache_path, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
+        with durable.file_lock(self.cache_path + ".lock"):
+            return self._write_cache(rates_dict, source_map)
 
-        if "pairs" not in cache:
-            cache["pairs"] = {}
+    def _write_cache(self, rates_dict: Dict[str, float], source_map: Dict[str, str]) -> Dict[str, float]:
+        cache = self._load_cache()
+        changed = self._diff(cache["pairs"], rates_dict)
+        if not changed:
+            # Таблицу никто не опубликовал или писатель упал посреди публикации (нечётная версия)
+            shared_version = self.shared.version
+            if shared_version is None or shared_version & 1:
+                self.shared.publish(cache["pairs"], cache.get("last_refresh"), cache.get("version") or 0)
+            return changed
 
         timestamp = datetime.utcnow().isoformat() + 'Z'
-        for pair, rate in rates_dict.items():
+        for pair, rate in changed.items():
+            previous = cache["pairs"].get(pair, {})
             cache["pairs"][pair] = {
                 "rate": rate,
                 "updated_at": timestamp,
-                "source": source_map.get(pair, "unknown")
+                "source": source_map.get(pair, previous.get("source", "unknown"))
             }
 
         cache["last_refresh"] = timestamp
+        # Счётчик версий кэша: по нему инвалидируются вычисления, зависящие от курсов
+        cache["version"] = (cache.get("version") or 0) + 1
 
-        temp_path = self.cache_path + ".tmp"
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            json.dump(cache, f, indent=2, ensure_ascii=False)
-        shutil.move(temp_path, self.cache_path)
+        durable.atomic_write_json(self.cache_path, cache)
+        self.shared.publish(cache["pairs"], timestamp, cache["version"])
+        if self.changelog is not None:
+            self.changelog.append("rates", {"pairs": {pair: cache["pairs"][pair] for pair in changed},
+                                            "last_refresh": timestamp, "version": cache["version"]})
+        return changed
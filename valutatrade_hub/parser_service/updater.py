@@ -1,10 +1,16 @@
+import json
 import logging
+import os
+import threading
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
-from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.core.exceptions import ApiRequestError, RateLimitedError
+from valutatrade_hub.infra import durable
+from valutatrade_hub.infra.singleflight import SingleFlight
 
 from .api_clients import BaseApiClient, CoinGeckoClient, ExchangeRateApiClient
+from .breaker import OPEN, CircuitBreaker
 from .config import ParserConfig
 from .storage import RatesStorage
 
@@ -23,29 +29,118 @@ class RatesUpdater:
         ]
         # Для сопоставления пары и источника
         self.source_map = {}
+        # Одновременные обновления (полное, по клиенту, по паре) схлопываются в один вызов
+        self._flight = SingleFlight()
+        # Выключатели провайдеров; состояние сохраняется рядом с кэшем, чтобы его видели и разовые запуски CLI
+        self.breakers: Dict[str, CircuitBreaker] = {
+            client.source: CircuitBreaker(client.source, config.BREAKER_FAILURE_THRESHOLD,
+                                          config.BREAKER_BASE_COOLDOWN, config.BREAKER_MAX_COOLDOWN)
+            for client in self.clients
+        }
+        self.breakers_path = os.path.join(os.path.dirname(storage.cache_path), "breakers.json")
+        self._load_breakers()
+
+    def _load_breakers(self) -> None:
+        if not os.path.exists(self.breakers_path):
+            return
+        try:
+            with open(self.breakers_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"Cannot read {self.breakers_path}, circuit breakers start closed")
+            return
+        for source, data in saved.items():
+            if source in self.breakers:
+                self.breakers[source].restore(data)
+
+    def _save_breakers(self) -> None:
+        durable.atomic_write_json(self.breakers_path, {s: b.to_dict() for s, b in self.breakers.items()})
+
+    def breaker_states(self) -> Dict[str, dict]:
+        return {source: breaker.snapshot() for source, breaker in self.breakers.items()}
+
+    def _guarded(self, client: BaseApiClient, fn: Callable[[], Dict[str, float]]) -> Dict[str, float]:
+        """
+        Вызов провайдера через его выключатель: разомкнутый выключатель отклоняет вызов сразу,
+        не дожидаясь таймаута; ошибки и успехи меняют его состояние. Отказ собственного
+        ограничителя частоты (RateLimitedError) ошибкой провайдера не считается.
+        """
+        breaker = self.breakers[client.source]
+        if not breaker.allow():
+            raise ApiRequestError(f"{client.source} отключён после ошибок (circuit {breaker.state}), "
+                                  f"повтор через {breaker.retry_in():.0f} с")
+        try:
+            rates = fn()
+        except RateLimitedError:
+            breaker.release()
+            raise
+        except Exception as e:
+            client.discard_validators()
+            # Любая ошибка, в том числе разбора ответа, завершает пробу half-open
+            reason = e.reason if isinstance(e, ApiRequestError) else f"unexpected error: {e!r}"
+            if breaker.record_failure(reason):
+                logger.warning(f"{client.source}: circuit opened for {breaker.cooldown:.0f}s "
+                               f"after {breaker.failures} failures ({reason})")
+            self._save_breakers()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        if breaker.record_success():
+            logger.info(f"{client.source}: circuit closed")
+            self._save_breakers()
+        return rates
+
+    def client_for(self, pair: str) -> Optional[BaseApiClient]:
+        """Клиент, который отдаёт курс пары вида CODE_<базовая валюта>."""
+        code, _, quote = pair.partition('_')
+        if quote != self.config.BASE_CURRENCY:
+            return None
+        return next((client for client in self.clients if client.supports(code)), None)
 
     def run_update(self) -> Dict[str, Any]:
         """
         Запускает обновление от всех клиентов.
-        Возвращает статистику: количество успешных, ошибки.
+        В историю и кэш попадают только пары, курс которых изменился больше, чем на epsilon хранилища.
+        Возвращает статистику: количество обновлённых и неизменившихся пар, ошибки.
+        Если обновление уже выполняется (планировщик, update-rates), вызывающий получает его результат.
         """
+        return self._flight.do("update", self._run_update)
+
+    async def run_update_async(self) -> Dict[str, Any]:
+        """run_update для asyncio: задачи и потоки разделяют одно выполняющееся обновление."""
+        return await self._flight.do_async("update", self._run_update)
+
+    def _fetch(self, client: BaseApiClient) -> Dict[str, float]:
+        return self._flight.do(("fetch", client.source), lambda: self._guarded(client, client.fetch_rates))
+
+    def _run_update(self) -> Dict[str, Any]:
         logger.info("Starting rates update...")
         all_rates = {}
+        confirmed = []
+        unchanged = 0
         errors = []
 
         for client in self.clients:
             client_name = client.__class__.__name__
             try:
-                rates = client.fetch_rates()
-                logger.info(f"{client_name}: OK ({len(rates)} rates)")
+                rates = self._fetch(client)
+                if not rates:
+                    # 304 / то же тело ответа: источник подтвердил, что его курсы прежние
+                    logger.info(f"{client_name}: not modified")
+                    confirmed.extend(client.pairs())
+                    continue
+                changed = self.storage.compute_deltas(rates)
+                unchanged += len(rates) - len(changed)
+                logger.info(f"{client_name}: OK ({len(rates)} rates, {len(changed)} changed)")
                 # Сохраняем историю для каждого источника
-                source = "CoinGecko" if isinstance(client, CoinGeckoClient) else "ExchangeRate-API"
-                if rates:
-                    self.storage.save_historical_rates(rates, source)
-                    all_rates.update(rates)
-                    # Запоминаем источник для каждой пары
-                    for pair in rates:
-                        self.source_map[pair] = source
+                source = client.source
+                confirmed.extend(pair for pair in rates if pair not in changed)
+                # Запоминаем источник для каждой пары
+                self.source_map.update(dict.fromkeys(rates, source))
+                if changed:
+                    self.storage.save_historical_rates(changed, source)
+                    all_rates.update(changed)
             except ApiRequestError as e:
                 logger.error(f"{client_name}: ERROR - {str(e)}")
                 errors.append(f"{client_name}: {str(e)}")
@@ -55,12 +150,104 @@ class RatesUpdater:
 
         if all_rates:
             self.storage.update_cache(all_rates, self.source_map)
-            logger.info(f"Cache updated with {len(all_rates)} rates")
+        if confirmed:
+            # Неизменившиеся курсы не переписывают rates.json: отмечается только время подтверждения
+            self.storage.confirm(confirmed)
+        for client in self.clients:
+            client.save_validators()
+        if all_rates or confirmed:
+            logger.info(f"Cache updated with {len(all_rates)} rates ({len(confirmed)} confirmed)")
         else:
-            logger.warning("No rates were fetched")
+            logger.info("No rates received, cache left untouched")
+
+        breakers = self.breaker_states()
+        for source, state in breakers.items():
+            if state["state"] == OPEN:
+                logger.warning(f"{source}: circuit open, retry in {state['retry_in']:.0f}s")
 
         return {
             "total": len(all_rates),
+            "unchanged": unchanged,
             "errors": errors,
-            "last_refresh": datetime.utcnow().isoformat() + 'Z' if all_rates else None
+            "last_refresh": datetime.utcnow().isoformat() + 'Z' if all_rates else None,
+            "breakers": breakers,
         }
+
+    def refresh_pair(self, pair: str, max_age: Optional[float] = None) -> Optional[dict]:
+        """
+        Точечно обновляет одну пару через её источник вместо полного run_update.
+        Одновременные вызовы для одной пары выполняют один запрос и получают общий результат.
+        Если max_age задан и пару уже освежил другой процесс, запрос не выполняется.
+        Возвращает запись кэша пары ({'rate', 'updated_at', 'source'[, 'checked_at']}) или None, если источника нет.
+        """
+        return self._flight.do(("pair", pair), lambda: self._refresh_pair(pair, max_age))
+
+    async def refresh_pair_async(self, pair: str, max_age: Optional[float] = None) -> Optional[dict]:
+        return await self._flight.do_async(("pair", pair), lambda: self._refresh_pair(pair, max_age))
+
+    def _refresh_pair(self, pair: str, max_age: Optional[float]) -> Optional[dict]:
+        from .freshness import FreshnessPolicy, confirmed_at
+
+        client = self.client_for(pair)
+        if client is None:
+            return None
+        if self._flight.in_flight("update"):
+            # Идёт полное обновление — присоединяемся к нему вместо отдельного запроса
+            self.run_update()
+            max_age = float('inf') if max_age is None else max_age
+        cached = self.storage.cached_pair(pair)
+        if cached is not None and max_age is not None and FreshnessPolicy.age(confirmed_at(cached)) <= max_age:
+            return cached
+
+        code = pair.partition('_')[0]
+        rates = self._guarded(client, lambda: client.fetch_pair(code))
+        if not rates and cached is not None:
+            # 304 / то же тело ответа: курс в кэше актуален
+            self.storage.confirm([pair])
+            client.save_validators()
+            logger.info(f"{client.__class__.__name__}: refreshed {pair} (confirmed)")
+            return self.storage.cached_pair(pair)
+        if pair not in rates:
+            logger.warning(f"{client.__class__.__name__}: no rate for {pair}")
+            return cached
+        source = client.source
+        self.source_map[pair] = source
+        changed = self.storage.compute_deltas(rates)
+        if changed:
+            self.storage.save_historical_rates(changed, source)
+            self.storage.update_cache(changed, self.source_map)
+        else:
+            self.storage.confirm([pair])
+        client.save_validators()
+        logger.info(f"{client.__class__.__name__}: refreshed {pair} ({'changed' if changed else 'confirmed'})")
+        return self.storage.cached_pair(pair)
+
+_updater: Optional[RatesUpdater] = None
+_updater_lock = threading.Lock()
+
+
+def get_updater() -> RatesUpdater:
+    """RatesUpdater создаётся один раз на процесс и переиспользуется всеми обновлениями курсов."""
+    global _updater
+    with _updater_lock:
+        if _updater is None:
+            _updater = _build_updater()
+    return _updater
+
+
+def _build_updater() -> RatesUpdater:
+    from valutatrade_hub.core import replication
+    from valutatrade_hub.infra.settings import SettingsLoader
+
+    settings = SettingsLoader()
+    config = ParserConfig()  # используем переменные окружения
+    # Переопределим пути из настроек, если нужно
+    config.RATES_FILE_PATH = settings.get('data_path', 'data/') + "rates.json"
+    config.HISTORY_FILE_PATH = settings.get('data_path', 'data/') + "exchange_rates.json"
+    config.RATES_EPSILON = settings.get('rates_epsilon', config.RATES_EPSILON)
+
+    storage = RatesStorage(config.HISTORY_FILE_PATH, config.RATES_FILE_PATH, config.RATES_EPSILON,
+                           archive_codec=settings.get('history_archive_codec', 'lzma') or None,
+                           keep_days=settings.get('history_archive_keep_days', 1))
+    storage.changelog = replication.get_changelog()
+    return RatesUpdater(config, storage)